@@ -1,33 +1,42 @@
-from flask import Flask, request, jsonify, abort
+import os
+import random
+import sys
+from flask import Flask, request, abort
+
+# The shared modules of the projects folder, before any import of them
+sys.path.append(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'projects'))
+
+from greeting_store import DEFAULT_GREETINGS, create_store
+from greeting_responses import GreetingResponses
+from common.fastjson import FastJSON, jsonify
 
 app = Flask(__name__)
+FastJSON(app)
+
+# Fraction of greeting lookups written to the debug log
+LOOKUP_LOG_SAMPLE_RATE = float(os.getenv('LOOKUP_LOG_SAMPLE_RATE', '0.01'))
 
-greetings = {
-            'en': 'hello', 
-            'es': 'Hola', 
-            'ar': 'مرحبا',
-            'ru': 'Привет',
-            'fi': 'Hei',
-            'he': 'שלום',
-            'ja': 'こんにちは'
-            }
+greetings = create_store(DEFAULT_GREETINGS)
+greeting_responses = GreetingResponses(greetings)
 
 @app.route('/greeting', methods=['GET'])
 def greeting_all():
-    return jsonify({'greetings': greetings})
+    return greeting_responses.all()
 
 @app.route('/greeting/<lang>', methods=['GET'])
 def greeting_one(lang):
-    print(lang)
-    if(lang not in greetings):
+    if random.random() < LOOKUP_LOG_SAMPLE_RATE:
+        app.logger.debug('greeting lookup: %s', lang)
+    response = greeting_responses.one(lang)
+    if(response is None):
         abort(404)
-    return jsonify({'greeting': greetings[lang
-    ]})
+    return response
 
 @app.route('/greeting', methods=['POST'])
 def greeting_add():
     info = request.get_json()
     if('lang' not in info or 'greeting' not in info):
         abort(422)
-    greetings[info['lang']] = info['greeting']
-    return jsonify({'greetings':greetings})
+    greetings.set(info['lang'], info['greeting'])
+    return jsonify({'lang': info['lang'], 'greeting': info['greeting']})
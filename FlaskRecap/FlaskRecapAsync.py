@@ -0,0 +1,66 @@
+import asyncio
+import os
+import random
+import sys
+from quart import Quart, Response, request, jsonify, abort
+
+# The shared modules of the projects folder, before any import of them
+sys.path.append(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'projects'))
+
+from greeting_store import DEFAULT_GREETINGS, create_store
+from greeting_responses import GreetingResponses
+from common.fastjson import FastJSON
+
+'''
+ASGI mode of FlaskRecap, run it with an ASGI server:
+
+    uvicorn FlaskRecapAsync:app
+'''
+
+app = Quart(__name__)
+FastJSON(app)
+
+# Fraction of greeting lookups written to the debug log
+LOOKUP_LOG_SAMPLE_RATE = float(os.getenv('LOOKUP_LOG_SAMPLE_RATE', '0.01'))
+
+
+class AsyncGreetingResponses(GreetingResponses):
+    response_class = Response
+
+    async def all(self):
+        return await self.build(self.encoded_all()).make_conditional(request)
+
+    async def one(self, lang):
+        encoded = self.encoded_one(lang)
+        if encoded is None:
+            return None
+        return await self.build(encoded).make_conditional(request)
+
+
+greetings = create_store(DEFAULT_GREETINGS)
+greeting_responses = AsyncGreetingResponses(greetings)
+
+@app.route('/greeting', methods=['GET'])
+async def greeting_all():
+    return await greeting_responses.all()
+
+@app.route('/greeting/<lang>', methods=['GET'])
+async def greeting_one(lang):
+    if random.random() < LOOKUP_LOG_SAMPLE_RATE:
+        app.logger.debug('greeting lookup: %s', lang)
+    response = await greeting_responses.one(lang)
+    if(response is None):
+        abort(404)
+    return response
+
+@app.route('/greeting', methods=['POST'])
+async def greeting_add():
+    info = await request.get_json()
+    if('lang' not in info or 'greeting' not in info):
+        abort(422)
+    # A SQLite store writes to disk, keep that off the event loop
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(
+        None, greetings.set, info['lang'], info['greeting'])
+    return jsonify({'lang': info['lang'], 'greeting': info['greeting']})
@@ -0,0 +1,90 @@
+import hashlib
+from datetime import datetime, timedelta, timezone
+
+from flask import Response, request
+
+from common.fastjson import dumps
+
+'''
+Pre-encoded greeting responses
+
+The JSON bodies for the full map and for each language are encoded
+once per store snapshot and reused until a write publishes a new one.
+Responses carry an ETag and Last-Modified so clients that already have
+the current body get a 304 without one.
+'''
+
+
+def encode(payload):
+    return dumps(payload)
+
+
+class EncodedBody:
+    def __init__(self, payload, last_modified):
+        self.body = encode(payload)
+        self.etag = hashlib.sha1(self.body).hexdigest()
+        self.last_modified = last_modified
+
+
+class EncodedGreetings:
+    def __init__(self, snapshot, previous=None):
+        self.snapshot = snapshot
+        # HTTP dates have a one second resolution, keep them increasing
+        # so a change within the same second still fails If-Modified-Since
+        last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+        if previous is not None:
+            last_modified = max(
+                last_modified, previous.last_modified + timedelta(seconds=1))
+        self.last_modified = last_modified
+
+        self.all = EncodedBody({'greetings': dict(snapshot)}, last_modified)
+        self.by_lang = {
+            lang: EncodedBody({'greeting': greeting}, last_modified)
+            for lang, greeting in snapshot.items()
+        }
+
+
+class GreetingResponses:
+    '''Serves greetings from a store as pre-encoded JSON responses.
+    '''
+    response_class = Response
+
+    def __init__(self, store):
+        self.store = store
+        self._encoded = None
+
+    def _current(self):
+        snapshot = self.store.all()
+        encoded = self._encoded
+        # A new snapshot object means the greetings changed
+        if encoded is None or encoded.snapshot is not snapshot:
+            encoded = EncodedGreetings(snapshot, encoded)
+            self._encoded = encoded
+        return encoded
+
+    def build(self, encoded):
+        response = self.response_class(
+            encoded.body, mimetype='application/json')
+        response.set_etag(encoded.etag)
+        response.last_modified = encoded.last_modified
+        response.cache_control.no_cache = True
+        return response
+
+    def encoded_all(self):
+        return self._current().all
+
+    def encoded_one(self, lang):
+        '''Returns the encoded body for one language, or None if it is unknown.
+        '''
+        return self._current().by_lang.get(lang)
+
+    def all(self):
+        return self.build(self.encoded_all()).make_conditional(request)
+
+    def one(self, lang):
+        '''Returns the response for one language, or None if it is unknown.
+        '''
+        encoded = self.encoded_one(lang)
+        if encoded is None:
+            return None
+        return self.build(encoded).make_conditional(request)
@@ -0,0 +1,141 @@
+import os
+import sqlite3
+import threading
+import time
+from types import MappingProxyType
+
+'''
+Greeting stores
+
+Readers never take a lock: every store publishes an immutable snapshot
+of all greetings and a write builds a new snapshot before swapping it
+in, so concurrent writes do not slow reads down.
+'''
+
+DEFAULT_GREETINGS = {
+    'en': 'hello',
+    'es': 'Hola',
+    'ar': 'مرحبا',
+    'ru': 'Привет',
+    'fi': 'Hei',
+    'he': 'שלום',
+    'ja': 'こんにちは'
+}
+# Seconds a worker serves its snapshot before checking for other writers
+DEFAULT_RELOAD_INTERVAL = 1.0
+
+
+class MemoryGreetingStore:
+    '''Keeps greetings in the current process only.
+    '''
+
+    def __init__(self, greetings=None):
+        self._write_lock = threading.Lock()
+        self._snapshot = MappingProxyType(dict(greetings or {}))
+
+    def all(self):
+        '''Returns a read-only mapping of every language to its greeting.
+        '''
+        return self._snapshot
+
+    def get(self, lang):
+        return self.all().get(lang)
+
+    def set(self, lang, greeting):
+        with self._write_lock:
+            greetings = dict(self._snapshot)
+            greetings[lang] = greeting
+            self._snapshot = MappingProxyType(greetings)
+
+
+class SQLiteGreetingStore(MemoryGreetingStore):
+    '''Persists greetings to a SQLite file shared by every worker.
+
+    Reads are served from the in-memory snapshot, which is reloaded
+    when SQLite reports that another connection changed the database.
+    That is checked at most once per reload_interval seconds and thread,
+    so writes of other workers show up after up to that long, and the
+    writes of this store right away.
+    '''
+
+    def __init__(self, path, greetings=None,
+                 reload_interval=DEFAULT_RELOAD_INTERVAL):
+        super().__init__()
+        self.path = path
+        self.reload_interval = reload_interval
+        self._local = threading.local()
+
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS greetings ('
+                'lang TEXT PRIMARY KEY, greeting TEXT NOT NULL)')
+            # Defaults only fill in languages the file does not have yet
+            conn.executemany(
+                'INSERT OR IGNORE INTO greetings (lang, greeting) '
+                'VALUES (?, ?)', (greetings or {}).items())
+        self._reload(conn)
+
+    def _connection(self):
+        # Connections are per thread, and a forked worker opens its own
+        # instead of sharing the parent's file handle
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+            self._local.data_version = None
+            self._local.checked_at = None
+        return conn
+
+    def _reload(self, conn):
+        with self._write_lock:
+            # data_version is per connection and only moves when other
+            # connections commit, so each thread tracks its own
+            self._local.data_version = conn.execute(
+                'PRAGMA data_version').fetchone()[0]
+            self._local.checked_at = time.monotonic()
+            rows = conn.execute('SELECT lang, greeting FROM greetings')
+            self._snapshot = MappingProxyType(dict(rows))
+
+    def all(self):
+        conn = self._connection()
+        now = time.monotonic()
+        checked_at = self._local.checked_at
+        if checked_at is not None and now - checked_at < self.reload_interval:
+            return self._snapshot
+
+        self._local.checked_at = now
+        version = conn.execute('PRAGMA data_version').fetchone()[0]
+        if version != self._local.data_version:
+            self._reload(conn)
+        return self._snapshot
+
+    def set(self, lang, greeting):
+        conn = self._connection()
+        with self._write_lock:
+            with conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO greetings (lang, greeting) '
+                    'VALUES (?, ?)', (lang, greeting))
+
+            greetings = dict(self._snapshot)
+            greetings[lang] = greeting
+            self._snapshot = MappingProxyType(greetings)
+
+
+def create_store(greetings):
+    '''Builds the store selected by the GREETINGS_DATABASE variable.
+
+    Args:
+        greetings: the default greetings to start with.
+
+    Returns:
+        A SQLiteGreetingStore on the file named by GREETINGS_DATABASE,
+        or a MemoryGreetingStore when the variable is not set.
+    '''
+    path = os.getenv('GREETINGS_DATABASE')
+    if path:
+        return SQLiteGreetingStore(path, greetings)
+    return MemoryGreetingStore(greetings)
@@ -0,0 +1,266 @@
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import date
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import and_, func, select, text
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Venue, Artist, Show, ShowStat
+from matching import parse_genres
+
+#----------------------------------------------------------------------------#
+# Analytics
+#     the number of shows per venue, artist, genre and in all, per month,
+#     are kept in show_stats. flask refresh-stats adds the shows listed
+#     and takes out the shows deleted since it last ran, reading only
+#     those, so reports never scan the shows. A show is counted under
+#     the genres of its artist when it is added, and taken out of the
+#     same ones. flask refresh-stats --rebuild counts every show again,
+#     on Postgres refreshes wait while a rebuild runs.
+#----------------------------------------------------------------------------#
+
+DIMENSIONS = ('venue', 'artist', 'genre')
+# Key of the advisory lock refreshes share and a rebuild takes alone
+STATS_LOCK = 4917
+MODELS = {'venue': Venue, 'artist': Artist}
+
+shows = Show.__table__
+artists = Artist.__table__
+stats = ShowStat.__table__
+
+
+def month_of(moment):
+    return date(moment.year, moment.month, 1)
+
+
+def parse_month(value):
+    '''Returns the first day of a YYYY-MM month.
+    '''
+    year, month = value.split('-')
+    return date(int(year), int(month), 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def stat_keys(venue_id, artist_id, genres):
+    return [('all', ''), ('venue', str(venue_id)), ('artist', str(artist_id))] + \
+        [('genre', genre) for genre in genres.split(',') if genre]
+
+#----------------------------------------------------------------------------#
+# Refresh
+#----------------------------------------------------------------------------#
+
+def is_postgres(session):
+    return session.get_bind().dialect.name == 'postgresql'
+
+
+def share_lock(session):
+    '''
+    Takes the statistics lock shared until the end of the transaction,
+    waiting for a rebuild to finish.
+    '''
+    if is_postgres(session):
+        session.execute(text('SELECT pg_advisory_xact_lock_shared(:key)'),
+                        {'key': STATS_LOCK})
+
+
+@contextmanager
+def exclusive_lock(session):
+    '''
+    Holds the statistics lock alone, once the refresh batches in progress
+    committed. It is held by a connection of its own, so the commits of
+    session don't release it. Advisory locks are Postgres only, on other
+    databases a rebuild must not run alongside refreshes.
+    '''
+    if not is_postgres(session):
+        yield
+        return
+    with session.get_bind().connect() as connection:
+        connection.execute(text('SELECT pg_advisory_lock(:key)'), key=STATS_LOCK)
+        try:
+            yield
+        finally:
+            connection.execute(text('SELECT pg_advisory_unlock(:key)'),
+                               key=STATS_LOCK)
+
+
+def claim(session, added, removed):
+    '''
+    Marks the shows of a batch counted or not counted, on the condition
+    that they are still pending. False when another refresh took some of
+    them meanwhile.
+    '''
+    claimed = 0
+    for genres, ids in added.items():
+        claimed += session.execute(
+            shows.update()
+            .where(and_(shows.c.id.in_(ids), shows.c.counted_genres.is_(None),
+                        shows.c.deleted_at.is_(None)))
+            .values(counted_genres=genres)).rowcount
+    if removed:
+        claimed += session.execute(
+            shows.update()
+            .where(and_(shows.c.id.in_(removed), shows.c.counted_genres.isnot(None),
+                        shows.c.deleted_at.isnot(None)))
+            .values(counted_genres=None)).rowcount
+    return claimed == sum(len(ids) for ids in added.values()) + len(removed)
+
+
+def apply_deltas(session, deltas):
+    for (dimension, month, key), delta in deltas.items():
+        if not delta:
+            continue
+        condition = and_(stats.c.dimension == dimension, stats.c.month == month,
+                         stats.c.key == key)
+        updated = session.execute(
+            stats.update().where(condition)
+            .values(shows=stats.c.shows + delta)).rowcount
+        if not updated:
+            session.execute(stats.insert().values(
+                dimension=dimension, month=month, key=key, shows=delta))
+        elif delta < 0:
+            session.execute(stats.delete().where(
+                and_(condition, stats.c.shows == 0)))
+
+
+def refresh(session, batch_size=1000, max_batches=None, lock=True):
+    '''
+    Adds the shows listed and takes out the shows deleted since the last
+    refresh, batch_size shows per transaction. lock is False when the
+    caller holds the statistics lock alone.
+    Returns the numbers of shows added and taken out.
+    '''
+    query = select([shows.c.id, shows.c.venue_id, shows.c.artist_id,
+                    shows.c.start_time, shows.c.counted_genres, artists.c.genres]).\
+        select_from(shows.join(artists, shows.c.artist_id == artists.c.id)).\
+        where(shows.c.counted_genres.is_(None) == shows.c.deleted_at.is_(None)).\
+        order_by(shows.c.id).limit(batch_size)
+
+    added_count = removed_count = batches = 0
+    while max_batches is None or batches < max_batches:
+        if lock:
+            share_lock(session)
+        rows = session.execute(query).fetchall()
+        if not rows:
+            session.commit()
+            break
+
+        deltas = Counter()
+        added = defaultdict(list)
+        removed = []
+        for id, venue_id, artist_id, start_time, counted_genres, genres in rows:
+            if counted_genres is None:
+                counted_genres = ','.join(sorted(parse_genres(genres)))
+                added[counted_genres].append(id)
+                delta = 1
+            else:
+                removed.append(id)
+                delta = -1
+            month = month_of(start_time)
+            for dimension, key in stat_keys(venue_id, artist_id, counted_genres):
+                deltas[(dimension, month, key)] += delta
+
+        try:
+            if not claim(session, added, removed):
+                # Counted by another refresh, read the batch again
+                session.rollback()
+                continue
+            apply_deltas(session, deltas)
+            session.commit()
+        except IntegrityError:
+            # Another refresh inserted the same statistic first
+            session.rollback()
+            continue
+        added_count += len(rows) - len(removed)
+        removed_count += len(removed)
+        batches += 1
+    return added_count, removed_count
+
+
+def rebuild(session, batch_size=1000):
+    '''
+    Empties the statistics a month at a time, marks the shows not counted
+    by ranges of batch_size ids, then counts every show again by batches.
+    Each step commits, refreshes wait until the end.
+    '''
+    with exclusive_lock(session):
+        months = [row[0] for row in session.execute(
+            select([stats.c.month]).distinct().order_by(stats.c.month))]
+        for month in months:
+            session.execute(stats.delete().where(stats.c.month == month))
+            session.commit()
+
+        low, high = session.execute(
+            select([func.min(shows.c.id), func.max(shows.c.id)])).first()
+        session.commit()
+        for start in range(low or 0, (high or -1) + 1, batch_size):
+            session.execute(
+                shows.update()
+                .where(and_(shows.c.id >= start, shows.c.id < start + batch_size,
+                            shows.c.counted_genres.isnot(None)))
+                .values(counted_genres=None))
+            session.commit()
+        return refresh(session, batch_size, lock=False)
+
+#----------------------------------------------------------------------------#
+# Reports
+#----------------------------------------------------------------------------#
+
+def top(dimension, month, limit=10):
+    '''
+    Returns the venues, artists or genres with the most shows in a month,
+    most first, as dicts with their shows.
+    '''
+    rows = db.session.query(ShowStat.key, ShowStat.shows).filter(
+        ShowStat.dimension == dimension, ShowStat.month == month,
+        ShowStat.shows > 0).\
+        order_by(ShowStat.shows.desc(), ShowStat.key).limit(limit).all()
+    if dimension == 'genre':
+        return [{'genre': key, 'shows': count} for key, count in rows]
+
+    model = MODELS[dimension]
+    ids = [int(key) for key, _ in rows]
+    names = dict(db.session.query(model.id, model.name).filter(model.id.in_(ids)))
+    return [{'id': id, 'name': names[id], 'shows': count}
+            for id, (_, count) in zip(ids, rows) if id in names]
+
+
+def monthly(last, months=12):
+    '''Returns the number of shows of each month up to last, oldest first.
+    '''
+    first = add_months(last, 1 - months)
+    counts = dict(db.session.query(ShowStat.month, ShowStat.shows).filter(
+        ShowStat.dimension == 'all', ShowStat.key == '',
+        ShowStat.month.between(first, last)))
+    return [{'month': month.strftime('%Y-%m'), 'shows': counts.get(month, 0)}
+            for month in (add_months(first, i) for i in range(months))]
+
+
+@click.command('refresh-stats')
+@click.option('--batch-size', default=1000, help='shows counted per transaction')
+@click.option('--rebuild', 'from_scratch', is_flag=True,
+              help='count every show again')
+@click.option('--interval', default=0, help='refresh again every seconds, forever')
+@with_appcontext
+def refresh_stats_command(batch_size, from_scratch, interval):
+    '''
+    Updates the show statistics with the shows listed and deleted since
+    the last refresh.
+    '''
+    while True:
+        if from_scratch:
+            added, removed = rebuild(db.session, batch_size)
+            from_scratch = False
+        else:
+            added, removed = refresh(db.session, batch_size)
+        click.echo('{} shows added, {} taken out.'.format(added, removed))
+        db.session.remove()
+        if not interval:
+            break
+        time.sleep(interval)
@@ -3,17 +3,30 @@
 #----------------------------------------------------------------------------#
 
 import json
-import dateutil.parser
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort, jsonify
+import os
+import sys
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort
 from flask_moment import Moment
 from flask_sqlalchemy import SQLAlchemy
 import logging
 from logging import Formatter, FileHandler
 from flask_wtf import Form
+# The shared modules of the projects folder, before any import of them
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
 from forms import *
 from datetime import datetime
-from models import setup_db, db, Venue, Artist, Show
+from models import setup_db, db, Venue, Artist, Show, query_shows, ConcurrentUpdateError
+from scheduling import book, check_shows_command, describe
+from geo import geocode, geocode_venues_command, nearby_venues
+from matching import SCOPES, match_index
+from autocomplete import KINDS, suggest_index
+import analytics
+from archive import archive_shows_command, archived, past, upcoming
+from common.assets import Assets
+from common.compression import Compress
+from common.datetimes import DateTimeFormatter
+from common.fastjson import FastJSON, jsonify
+from common.templates import Templates
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
@@ -22,34 +35,78 @@ app = Flask(__name__)
 moment = Moment(app)
 app.config.from_object('config')
 setup_db(app)
+FastJSON(app)
+app.cli.add_command(check_shows_command)
+app.cli.add_command(geocode_venues_command)
+app.cli.add_command(analytics.refresh_stats_command)
+app.cli.add_command(archive_shows_command)
+# Serves static/css and static/js precompressed when the copies exist,
+# see the Production Server section of the README
+app.wsgi_app = Compress(app.wsgi_app, static_folder=app.static_folder,
+                        static_url_path=app.static_url_path)
+# Fingerprinted static URLs, cached by browsers for a year
+Assets(app)
 
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format)
+# Compiles the patterns once and remembers recent results, pages list
+# many shows starting at the same times.
+format_datetime = DateTimeFormatter({
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma"
+})
 
 app.jinja_env.filters['datetime'] = format_datetime
 
+# Bytecode cache shared by the workers, templates compiled at startup
+# outside of debug mode. Filters must be registered before.
+Templates(app)
+
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
 
 @app.route('/')
 def index():
-  venues = Venue.query.order_by(Venue.id.desc()).limit(10).all()
-  artists = Artist.query.order_by(Artist.id.desc()).limit(10).all()
+  venues = Venue.projection.query(db.session).order_by(Venue.id.desc()).limit(10).all()
+  artists = Artist.projection.query(db.session).order_by(Artist.id.desc()).limit(10).all()
 
-  venues_format = [venue.format() for venue in venues]
-  artists_format = [artist.format() for artist in artists]
+  venues_format = Venue.projection.format(venues)
+  artists_format = Artist.projection.format(artists)
   return render_template('pages/home.html', venues=venues_format, artists=artists_format)
 
+MAX_SUGGESTIONS = 25
+SUGGESTION_URLS = {
+  'venue': lambda id: url_for('show_venue', venue_id=id),
+  'artist': lambda id: url_for('show_artist', artist_id=id),
+  'city': lambda id: None
+}
+
+@app.route('/suggest')
+def suggest():
+  '''Venues, artists and cities starting with q, for the search boxes
+  '''
+  try:
+    limit = int(request.args.get('limit', 10))
+  except ValueError:
+    abort(400)
+  kinds = request.args.getlist('type') or KINDS
+  if not 0 < limit <= MAX_SUGGESTIONS or not set(kinds) <= set(KINDS):
+    abort(400)
+
+  suggestions = suggest_index.suggest(request.args.get('q', ''), limit, kinds)
+  return jsonify({
+    'success': True,
+    'suggestions': [{
+      'type': kind,
+      'id': id,
+      'label': label,
+      'url': SUGGESTION_URLS[kind](id)
+    } for kind, id, label in suggestions]
+  })
+
 
 #  Venues
 #  ----------------------------------------------------------------
@@ -58,20 +115,21 @@ def index():
 def venues():
   '''Display venues data by area
   '''
-  venues = Venue.query.order_by('name').all()
-  areas = Venue.query.distinct(Venue.city, Venue.state).order_by(Venue.state, Venue.city).all()
+  fields = ('id', 'name', 'city', 'state')
+  venues = Venue.projection.query(db.session, fields).order_by(Venue.state, Venue.city, Venue.name).all()
 
-  # Retrieve venues by area.
+  # Group venues by area, consecutive rows share an area.
   data = []
-  for area in areas:
-    data.append({
-      'city': area.city,
-      'state': area.state,
-      'venues': [{
-        'id': venue.id,
-        'name': venue.name
-        } for venue in venues if venue.city == area.city and venue.state == area.state
-      ]
+  for venue in Venue.projection.format(venues, fields):
+    if not data or (data[-1]['city'], data[-1]['state']) != (venue['city'], venue['state']):
+      data.append({
+        'city': venue['city'],
+        'state': venue['state'],
+        'venues': []
+      })
+    data[-1]['venues'].append({
+      'id': venue['id'],
+      'name': venue['name']
     })
 
   return render_template('pages/venues.html', areas=data);
@@ -91,7 +149,7 @@ def search_venues():
     }
   else:
     # Search venues by name
-    venues_by_name = Venue.query.filter(Venue.name.ilike('%{}%'.format(search_term))).order_by(Venue.name).all()
+    venues_by_name = Venue.projection.query(db.session).filter(Venue.name.ilike('%{}%'.format(search_term))).order_by(Venue.name).all()
 
     # Search venues by city or (city, state) pair
     search_term_list = search_term.split(',')
@@ -99,22 +157,75 @@ def search_venues():
 
     # check if user only input city
     if len(search_term_list) < 2:
-      venues_by_city = Venue.query.filter(Venue.city.ilike(city)).order_by(Venue.name).all()
+      venues_by_city = Venue.projection.query(db.session).filter(Venue.city.ilike(city)).order_by(Venue.name).all()
     # User input (city, state) pair
     else:
       state = search_term_list[1].strip()
-      venues_by_city = Venue.query.filter(Venue.city.ilike(city), Venue.state.ilike(state)).order_by(Venue.name).all()
+      venues_by_city = Venue.projection.query(db.session).filter(Venue.city.ilike(city), Venue.state.ilike(state)).order_by(Venue.name).all()
     
     # Combine two search results and remove duplicates
     venues = set(venues_by_name + venues_by_city)
 
     response = {
       'count': len(venues),
-      'data': [venue.format() for venue in venues]
+      'data': Venue.projection.format(venues)
     }
 
   return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
 
+MAX_NEARBY_RADIUS_KM = 500
+MAX_NEARBY_LIMIT = 100
+
+@app.route('/venues/nearby')
+def nearby():
+  '''Venues within radius kilometers of lat and lng, nearest first
+
+  Venues are located at the center of their city, so the venues of one
+  city are all at the same distance.
+  '''
+  try:
+    latitude = float(request.args['lat'])
+    longitude = float(request.args['lng'])
+    radius = float(request.args.get('radius', 25))
+    limit = int(request.args.get('limit', 20))
+    fields = Venue.projection.parse(request.args.get('fields'))
+  except (KeyError, ValueError):
+    abort(400)
+
+  if not (-90 <= latitude <= 90 and -180 <= longitude <= 180) or \
+      not 0 < radius <= MAX_NEARBY_RADIUS_KM or not 0 < limit <= MAX_NEARBY_LIMIT:
+    abort(400)
+
+  return jsonify({
+    'success': True,
+    'venues': nearby_venues(latitude, longitude, radius, limit, fields)
+  })
+
+MAX_MATCHES = 100
+
+def matches(kind, id):
+  '''Best matches of a venue or an artist among the seeking ones of the other kind
+  '''
+  try:
+    k = int(request.args.get('k', 10))
+  except ValueError:
+    abort(400)
+  scope = request.args.get('scope', 'city')
+  if not 0 < k <= MAX_MATCHES or scope not in SCOPES:
+    abort(400)
+
+  result = match_index.matches(kind, id, k, scope)
+  if result is None:
+    abort(404)
+  return jsonify({
+    'success': True,
+    'matches': result
+  })
+
+@app.route('/venues/<int:venue_id>/matches')
+def venue_matches(venue_id):
+  return matches('venue', venue_id)
+
 @app.route('/venues/<int:venue_id>')
 def show_venue(venue_id):
   ''' Shows the venue page with the given venue_id
@@ -124,19 +235,14 @@ def show_venue(venue_id):
   if venue is None:
     abort(404)
 
-  past_shows = Show.query.join(Artist, Show.artist_id == Artist.id).\
-    filter(
-      Show.venue_id == venue_id, 
-      Show.start_time < datetime.now()
-    ).\
-    order_by(Show.start_time.desc()).all()
-
-  upcoming_shows = Show.query.join(Artist, Show.artist_id == Artist.id).\
-    filter(
-      Show.venue_id == venue_id, 
-      Show.start_time > datetime.now()
-    ).\
-    order_by(Show.start_time.asc()).all()
+  # Upcoming shows only read the partitions from this month on, past
+  # shows include the archived ones, see archive.py
+  now = datetime.now()
+  shows = db.session.query(Show, Artist).join(Artist, Show.artist_id == Artist.id).\
+    filter(Show.venue_id == venue_id)
+  past_shows = past(shows, now).order_by(Show.start_time.desc()).all() + \
+    archived(venue_id=venue_id)
+  upcoming_shows = upcoming(shows, now).order_by(Show.start_time.asc()).all()
   
   # format information for venue detail page
   data = {
@@ -154,16 +260,16 @@ def show_venue(venue_id):
     "image_link": venue.image_link,
     "past_shows": [{
       "artist_id": show.artist_id,
-      "artist_name": show.artist.name,
-      "artist_image_link": show.artist.image_link,
-      "start_time": show.start_time.strftime("%m/%d/%Y, %H:%M")
-    } for show in past_shows],
+      "artist_name": artist.name,
+      "artist_image_link": artist.image_link,
+      "start_time": show.start_time
+    } for show, artist in past_shows],
     "upcoming_shows": [{
       "artist_id": show.artist_id,
-      "artist_name": show.artist.name,
-      "artist_image_link": show.artist.image_link,
-      "start_time": show.start_time.strftime("%m/%d/%Y, %H:%M")
-    } for show in upcoming_shows],
+      "artist_name": artist.name,
+      "artist_image_link": artist.image_link,
+      "start_time": show.start_time
+    } for show, artist in upcoming_shows],
     "past_shows_count": len(past_shows),
     "upcoming_shows_count": len(upcoming_shows)
   }
@@ -178,6 +284,13 @@ def create_venue_form():
   form = VenueForm()
   return render_template('forms/new_venue.html', form=form)
 
+
+def warn_not_located(venue_id, city, state):
+  # Venues of cities missing from gazetteer.csv have no location
+  app.logger.warning('Venue %s not located: %s, %s is not in the gazetteer',
+                     venue_id, city, state)
+  flash(city + ', ' + state + ' is not in the gazetteer, the venue will not show up in nearby searches.')
+
 @app.route('/venues/create', methods=['POST'])
 def create_venue_submission():
   ''' Insert form data as a new Venue record in the db
@@ -225,10 +338,15 @@ def create_venue_submission():
         seeking_talent=seeking_talent, 
         seeking_description=seeking_description
       )
+      location = geocode(city, state)
+      for column, value in location.items():
+        setattr(venue, column, value)
 
       venue.insert()
       # on successful db insert, flash success
       flash('Venue ' + request.form['name'] + ' was successfully listed!')
+      if location['geohash'] is None:
+        warn_not_located(venue.id, city, state)
     except ValueError as e:
       print(e)
       db.session.rollback()
@@ -280,8 +398,8 @@ def delete_venue(venue_id):
 def artists():
   ''' Display artists data returned from querying the database
   '''
-  artists = Artist.query.order_by('name').all()
-  data = [artist.format() for artist in artists]
+  artists = Artist.projection.query(db.session).order_by(Artist.name).all()
+  data = Artist.projection.format(artists)
 
   return render_template('pages/artists.html', artists=data)
 
@@ -300,7 +418,7 @@ def search_artists():
     }
   else:
     # Search artists by name
-    artists_by_name = Artist.query.filter(Artist.name.ilike('%{}%'.format(search_term))).order_by(Artist.name).all()
+    artists_by_name = Artist.projection.query(db.session).filter(Artist.name.ilike('%{}%'.format(search_term))).order_by(Artist.name).all()
 
     # Search artists by city or (city, state) pair
     search_term_list = search_term.split(',')
@@ -308,22 +426,26 @@ def search_artists():
 
     # check if user only input city
     if len(search_term_list) < 2:
-      artists_by_city = Artist.query.filter(Artist.city.ilike(city)).order_by(Artist.name).all()
+      artists_by_city = Artist.projection.query(db.session).filter(Artist.city.ilike(city)).order_by(Artist.name).all()
     # User input (city, state) pair
     else:
       state = search_term_list[1].strip()
-      artists_by_city = Artist.query.filter(Artist.city.ilike(city), Artist.state.ilike(state)).order_by(Artist.name).all()
+      artists_by_city = Artist.projection.query(db.session).filter(Artist.city.ilike(city), Artist.state.ilike(state)).order_by(Artist.name).all()
     
     # Combine two search results and remove duplicates
     artists = set(artists_by_name + artists_by_city)
 
     response = {
       'count': len(artists),
-      'data': [artist.format() for artist in artists]
+      'data': Artist.projection.format(artists)
     }
 
   return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
 
+@app.route('/artists/<int:artist_id>/matches')
+def artist_matches(artist_id):
+  return matches('artist', artist_id)
+
 @app.route('/artists/<int:artist_id>')
 def show_artist(artist_id):
   ''' Shows the artist page with the given artist_id
@@ -336,21 +458,15 @@ def show_artist(artist_id):
   # Retrieve the past shows and upcoming shows of the given artist
   # set two variables, one for the `show` and another for the `venue` 
   # the result of the `JOIN` is a list with a tuple of `show` and `venue`
-  past_shows = db.session.query(Show, Venue).join(Venue).\
+  now = datetime.now()
+  shows = db.session.query(Show, Venue).join(Venue).\
     filter(
       Show.artist_id == artist_id,
-      Show.venue_id == Venue.id,
-      Show.start_time < datetime.now()
-    ).\
-    order_by(Show.start_time.desc()).all()
-
-  upcoming_shows = db.session.query(Show, Venue).join(Venue).\
-    filter(
-      Show.artist_id == artist_id,
-      Show.venue_id == Venue.id,
-      Show.start_time > datetime.now()
-    ).\
-    order_by(Show.start_time.asc()).all()
+      Show.venue_id == Venue.id
+    )
+  past_shows = past(shows, now).order_by(Show.start_time.desc()).all() + \
+    archived(artist_id=artist_id)
+  upcoming_shows = upcoming(shows, now).order_by(Show.start_time.asc()).all()
 
   # format information for artist detail page
   data = {
@@ -369,13 +485,13 @@ def show_artist(artist_id):
       "venue_id": show.venue_id,
       "venue_name": venue.name,
       "venue_image_link": venue.image_link,
-      "start_time": show.start_time.strftime("%m/%d/%Y, %H:%M")
+      "start_time": show.start_time
     } for show, venue in past_shows],
     "upcoming_shows": [{
       "venue_id": show.venue_id,
       "venue_name": venue.name,
       "venue_image_link": venue.image_link,
-      "start_time": show.start_time.strftime("%m/%d/%Y, %H:%M")
+      "start_time": show.start_time
     } for show, venue in upcoming_shows],
     "past_shows_count": len(past_shows),
     "upcoming_shows_count": len(upcoming_shows)   
@@ -440,20 +556,28 @@ def edit_artist_submission(artist_id):
       if artist is None:
         abort(404)
       
-      artist.name = name 
-      artist.city = city
-      artist.state = state 
-      artist.phone = phone
-      artist.image_link = image_link 
-      artist.facebook_link = facebook_link
-      artist.genres = genres 
-      artist.website = website 
-      artist.seeking_venue = seeking_venue 
-      artist.seeking_description = seeking_description
-
-      artist.update()
-      # on successful db update, flash success
-      flash('Artist ' + request.form['name'] + ' was successfully updated!')
+      # Only the columns that changed are written, nothing if none did
+      changed = artist.update({
+        'name': name,
+        'city': city,
+        'state': state,
+        'phone': phone,
+        'image_link': image_link,
+        'facebook_link': facebook_link,
+        'genres': genres,
+        'website': website,
+        'seeking_venue': seeking_venue,
+        'seeking_description': seeking_description
+      }, version=form.version.data)
+
+      if changed:
+        # on successful db update, flash success
+        flash('Artist ' + request.form['name'] + ' was successfully updated!')
+      else:
+        flash('Artist ' + request.form['name'] + ' was not changed.')
+    except ConcurrentUpdateError:
+      db.session.rollback()
+      flash('Artist ' + request.form['name'] + ' was changed by someone else, review the changes and edit it again.')
     except ValueError:
       db.session.rollback()
       # on unsuccessful db update, flash an error instead.
@@ -527,21 +651,33 @@ def edit_venue_submission(venue_id):
       if venue is None:
         abort(404)
       
-      venue.name = name 
-      venue.city = city
-      venue.state = state 
-      venue.address = address 
-      venue.phone = phone
-      venue.image_link = image_link 
-      venue.facebook_link = facebook_link
-      venue.genres = genres 
-      venue.website = website 
-      venue.seeking_talent = seeking_talent 
-      venue.seeking_description = seeking_description
-
-      venue.update()
-      # on successful db update, flash success
-      flash('Venue ' + request.form['name'] + ' was successfully updated!')
+      location = geocode(city, state)
+      # Only the columns that changed are written, nothing if none did
+      changed = venue.update({
+        'name': name,
+        'city': city,
+        'state': state,
+        'address': address,
+        'phone': phone,
+        'image_link': image_link,
+        'facebook_link': facebook_link,
+        'genres': genres,
+        'website': website,
+        'seeking_talent': seeking_talent,
+        'seeking_description': seeking_description,
+        **location
+      }, version=form.version.data)
+
+      if changed:
+        # on successful db update, flash success
+        flash('Venue ' + request.form['name'] + ' was successfully updated!')
+      else:
+        flash('Venue ' + request.form['name'] + ' was not changed.')
+      if location['geohash'] is None:
+        warn_not_located(venue_id, city, state)
+    except ConcurrentUpdateError:
+      db.session.rollback()
+      flash('Venue ' + request.form['name'] + ' was changed by someone else, review the changes and edit it again.')
     except ValueError:
       db.session.rollback()
       # on unsuccessful db update, flash an error instead.
@@ -669,8 +805,8 @@ def delete_artist(artist_id):
 def shows():
   ''' Display list of shows
   '''
-  shows = Show.query.join(Venue, Show.venue_id == Venue.id).join(Artist, Show.artist_id == Artist.id).order_by(Show.start_time.desc()).all()
-  data = [show.format() for show in shows]
+  shows = query_shows().order_by(Show.start_time.desc()).all()
+  data = Show.projection.format(shows)
 
   return render_template('pages/shows.html', shows=data)
 
@@ -715,15 +851,16 @@ def create_show_submission():
         flash('Venue (id: ' + str(venue_id) + ') does not exist.')
     else:
       try:
-        show = Show(
-          venue_id=venue_id,
-          artist_id=artist_id,
-          start_time=start_time
-        )
-
-        show.insert()
-        # on successful db insert, flash success
-        flash('Show was successfully listed!')
+        show, conflicts = book(venue_id, artist_id, start_time)
+
+        if conflicts:
+          # Double bookings of the venue or the artist
+          flash('Show could not be listed.')
+          for conflict in conflicts:
+            flash(describe(conflict).capitalize() + '.')
+        else:
+          # on successful db insert, flash success
+          flash('Show was successfully listed!')
       except ValueError as e:
         print(e)
         db.session.rollback()
@@ -769,6 +906,68 @@ def delete_show(show_id):
   return jsonify({'success': not error})
 
 
+#  Analytics
+#  ----------------------------------------------------------------
+#  Read from the show statistics, see analytics.py
+
+MAX_TOP = 100
+MAX_MONTHS = 120
+TOP_DIMENSIONS = {'venues': 'venue', 'artists': 'artist', 'genres': 'genre'}
+
+def analytics_month():
+  '''The month of the month argument, YYYY-MM, the current one by default
+  '''
+  try:
+    return analytics.parse_month(request.args['month'])
+  except KeyError:
+    return analytics.month_of(datetime.now())
+  except ValueError:
+    abort(400)
+
+def analytics_limit(name, default, maximum):
+  try:
+    limit = int(request.args.get(name, default))
+  except ValueError:
+    abort(400)
+  if not 0 < limit <= maximum:
+    abort(400)
+  return limit
+
+@app.route('/analytics')
+def analytics_dashboard():
+  month = analytics_month()
+  return render_template('pages/analytics.html',
+    month=month.strftime('%Y-%m'),
+    venues=analytics.top('venue', month),
+    artists=analytics.top('artist', month),
+    genres=analytics.top('genre', month, MAX_TOP),
+    months=analytics.monthly(month))
+
+@app.route('/analytics/months')
+def analytics_months():
+  '''Shows per month, for the months months up to month
+  '''
+  month = analytics_month()
+  return jsonify({
+    'success': True,
+    'months': analytics.monthly(month, analytics_limit('months', 12, MAX_MONTHS))
+  })
+
+@app.route('/analytics/<dimension>')
+def analytics_top(dimension):
+  '''The venues, artists or genres with the most shows in month
+  '''
+  if dimension not in TOP_DIMENSIONS:
+    abort(404)
+  month = analytics_month()
+  return jsonify({
+    'success': True,
+    'month': month.strftime('%Y-%m'),
+    dimension: analytics.top(TOP_DIMENSIONS[dimension], month,
+                             analytics_limit('limit', 10, MAX_TOP))
+  })
+
+
 # Error handlers
 #  ----------------------------------------------------------------
 
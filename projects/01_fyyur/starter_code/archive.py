@@ -0,0 +1,215 @@
+import re
+from datetime import date, datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import and_, column, select, table, text, true
+
+from models import db, Venue, Artist, Show, ShowArchive
+import analytics
+
+#----------------------------------------------------------------------------#
+# Show history
+#     on Postgres, sql/001_partition_shows.sql partitions shows by month
+#     of start_time. Queries comparing start_time itself to a value only
+#     read the partitions that can hold matching shows, see upcoming().
+#     flask archive-shows moves the shows older than
+#     SHOW_ARCHIVE_AFTER_DAYS to shows_archive, a whole month at a time
+#     when shows is partitioned, and creates the partitions of the next
+#     months.
+#----------------------------------------------------------------------------#
+
+PARTITION_NAME = re.compile(r'^shows_p(\d{4})(\d{2})$')
+
+shows = Show.__table__
+archive_table = ShowArchive.__table__
+
+
+def upcoming(query, now=None):
+    '''
+    Keeps the shows starting after now. start_time is compared to a
+    parameter, not through a function, so Postgres prunes the partitions
+    of past months.
+    '''
+    return query.filter(Show.start_time > (now or datetime.now()))
+
+
+def past(query, now=None):
+    '''Keeps the shows that started before now and are not archived yet.
+    '''
+    return query.filter(Show.start_time < (now or datetime.now()))
+
+
+def archived(venue_id=None, artist_id=None):
+    '''
+    Returns the archived shows of a venue, each with its Artist, or of an
+    artist, each with its Venue, latest first.
+    '''
+    if venue_id is not None:
+        query = db.session.query(ShowArchive, Artist).\
+            join(Artist, ShowArchive.artist_id == Artist.id).\
+            filter(ShowArchive.venue_id == venue_id)
+    else:
+        query = db.session.query(ShowArchive, Venue).\
+            join(Venue, ShowArchive.venue_id == Venue.id).\
+            filter(ShowArchive.artist_id == artist_id)
+    return query.order_by(ShowArchive.start_time.desc()).all()
+
+#----------------------------------------------------------------------------#
+# Partitions
+#----------------------------------------------------------------------------#
+
+def is_partitioned(session):
+    if session.bind.dialect.name != 'postgresql':
+        return False
+    return session.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table"
+        " WHERE partrelid = to_regclass('shows'))")).scalar()
+
+
+def partitions(session):
+    '''Returns the month partitions of shows, as a dict of month to name.
+    '''
+    names = [row[0] for row in session.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid"
+        " WHERE i.inhparent = to_regclass('shows')"))]
+    months = {}
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            months[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return months
+
+
+def create_partitions(session, months_ahead):
+    '''Creates the partitions of this month and the next months_ahead.
+    '''
+    this_month = analytics.month_of(datetime.now())
+    for count in range(months_ahead + 1):
+        session.execute(text('SELECT create_show_partition(:month)'),
+                        {'month': analytics.add_months(this_month, count)})
+    session.commit()
+
+#----------------------------------------------------------------------------#
+# Archival
+#----------------------------------------------------------------------------#
+
+def settled(source):
+    # Shows the statistics are up to date with, see analytics.py
+    return source.c.counted_genres.is_(None) != source.c.deleted_at.is_(None)
+
+
+def move(session, source, condition):
+    '''
+    Copies the shows of source meeting condition to shows_archive, except
+    the deleted ones. Returns the number of shows copied.
+    '''
+    columns = [source.c.id, source.c.venue_id, source.c.artist_id,
+               source.c.start_time]
+    return session.execute(archive_table.insert().from_select(
+        ['id', 'venue_id', 'artist_id', 'start_time'],
+        select(columns).where(and_(condition, source.c.deleted_at.is_(None))))
+    ).rowcount
+
+
+def has_default_partition(session):
+    return session.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table"
+        " WHERE partrelid = to_regclass('shows') AND partdefid <> 0)")).scalar()
+
+
+def quote(session, name):
+    return session.get_bind().dialect.identifier_preparer.quote(name)
+
+
+def detach_partition(session, name):
+    '''
+    Detaches a partition from shows, so dropping it locks no more than
+    the partition itself. On PostgreSQL 14 and later the detach runs
+    CONCURRENTLY, outside of a transaction, and reads and bookings of
+    shows go on meanwhile. PostgreSQL refuses it while shows has a
+    default partition, the detach then locks shows only while it runs.
+    '''
+    engine = session.get_bind()
+    statement = 'ALTER TABLE shows DETACH PARTITION {}'.format(
+        quote(session, name))
+    concurrently = engine.dialect.server_version_info >= (14,) and \
+        not has_default_partition(session)
+    session.commit()
+    if concurrently:
+        with engine.connect() as connection:
+            connection.execution_options(isolation_level='AUTOCOMMIT').\
+                execute(text(statement + ' CONCURRENTLY'))
+    else:
+        session.execute(text(statement))
+        session.commit()
+
+
+def archive_partitions(session, cutoff):
+    '''
+    Archives the month partitions that end before cutoff: detaches each
+    one, copies its shows to shows_archive and drops it. Returns the
+    numbers of shows archived and of months.
+    '''
+    archived_count = months = 0
+    for month, name in sorted(partitions(session).items()):
+        if datetime.combine(analytics.add_months(month, 1), datetime.min.time()) > cutoff:
+            break
+        partition = table(name, *[column(key) for key in shows.c.keys()])
+        # Counted by the next refresh first
+        if session.execute(select([partition.c.id]).where(
+                ~settled(partition)).limit(1)).first():
+            continue
+        detach_partition(session, name)
+        archived_count += move(session, partition, true())
+        session.execute(text('DROP TABLE {}'.format(quote(session, name))))
+        session.commit()
+        months += 1
+    return archived_count, months
+
+
+def archive_rows(session, cutoff, batch_size):
+    '''
+    Archives the shows that started before cutoff by batches of ids,
+    outside of month partitions. Returns the number of shows archived.
+    '''
+    archived_count = 0
+    while True:
+        ids = [row[0] for row in session.execute(
+            select([shows.c.id])
+            .where(and_(shows.c.start_time < cutoff, settled(shows)))
+            .order_by(shows.c.id).limit(batch_size))]
+        if not ids:
+            return archived_count
+        archived_count += move(session, shows, shows.c.id.in_(ids))
+        session.execute(shows.delete().where(shows.c.id.in_(ids)))
+        session.commit()
+
+
+@click.command('archive-shows')
+@click.option('--older-than', type=int, default=None,
+              help='archive the shows of more than days ago, '
+                   'SHOW_ARCHIVE_AFTER_DAYS by default')
+@click.option('--batch-size', default=1000, help='shows moved per transaction')
+@click.option('--months-ahead', default=12, help='month partitions created ahead')
+@with_appcontext
+def archive_shows_command(older_than, batch_size, months_ahead):
+    '''
+    Moves the past shows to shows_archive and creates the partitions of
+    the next months.
+    '''
+    if older_than is None:
+        older_than = current_app.config['SHOW_ARCHIVE_AFTER_DAYS']
+    cutoff = datetime.now() - timedelta(days=older_than)
+    # Shows are archived once counted in the statistics
+    analytics.refresh(db.session, batch_size)
+
+    archived_count = months = 0
+    if is_partitioned(db.session):
+        create_partitions(db.session, months_ahead)
+        archived_count, months = archive_partitions(db.session, cutoff)
+    # The shows of the partial month, or of a table that is not partitioned
+    archived_count += archive_rows(db.session, cutoff, batch_size)
+    click.echo('{} shows archived, {} month partitions dropped.'.format(
+        archived_count, months))
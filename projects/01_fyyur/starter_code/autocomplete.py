@@ -0,0 +1,183 @@
+import unicodedata
+from bisect import bisect_left, bisect_right
+from collections import Counter
+
+from models import db, Venue, Artist
+from common.liveindex import LiveIndex
+
+#----------------------------------------------------------------------------#
+# Autocomplete
+#     the names of the venues and artists and their cities are kept folded
+#     (lower case, without accents) in sorted lists, the suggestions for a
+#     prefix are the first keys starting with it, found by bisection.
+#     Names are suggested by their first word and by their later words.
+#     Updated by every commit, see common/liveindex.py
+#----------------------------------------------------------------------------#
+
+KINDS = ('venue', 'artist', 'city')
+
+
+def fold(text):
+    '''Lower case, accents removed and whitespace collapsed.
+    '''
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    stripped = ''.join(char for char in decomposed
+                       if not unicodedata.combining(char))
+    return ' '.join(stripped.casefold().split())
+
+
+def city_label(city, state):
+    return '{}, {}'.format(' '.join(city.split()), state.upper())
+
+
+class SortedKeys:
+    '''
+    Keys in order, each with the id of what it names, and the first ids
+    whose keys start with a prefix.
+    '''
+
+    def __init__(self):
+        self.keys = []
+        self.ids = []
+
+    def append(self, key, id):
+        # Unsorted until sort(), for bulk builds
+        self.keys.append(key)
+        self.ids.append(id)
+
+    def sort(self):
+        pairs = sorted(zip(self.keys, self.ids))
+        self.keys = [key for key, _ in pairs]
+        self.ids = [id for _, id in pairs]
+
+    def insert(self, key, id):
+        position = bisect_right(self.keys, key)
+        self.keys.insert(position, key)
+        self.ids.insert(position, id)
+
+    def remove(self, key, id):
+        position = bisect_left(self.keys, key)
+        while position < len(self.keys) and self.keys[position] == key:
+            if self.ids[position] == id:
+                del self.keys[position]
+                del self.ids[position]
+                return
+            position += 1
+
+    def starting_with(self, prefix, limit, exclude=()):
+        '''Returns up to limit (key, id) of distinct ids, in key order.
+        '''
+        found = []
+        seen = set(exclude)
+        position = bisect_left(self.keys, prefix)
+        while len(found) < limit and position < len(self.keys) and \
+                self.keys[position].startswith(prefix):
+            id = self.ids[position]
+            if id not in seen:
+                seen.add(id)
+                found.append((self.keys[position], id))
+            position += 1
+        return found
+
+
+class SuggestIndex(LiveIndex):
+    models = (Venue, Artist)
+    kinds = {Venue: 'venue', Artist: 'artist'}
+
+    def __init__(self, session=None, **kwargs):
+        self.clear()
+        super().__init__(session, **kwargs)
+
+    def clear(self):
+        # kind -> the whole names, and the names from each later word on
+        self.names = {kind: SortedKeys() for kind in KINDS}
+        self.words = {kind: SortedKeys() for kind in KINDS}
+        self.labels = {}
+        self.cities = {}
+        self.city_counts = Counter()
+        self.building = True
+
+    def built(self):
+        for keys in list(self.names.values()) + list(self.words.values()):
+            keys.sort()
+        self.building = False
+
+    def load(self):
+        for model in self.models:
+            rows = db.session.query(model.id, model.name, model.city, model.state)
+            for row in rows:
+                yield (self.kinds[model],) + tuple(row)
+
+    def record(self, obj):
+        return (self.kinds[type(obj)], obj.id, obj.name, obj.city, obj.state)
+
+    @staticmethod
+    def word_keys(key):
+        words = key.split(' ')
+        return [' '.join(words[i:]) for i in range(1, len(words))]
+
+    def _add(self, kind, id, label, words=True):
+        key = fold(label)
+        add = 'append' if self.building else 'insert'
+        self.labels[(kind, id)] = label
+        getattr(self.names[kind], add)(key, id)
+        if words:
+            for word_key in self.word_keys(key):
+                getattr(self.words[kind], add)(word_key, id)
+
+    def _remove(self, kind, id, words=True):
+        key = fold(self.labels.pop((kind, id)))
+        self.names[kind].remove(key, id)
+        if words:
+            for word_key in self.word_keys(key):
+                self.words[kind].remove(word_key, id)
+
+    def put(self, record):
+        kind, id, name, city, state = record
+        self._add(kind, id, name)
+
+        label = city_label(city, state)
+        self.cities[(kind, id)] = label
+        self.city_counts[label] += 1
+        if self.city_counts[label] == 1:
+            # Cities are suggested by the start of their name only
+            self._add('city', label, label, words=False)
+
+    def discard(self, model, id):
+        kind = self.kinds[model]
+        if (kind, id) not in self.labels:
+            return
+        self._remove(kind, id)
+
+        label = self.cities.pop((kind, id))
+        self.city_counts[label] -= 1
+        if not self.city_counts[label]:
+            del self.city_counts[label]
+            self._remove('city', label, words=False)
+
+    def suggest(self, prefix, limit=10, kinds=KINDS):
+        '''
+        Returns up to limit (kind, id, label) of the names and cities
+        starting with prefix, in alphabetical order, then of the names
+        with a later word starting with it. The id of a city is its label.
+        '''
+        prefix = fold(prefix)
+        if not prefix:
+            return []
+        self.ensure_loaded()
+        with self.lock:
+            first = []
+            later = []
+            for kind in kinds:
+                found = self.names[kind].starting_with(prefix, limit)
+                first.extend((key, kind, id) for key, id in found)
+                if len(found) < limit:
+                    later.extend(
+                        (key, kind, id) for key, id in self.words[kind].starting_with(
+                            prefix, limit - len(found), [id for _, id in found]))
+            suggestions = (sorted(first) + sorted(later))[:limit]
+            return [(kind, id, self.labels[(kind, id)])
+                    for _, kind, id in suggestions]
+
+
+suggest_index = SuggestIndex(db.session)
@@ -0,0 +1,140 @@
+'''
+Nearby venues benchmark
+
+Fills a SQLite database with venues around the cities of the gazetteer,
+a few kilometers from their center, runs ANALYZE and reports:
+
+    nearby      venues within the radius of a point, nearest first, with
+                nearby_venues(): range scans of the geohash index
+    scan        the same venues from the rows of the latitude band, the
+                work of a search without the geohash index
+
+Run from this folder:
+
+    python bench_geo.py --venues 200000
+'''
+import argparse
+import math
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from sqlalchemy import text
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+from app import app
+from geo import bounding_box, distance_km, encode, gazetteer, nearby_venues
+from models import db, Venue
+
+BATCH_SIZE = 10000
+# Venues are spread this far from the center of their city
+SPREAD_KM = 15
+
+
+def venues(count, places, rng):
+    for i in range(count):
+        (city, state), (latitude, longitude) = rng.choice(places)
+        latitude += rng.uniform(-SPREAD_KM, SPREAD_KM) / 110.574
+        longitude += rng.uniform(-SPREAD_KM, SPREAD_KM) / (
+            111.320 * math.cos(math.radians(latitude)))
+        yield {
+            'name': 'Venue {}'.format(i),
+            'city': city,
+            'state': state,
+            'address': '{} Main Street'.format(i),
+            'genres': 'Jazz',
+            'seeking_talent': False,
+            'latitude': latitude,
+            'longitude': longitude,
+            'geohash': encode(latitude, longitude)
+        }
+
+
+def fill(count, rng):
+    places = list(gazetteer().places.items())
+    batch = []
+    for row in venues(count, places, rng):
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            db.session.execute(Venue.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(Venue.__table__.insert(), batch)
+    db.session.commit()
+    db.session.execute(text('ANALYZE'))
+
+
+def scan_nearby(latitude, longitude, radius_km, limit):
+    latitude_band, _ = bounding_box(latitude, longitude, radius_km)
+    rows = db.session.query(
+        Venue.id, Venue.name, Venue.latitude, Venue.longitude).filter(
+        Venue.latitude.between(latitude - latitude_band,
+                               latitude + latitude_band)).all()
+    found = sorted(
+        (distance_km(latitude, longitude, row.latitude, row.longitude), row.id)
+        for row in rows)
+    return [pair for pair in found if pair[0] <= radius_km][:limit]
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - started, result
+
+
+def report(label, timings):
+    timings = sorted(timings)
+    print('{:<8} {:>10.3f} ms median {:>10.3f} ms p99'.format(
+        label, statistics.median(timings) * 1000,
+        timings[int(len(timings) * 0.99)] * 1000))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Benchmark the search of venues near a point.')
+    parser.add_argument('--venues', type=int, default=200000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--radius', type=float, default=25)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        app.config.update({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(
+                directory, 'bench.db'),
+            'SQLALCHEMY_ENGINE_OPTIONS': {}
+        })
+        with app.app_context():
+            db.create_all()
+            seconds, _ = timed(fill, args.venues, rng)
+            print('{:<8} {:>10.1f} ms for {} venues'.format(
+                'fill', seconds * 1000, args.venues))
+
+            points = [location for _, location in
+                      rng.sample(list(gazetteer().places.items()),
+                                 min(args.queries, len(gazetteer().places)))]
+            timings = []
+            found = 0
+            for latitude, longitude in points:
+                seconds, result = timed(nearby_venues, latitude, longitude,
+                                        args.radius, args.limit)
+                timings.append(seconds)
+                found += len(result)
+            report('nearby', timings)
+            print('{:<8} {:>10.1f} venues per search'.format(
+                'found', found / len(points)))
+            report('scan', [timed(scan_nearby, latitude, longitude,
+                                  args.radius, args.limit)[0]
+                            for latitude, longitude in points])
+            db.session.remove()
+            db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+'''
+Matchmaking benchmark
+
+Fills a MatchIndex, and a SQLite database, with venues and artists
+spread over cities of every state and reports:
+
+    build       time to index every profile
+    update      time to re-index one edited profile
+    index       top 10 matches of a profile, from the inverted indexes
+    sql         the same matches from a query per request: the profile,
+                then the seeking profiles of the other kind in the city
+                sharing a genre, through an index on (state, city),
+                scored in Python
+
+Run from this folder:
+
+    python bench_matching.py --entities 100000
+'''
+import argparse
+import heapq
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from sqlalchemy import Index, or_, text
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+from app import app
+from forms import genre_choices, state_choices
+from matching import MatchIndex, Profile, parse_genres, score
+from models import db, Artist, Venue
+
+BATCH_SIZE = 10000
+CITIES_PER_STATE = 6
+MODELS = {'venue': Venue, 'artist': Artist}
+SEEKING = {'venue': Venue.seeking_talent, 'artist': Artist.seeking_venue}
+
+
+def profiles(count, rng):
+    cities = ['City {}'.format(i) for i in range(CITIES_PER_STATE)]
+    for i in range(count):
+        kind = 'venue' if i % 2 == 0 else 'artist'
+        yield Profile(
+            kind, i // 2 + 1, '{} {}'.format(kind, i), rng.choice(cities),
+            rng.choice(state_choices),
+            frozenset(rng.sample(genre_choices, rng.randint(1, 4))),
+            rng.random() < 0.5)
+
+
+def columns(profile):
+    values = {
+        'id': profile.id,
+        'name': profile.name,
+        'city': profile.city,
+        'state': profile.state,
+        'genres': ','.join(sorted(profile.genres)),
+        SEEKING[profile.kind].key: profile.seeking
+    }
+    if profile.kind == 'venue':
+        values['address'] = '1 Main Street'
+    return values
+
+
+def fill(all_profiles):
+    for kind, model in MODELS.items():
+        rows = [columns(profile) for profile in all_profiles if profile.kind == kind]
+        for start in range(0, len(rows), BATCH_SIZE):
+            db.session.execute(model.__table__.insert(),
+                               rows[start:start + BATCH_SIZE])
+        # The best index the query can have
+        Index('ix_bench_{}_state_city'.format(model.__tablename__),
+              model.state, model.city).create(db.session.connection())
+    db.session.commit()
+    db.session.execute(text('ANALYZE'))
+
+
+def sql_matches(kind, id, k=10):
+    model = MODELS[kind]
+    profile = db.session.query(
+        model.city, model.state, model.genres).filter(model.id == id).one()
+    genres = parse_genres(profile.genres)
+
+    other = 'artist' if kind == 'venue' else 'venue'
+    candidate = MODELS[other]
+    rows = db.session.query(candidate.id, candidate.name, candidate.genres).\
+        filter(SEEKING[other].is_(True), candidate.state == profile.state,
+               candidate.city == profile.city,
+               or_(*[candidate.genres.contains(genre) for genre in genres])).all()
+    scored = [(score(genres, parse_genres(row.genres)), row) for row in rows]
+    return heapq.nlargest(k, [pair for pair in scored if pair[0]],
+                          key=lambda pair: (pair[0], -pair[1].id))
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - started, result
+
+
+def report(label, timings):
+    timings = sorted(timings)
+    print('{:<8} {:>10.3f} ms median {:>10.3f} ms p99'.format(
+        label, statistics.median(timings) * 1000,
+        timings[int(len(timings) * 0.99)] * 1000))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Benchmark venue and artist matchmaking.')
+    parser.add_argument('--entities', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    all_profiles = list(profiles(args.entities, rng))
+    index = MatchIndex(max_age=None)
+    index.loaded_at = time.monotonic()
+
+    seconds, _ = timed(lambda: [index.put(profile) for profile in all_profiles])
+    print('{:<8} {:>10.1f} ms for {} profiles'.format(
+        'build', seconds * 1000, len(all_profiles)))
+
+    sample = rng.sample(all_profiles, min(args.queries, len(all_profiles)))
+    updates = []
+    for profile in sample:
+        edited = profile._replace(genres=frozenset(
+            rng.sample(genre_choices, rng.randint(1, 4))))
+        started = time.perf_counter()
+        index.discard(MODELS[profile.kind], profile.id)
+        index.put(edited)
+        updates.append(time.perf_counter() - started)
+    report('update', updates)
+
+    report('index', [timed(index.matches, profile.kind, profile.id)[0]
+                     for profile in sample])
+
+    with tempfile.TemporaryDirectory() as directory:
+        app.config.update({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(
+                directory, 'bench.db'),
+            'SQLALCHEMY_ENGINE_OPTIONS': {}
+        })
+        with app.app_context():
+            db.create_all()
+            fill(all_profiles)
+            report('sql', [timed(sql_matches, profile.kind, profile.id)[0]
+                           for profile in sample])
+            db.session.remove()
+            db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
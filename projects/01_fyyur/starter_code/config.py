@@ -1,10 +1,20 @@
 import os
-SECRET_KEY = os.urandom(32)
+
+from flask.helpers import get_debug_flag
+
+# Set by the launcher so that every worker has the same key
+SECRET_KEY = os.environ.get('SECRET_KEY') or os.urandom(32)
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
-# Enable debug mode.
-DEBUG = True
+# Debug mode is off unless FLASK_DEBUG=1 or FLASK_ENV=development, so
+# static URLs are fingerprinted and templates preloaded by default.
+DEBUG = get_debug_flag()
+
+# Templates are compiled at startup and never checked for changes on
+# disk, except in debug mode (see projects/common/templates.py).
+TEMPLATES_PRELOAD = not DEBUG
+TEMPLATES_AUTO_RELOAD = DEBUG
 
 # Connect to the database
 # Change the names of your database and crendtials and all to connect to your local system
@@ -15,3 +25,19 @@ url = 'localhost:5432'
 SQLALCHEMY_DATABASE_URI = "postgres://{}:{}@{}/{}".format(
     username, password, url, DATABASE_NAME)
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Length of a show, shows of a venue or an artist may not overlap
+SHOW_DURATION_MINUTES = 180
+
+# Shows older than this are moved to shows_archive by flask archive-shows
+SHOW_ARCHIVE_AFTER_DAYS = 730
+
+# Stylesheets joined into one file by python -m common.assets build
+ASSET_BUNDLES = {
+    'css/fyyur.css': [
+        'css/layout.main.css',
+        'css/main.css',
+        'css/main.responsive.css',
+        'css/main.quickfix.css'
+    ]
+}
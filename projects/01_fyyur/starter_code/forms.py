@@ -1,6 +1,7 @@
 from datetime import datetime
 from flask_wtf import FlaskForm
 from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, IntegerField
+from wtforms.widgets import HiddenInput
 from wtforms.validators import DataRequired, AnyOf, URL, Optional, ValidationError
 from wtforms.compat import text_type
 import re
@@ -141,6 +142,10 @@ class ShowForm(FlaskForm):
     )
 
 class VenueForm(FlaskForm):
+    # Version of the row an edit form was filled from
+    version = IntegerField(
+        'version', widget=HiddenInput(), validators=[Optional()]
+    )
     name = StringField(
         'name', validators=[DataRequired()]
     )
@@ -260,6 +265,10 @@ class VenueForm(FlaskForm):
     )
 
 class ArtistForm(FlaskForm):
+    # Version of the row an edit form was filled from
+    version = IntegerField(
+        'version', widget=HiddenInput(), validators=[Optional()]
+    )
     name = StringField(
         'name', validators=[DataRequired()]
     )
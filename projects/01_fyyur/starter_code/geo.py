@@ -0,0 +1,277 @@
+import csv
+import math
+import os
+import re
+from functools import lru_cache
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import and_, bindparam, or_
+
+from models import db, Venue
+
+#----------------------------------------------------------------------------#
+# Venue locations
+#     venues are geocoded offline from the city and state, with the
+#     bundled gazetteer.csv, and indexed by geohash: venues near a point
+#     share the first characters of their geohash, so the venues around
+#     it are a few range scans of the geohash index. The street address
+#     is not geocoded, every venue of a city is placed at its center.
+#----------------------------------------------------------------------------#
+
+GAZETTEER_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'gazetteer.csv')
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+# Cells of about 5 x 5 km, finer cells would only split the venues of
+# the same city center
+GEOHASH_PRECISION = 5
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LATITUDE = 110.574
+KM_PER_DEGREE_LONGITUDE = 111.320
+# Range scans per search at most
+MAX_CELLS = 16
+
+
+def encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    '''Returns the geohash of a point.
+    '''
+    latitude_range = [-90.0, 90.0]
+    longitude_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        # Bits alternate between longitude and latitude, longitude first
+        value_range, coordinate = (longitude_range, longitude) if even \
+            else (latitude_range, latitude)
+        middle = (value_range[0] + value_range[1]) / 2
+        if coordinate >= middle:
+            value = value * 2 + 1
+            value_range[0] = middle
+        else:
+            value = value * 2
+            value_range[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = value = 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    '''Returns the height and width in degrees of the geohash cells.
+    '''
+    longitude_bits = (5 * precision + 1) // 2
+    latitude_bits = 5 * precision // 2
+    return 180.0 / 2 ** latitude_bits, 360.0 / 2 ** longitude_bits
+
+
+def distance_km(latitude1, longitude1, latitude2, longitude2):
+    '''Great circle distance, haversine formula.
+    '''
+    phi1 = math.radians(latitude1)
+    phi2 = math.radians(latitude2)
+    a = math.sin((phi2 - phi1) / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * \
+        math.sin(math.radians(longitude2 - longitude1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(latitude, longitude, radius_km):
+    '''
+    Returns the latitude band and longitude band, in degrees, around a
+    point that contain the circle, the longitude band is None when the
+    circle reaches a pole.
+    '''
+    latitude_band = radius_km / KM_PER_DEGREE_LATITUDE
+    # Longitude degrees are shortest on the edge of the circle nearest a pole
+    farthest = abs(latitude) + latitude_band
+    if farthest >= 90:
+        return latitude_band, None
+    longitude_band = radius_km / (
+        KM_PER_DEGREE_LONGITUDE * math.cos(math.radians(farthest)))
+    return latitude_band, longitude_band if longitude_band < 180 else None
+
+
+def covering_cells(latitude, longitude, radius_km):
+    '''
+    Returns geohash prefixes whose cells together contain the circle, the
+    smallest cells that need at most MAX_CELLS of them. An empty prefix
+    stands for the whole world.
+    '''
+    latitude_band, longitude_band = bounding_box(latitude, longitude, radius_km)
+    south = max(-90.0, latitude - latitude_band)
+    north = min(90.0, latitude + latitude_band)
+
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        rows = range(int((south + 90) // height),
+                     min(int((north + 90) // height), int(180 / height) - 1) + 1)
+        if longitude_band is None:
+            columns = range(int(360 / width))
+        else:
+            first = int((longitude - longitude_band + 180) // width)
+            columns = range(first,
+                            int((longitude + longitude_band + 180) // width) + 1)
+        if len(rows) * len(columns) > MAX_CELLS:
+            continue
+
+        cells = []
+        for row in rows:
+            for column in columns:
+                # The center of the cell, longitudes wrap around
+                cell_longitude = ((column + 0.5) * width) % 360 - 180
+                cell = encode(-90 + (row + 0.5) * height, cell_longitude,
+                              precision)
+                if cell not in cells:
+                    cells.append(cell)
+        return cells
+    return ['']
+
+
+def prefix_range(prefix):
+    '''
+    Returns the bounds of the geohashes starting with prefix, the upper
+    one excluded and None when there is none. Range conditions use the
+    index on any database, LIKE does not.
+    '''
+    chars = list(prefix)
+    while chars:
+        position = BASE32.index(chars[-1])
+        if position + 1 < len(BASE32):
+            chars[-1] = BASE32[position + 1]
+            return prefix, ''.join(chars)
+        chars.pop()
+    return prefix, None
+
+
+def nearby_venues(latitude, longitude, radius_km, limit, fields=None):
+    '''
+    Returns the venues within radius_km of a point, nearest first, as
+    dicts of the projection fields plus distance in kilometers.
+    '''
+    fields = tuple(fields or Venue.projection.default) + \
+        ('latitude', 'longitude')
+    fields = tuple(dict.fromkeys(fields))
+    ranges = []
+    for cell in covering_cells(latitude, longitude, radius_km):
+        low, high = prefix_range(cell)
+        ranges.append(and_(Venue.geohash >= low, Venue.geohash < high)
+                      if high is not None else Venue.geohash >= low)
+
+    # The cells cover more than the circle, leave out the rows outside of
+    # its bounding box before computing distances
+    latitude_band, longitude_band = bounding_box(latitude, longitude, radius_km)
+    query = Venue.projection.query(db.session, fields).filter(
+        or_(*ranges),
+        Venue.latitude.between(latitude - latitude_band,
+                               latitude + latitude_band))
+    if longitude_band is not None and \
+            -180 <= longitude - longitude_band and longitude + longitude_band <= 180:
+        query = query.filter(Venue.longitude.between(
+            longitude - longitude_band, longitude + longitude_band))
+    rows = query.all()
+
+    venues = []
+    for venue in Venue.projection.format(rows, fields):
+        distance = distance_km(
+            latitude, longitude, venue['latitude'], venue['longitude'])
+        if distance <= radius_km:
+            venue['distance'] = round(distance, 3)
+            venues.append(venue)
+    venues.sort(key=lambda venue: (venue['distance'], venue['id']))
+    return venues[:limit]
+
+
+#----------------------------------------------------------------------------#
+# Gazetteer
+#----------------------------------------------------------------------------#
+
+def normalize(name):
+    name = re.sub(r'[.,]', '', name.casefold())
+    name = re.sub(r'^saint\s', 'st ', name.strip())
+    return re.sub(r'\s+', ' ', name)
+
+
+class Gazetteer:
+    '''
+    Coordinates of the places of a CSV with the columns city, state,
+    latitude and longitude.
+    '''
+
+    def __init__(self, places):
+        self.places = places
+
+    @classmethod
+    def load(cls, path=GAZETTEER_PATH):
+        places = {}
+        with open(path, newline='') as f:
+            for row in csv.DictReader(f):
+                key = (normalize(row['city']), row['state'].upper())
+                places[key] = (float(row['latitude']), float(row['longitude']))
+        return cls(places)
+
+    def lookup(self, city, state):
+        '''Returns (latitude, longitude) of a city, None if it is unknown.
+        '''
+        return self.places.get((normalize(city or ''), (state or '').upper()))
+
+
+@lru_cache(maxsize=None)
+def gazetteer():
+    return Gazetteer.load()
+
+
+def geocode(city, state):
+    '''Returns the latitude, longitude and geohash columns of a venue,
+    located at the center of its city.
+    '''
+    location = gazetteer().lookup(city, state)
+    if location is None:
+        return {'latitude': None, 'longitude': None, 'geohash': None}
+    return {
+        'latitude': location[0],
+        'longitude': location[1],
+        'geohash': encode(*location)
+    }
+
+
+@click.command('geocode-venues')
+@click.option('--all', 'everything', is_flag=True,
+              help='geocode the venues that have a location too')
+@click.option('--batch-size', default=1000, help='venues updated per statement')
+@with_appcontext
+def geocode_venues_command(everything, batch_size):
+    '''
+    Sets the location of the venues from the gazetteer and lists the
+    venues of the cities it does not know.
+    '''
+    query = db.session.query(
+        Venue.id, Venue.name, Venue.city, Venue.state).order_by(Venue.id)
+    if not everything:
+        query = query.filter(Venue.latitude.is_(None))
+
+    table = Venue.__table__
+    statement = table.update().where(table.c.id == bindparam('venue_id')).\
+        values(latitude=bindparam('latitude'), longitude=bindparam('longitude'),
+               geohash=bindparam('geohash'))
+
+    located = total = 0
+    batch = []
+    for venue_id, name, city, state in query.all():
+        batch.append(dict(geocode(city, state), venue_id=venue_id))
+        total += 1
+        if batch[-1]['latitude'] is not None:
+            located += 1
+        else:
+            click.echo('Venue {} ({}): {}, {} is not in the gazetteer.'.format(
+                venue_id, name, city, state))
+        if len(batch) == batch_size:
+            db.session.execute(statement, batch)
+            db.session.commit()
+            batch = []
+    if batch:
+        db.session.execute(statement, batch)
+        db.session.commit()
+    click.echo('Located {} of {} venues.'.format(located, total))
@@ -0,0 +1,134 @@
+import heapq
+from collections import defaultdict, namedtuple
+
+from models import db, Venue, Artist
+from geo import normalize
+from common.liveindex import LiveIndex
+
+#----------------------------------------------------------------------------#
+# Matchmaking
+#     venues seeking talent and artists seeking a venue are matched by
+#     the genres they share, in the same city or state. Inverted indexes
+#     from (state, city, genre) and (state, genre) to the seeking
+#     profiles give the candidates of a profile without scanning the
+#     others, they are updated by every commit, see common/liveindex.py
+#----------------------------------------------------------------------------#
+
+SCOPES = ('city', 'state')
+
+Profile = namedtuple('Profile', 'kind id name city state genres seeking')
+
+
+def parse_genres(genres):
+    return frozenset(genre.strip() for genre in (genres or '').split(',')
+                     if genre.strip())
+
+
+def score(genres, other):
+    '''Shared genres over all the genres of both, 0 to 1.
+    '''
+    shared = len(genres & other)
+    return shared / (len(genres) + len(other) - shared) if shared else 0.0
+
+
+def format_match(profile, match_score, candidate):
+    return {
+        'id': candidate.id,
+        'name': candidate.name,
+        'city': candidate.city,
+        'state': candidate.state,
+        'genres': sorted(candidate.genres),
+        'shared_genres': sorted(profile.genres & candidate.genres),
+        'score': round(match_score, 4)
+    }
+
+
+class MatchIndex(LiveIndex):
+    models = (Venue, Artist)
+    kinds = {Venue: 'venue', Artist: 'artist'}
+    counterparts = {'venue': 'artist', 'artist': 'venue'}
+
+    def __init__(self, session=None, **kwargs):
+        self.clear()
+        super().__init__(session, **kwargs)
+
+    def clear(self):
+        self.profiles = {}
+        # scope -> kind -> key -> ids of the seeking profiles
+        self.postings = {scope: {kind: defaultdict(set) for kind in self.counterparts}
+                         for scope in SCOPES}
+
+    @staticmethod
+    def keys(profile, scope):
+        state = profile.state.upper()
+        if scope == 'city':
+            place = (state, normalize(profile.city))
+            return [place + (genre,) for genre in profile.genres]
+        return [(state, genre) for genre in profile.genres]
+
+    def load(self):
+        for model in self.models:
+            seeking = Venue.seeking_talent if model is Venue else Artist.seeking_venue
+            rows = db.session.query(
+                model.id, model.name, model.city, model.state, model.genres,
+                seeking)
+            for id, name, city, state, genres, is_seeking in rows:
+                yield Profile(self.kinds[model], id, name, city, state,
+                              parse_genres(genres), is_seeking)
+
+    def record(self, obj):
+        kind = self.kinds[type(obj)]
+        seeking = obj.seeking_talent if kind == 'venue' else obj.seeking_venue
+        return Profile(kind, obj.id, obj.name, obj.city, obj.state,
+                       parse_genres(obj.genres), bool(seeking))
+
+    def put(self, profile):
+        self.profiles[(profile.kind, profile.id)] = profile
+        if profile.seeking:
+            for scope in SCOPES:
+                postings = self.postings[scope][profile.kind]
+                for key in self.keys(profile, scope):
+                    postings[key].add(profile.id)
+
+    def discard(self, model, id):
+        kind = self.kinds[model]
+        profile = self.profiles.pop((kind, id), None)
+        if profile is None or not profile.seeking:
+            return
+        for scope in SCOPES:
+            postings = self.postings[scope][kind]
+            for key in self.keys(profile, scope):
+                ids = postings.get(key)
+                if ids is not None:
+                    ids.discard(id)
+                    if not ids:
+                        del postings[key]
+
+    def matches(self, kind, id, k=10, scope='city'):
+        '''
+        Returns the k best matches of a venue or an artist among the
+        seeking profiles of the other kind, best first, None if the venue
+        or artist does not exist.
+        '''
+        self.ensure_loaded()
+        with self.lock:
+            profile = self.profiles.get((kind, id))
+            if profile is None:
+                return None
+            other = self.counterparts[kind]
+            postings = self.postings[scope][other]
+
+            # The profiles sharing at least one genre
+            ids = set()
+            for key in self.keys(profile, scope):
+                ids.update(postings.get(key, ()))
+            candidates = [self.profiles[(other, candidate)] for candidate in ids]
+
+        scored = [(score(profile.genres, candidate.genres), candidate)
+                  for candidate in candidates]
+        best = heapq.nlargest(k, scored, key=lambda pair: (pair[0], -pair[1].id))
+        return [format_match(profile, match_score, candidate)
+                for match_score, candidate in best]
+
+
+match_index = MatchIndex(db.session)
@@ -1,38 +1,107 @@
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey
+import re
+import time
+from datetime import timedelta
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import Column, String, Integer, Boolean, Date, DateTime, Float, ForeignKey, Index, PrimaryKeyConstraint, and_, exists, text
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from sqlalchemy.ext.declarative import declared_attr
+from sqlalchemy.orm.exc import StaleDataError
+
+from common.database import configure_database, register_pool_metrics
+from common.projection import Projection
+from common.softdelete import SoftDelete, install_filters, purge
 
 db = SQLAlchemy()
 
 #----------------------------------------------------------------------------#
 # setup_db(app)
 #     binds a flask application and a SQLAlchemy service
+#     pool settings come from the environment, see common/database.py
 #----------------------------------------------------------------------------#
 
 def setup_db(app):
+    configure_database(app)
     db.app = app
     db.init_app(app)
-    migrate = Migrate(app, db)
+    register_pool_metrics(app, db)
+    migrate = Migrate(app, db, include_object=include_object)
+    # Soft deleted rows are left out of every query, see CRUDMethods
+    install_filters()
+    app.cli.add_command(purge_deleted_command)
+
+# Monthly partitions of shows, created by sql/001_partition_shows.sql and
+# flask archive-shows, not by migrations
+SHOW_PARTITION = re.compile(r'^shows_(p\d{6}|default)$')
+
+def include_object(obj, name, type_, reflected, compare_to):
+    return not (type_ == 'table' and reflected and SHOW_PARTITION.match(name))
 
 #----------------------------------------------------------------------------#
 # CRUDMethods
 #----------------------------------------------------------------------------#
-class CRUDMethods(db.Model):
+class ConcurrentUpdateError(Exception):
+    '''
+    The row was changed by someone else since the values were read
+    '''
+
+
+class CRUDMethods(SoftDelete, db.Model):
     '''
     Extend the base Model class to add common methods
+    Deleting only sets deleted_at, on the row and its shows, the rows are
+    removed later by flask purge-deleted
+    Every UPDATE checks and increments version, an update based on an
+    outdated row fails instead of overwriting a concurrent one
     '''
     __abstract__ = True
 
+    version = Column(Integer, nullable=False, default=1, server_default='1')
+
+    @declared_attr
+    def __mapper_args__(cls):
+        return {'version_id_col': cls.version}
+
     def insert(self):
         db.session.add(self)
         db.session.commit()
 
     def delete(self):
-        db.session.delete(self)
+        self.soft_delete(db.session)
         db.session.commit()
 
-    def update(self):
-        db.session.commit()
+    def update(self, values=None, version=None):
+        '''
+        Without values commits the changes made to the row.
+        With values, a dict of attribute names to values, sets the ones
+        that differ from the row and writes only those columns, nothing
+        at all when none differ. version is the version of the row the
+        values were edited from.
+        Returns the names of the changed attributes.
+        Raises ConcurrentUpdateError when the row changed in between.
+        '''
+        if values is None:
+            changed = None
+        else:
+            if version is not None and version != self.version:
+                raise ConcurrentUpdateError(
+                    '{} {} is at version {}, not {}'.format(
+                        type(self).__name__, self.id, self.version, version))
+            changed = [name for name, value in values.items()
+                       if getattr(self, name) != value]
+            if not changed:
+                return changed
+            for name in changed:
+                setattr(self, name, values[name])
+
+        try:
+            db.session.commit()
+        except StaleDataError as e:
+            db.session.rollback()
+            raise ConcurrentUpdateError(str(e))
+        return changed
 
 #----------------------------------------------------------------------------#
 # Venue
@@ -53,8 +122,17 @@ class Venue(CRUDMethods):
     website = Column(String(120))
     seeking_talent = Column(Boolean, nullable=False, default=False)
     seeking_description = Column(String)
+    # Located from city and state, see geo.py
+    latitude = Column(Float)
+    longitude = Column(Float)
+    geohash = Column(String(12))
 
-    shows = db.relationship('Show', backref='venue', lazy=True, cascade='all, delete-orphan')
+    # Venues near a point are ranges of geohashes, see geo.py
+    __table_args__ = (
+        Index('ix_venues_geohash', 'geohash'),
+    )
+
+    shows = db.relationship('Show', backref='venue', lazy=True, passive_deletes='all')
 
     def __init__(self, name, city, state, address, phone, image_link, facebook_link, genres, website, seeking_talent, seeking_description):
         self.name = name
@@ -75,6 +153,17 @@ class Venue(CRUDMethods):
             'name': self.name
         } 
 
+# The fields of format() by default, city and state for grouping by area,
+# the location for searches by distance
+Venue.projection = Projection({
+    'id': Venue.id,
+    'name': Venue.name,
+    'city': Venue.city,
+    'state': Venue.state,
+    'latitude': Venue.latitude,
+    'longitude': Venue.longitude
+}, default=('id', 'name'))
+
 #----------------------------------------------------------------------------#
 # Artist
 #----------------------------------------------------------------------------#
@@ -94,7 +183,7 @@ class Artist(CRUDMethods):
     seeking_venue = Column(Boolean, nullable=False, default=False)
     seeking_description = Column(String)
 
-    shows = db.relationship('Show', backref='artist', lazy=True, cascade='all, delete-orphan')
+    shows = db.relationship('Show', backref='artist', lazy=True, passive_deletes='all')
 
     def __init__(self, name, city, state, phone, image_link, facebook_link, genres, website, seeking_venue, seeking_description):
         self.name = name
@@ -114,17 +203,38 @@ class Artist(CRUDMethods):
           'name': self.name
         } 
 
+Artist.projection = Projection({
+    'id': Artist.id,
+    'name': Artist.name
+})
+
 #----------------------------------------------------------------------------#
 # Show
 #----------------------------------------------------------------------------#
 
+# Shows not yet added to the statistics, or deleted but still counted,
+# see analytics.py
+STATS_PENDING = '(counted_genres IS NULL) = (deleted_at IS NULL)'
+
+
 class Show(CRUDMethods):
     __tablename__ = 'shows'
+    # Schedules of a venue or an artist are range scans, see scheduling.py
+    __table_args__ = (
+        Index('ix_shows_venue_id_start_time', 'venue_id', 'start_time'),
+        Index('ix_shows_artist_id_start_time', 'artist_id', 'start_time'),
+        Index('ix_shows_stats_pending', 'id',
+              postgresql_where=text(STATS_PENDING),
+              sqlite_where=text(STATS_PENDING)),
+    )
 
     id = Column(Integer, primary_key=True)
-    venue_id = Column(Integer, ForeignKey('venues.id'), nullable=False)
-    artist_id = Column(Integer, ForeignKey('artists.id'), nullable=False)
+    venue_id = Column(Integer, ForeignKey('venues.id', ondelete='CASCADE'), nullable=False)
+    artist_id = Column(Integer, ForeignKey('artists.id', ondelete='CASCADE'), nullable=False)
     start_time = Column(DateTime, nullable=False)
+    # The artist's genres the show was counted under in the statistics,
+    # NULL while it is not counted
+    counted_genres = Column(String(255))
 
     def __init__(self, venue_id, artist_id, start_time):
       self.venue_id = venue_id
@@ -141,5 +251,105 @@ class Show(CRUDMethods):
             "artist_id": self.artist_id,
             "artist_name": self.artist.name,
             "artist_image_link": self.artist.image_link,
-            "start_time": str(self.start_time)
-        }
\ No newline at end of file
+            "start_time": self.start_time
+        }
+
+# The fields of format(), selected from shows joined with venues and
+# artists, see query_shows()
+Show.projection = Projection({
+    'id': Show.id,
+    'venue_id': Show.venue_id,
+    'venue_name': Venue.name,
+    'artist_id': Show.artist_id,
+    'artist_name': Artist.name,
+    'artist_image_link': Artist.image_link,
+    'start_time': Show.start_time
+})
+
+def query_shows(fields=None):
+    return Show.projection.query(db.session, fields).\
+        join(Venue, Show.venue_id == Venue.id).\
+        join(Artist, Show.artist_id == Artist.id)
+
+#----------------------------------------------------------------------------#
+# ShowArchive
+#     shows older than SHOW_ARCHIVE_AFTER_DAYS, moved out of shows by
+#     flask archive-shows, see archive.py
+#----------------------------------------------------------------------------#
+
+class ShowArchive(db.Model):
+    __tablename__ = 'shows_archive'
+    __table_args__ = (
+        Index('ix_shows_archive_venue_id_start_time', 'venue_id', 'start_time'),
+        Index('ix_shows_archive_artist_id_start_time', 'artist_id', 'start_time'),
+    )
+
+    # The id the show had in shows
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    venue_id = Column(Integer, nullable=False)
+    artist_id = Column(Integer, nullable=False)
+    start_time = Column(DateTime, nullable=False)
+
+#----------------------------------------------------------------------------#
+# ShowStat
+#     number of shows per venue, artist, genre and in all, per month,
+#     kept up to date by flask refresh-stats, see analytics.py
+#----------------------------------------------------------------------------#
+
+class ShowStat(db.Model):
+    __tablename__ = 'show_stats'
+    __table_args__ = (
+        PrimaryKeyConstraint('dimension', 'month', 'key'),
+    )
+
+    # venue, artist, genre or all
+    dimension = Column(String(16), nullable=False)
+    # First day of the month of the shows
+    month = Column(Date, nullable=False)
+    # The venue or artist id, the genre, or '' for all the shows
+    key = Column(String(120), nullable=False)
+    shows = Column(Integer, nullable=False, default=0)
+
+#----------------------------------------------------------------------------#
+# purge_deleted_command()
+#     removes the soft deleted rows in batches, run it from cron or as a
+#     worker process with --interval
+#----------------------------------------------------------------------------#
+
+# Rows still counted in the statistics are kept until flask refresh-stats
+# takes them out, purging a venue or an artist deletes its shows too
+shows_table = Show.__table__
+UNCOUNTED = {
+    Show: shows_table.c.counted_genres.is_(None),
+    Venue: ~exists().where(and_(shows_table.c.venue_id == Venue.__table__.c.id,
+                                shows_table.c.counted_genres.isnot(None))),
+    Artist: ~exists().where(and_(shows_table.c.artist_id == Artist.__table__.c.id,
+                                 shows_table.c.counted_genres.isnot(None)))
+}
+
+# Archived shows have no foreign keys, they go with their venue or artist
+archive_table = ShowArchive.__table__
+ARCHIVED_SHOWS = {
+    Venue: lambda session, ids: session.execute(
+        archive_table.delete().where(archive_table.c.venue_id.in_(ids))),
+    Artist: lambda session, ids: session.execute(
+        archive_table.delete().where(archive_table.c.artist_id.in_(ids)))
+}
+
+@click.command('purge-deleted')
+@click.option('--batch-size', default=1000, help='rows deleted per statement')
+@click.option('--older-than', default=0, help='keep rows deleted in the last minutes')
+@click.option('--interval', default=0, help='purge again every seconds, forever')
+@with_appcontext
+def purge_deleted_command(batch_size, older_than, interval):
+    while True:
+        # Shows first, the venues and artists they belong to after
+        deleted = purge(db.session, [Show, Venue, Artist], batch_size,
+                        timedelta(minutes=older_than), where=UNCOUNTED,
+                        before_delete=ARCHIVED_SHOWS)
+        click.echo(', '.join('{} {}'.format(count, table)
+                             for table, count in deleted.items()) + ' purged.')
+        db.session.remove()
+        if not interval:
+            break
+        time.sleep(interval)
@@ -0,0 +1,309 @@
+import csv
+from bisect import bisect_left, bisect_right
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta
+
+import click
+import dateutil.parser
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import or_
+
+from models import db, Venue, Artist, Show
+from common.liveindex import LiveIndex
+
+#----------------------------------------------------------------------------#
+# Show scheduling
+#     a venue or an artist is double booked when two of its shows overlap,
+#     every show lasts SHOW_DURATION_MINUTES (config.py). The bookings
+#     of the shows listed are kept in memory, updated by every commit,
+#     see common/liveindex.py
+#----------------------------------------------------------------------------#
+
+DEFAULT_DURATION_MINUTES = 180
+
+# show_id is None for the rows of an import, row is their position
+Booking = namedtuple('Booking', 'show_id row venue_id artist_id start_time')
+Conflict = namedtuple('Conflict', 'kind booking')
+
+
+def show_duration():
+    return timedelta(minutes=current_app.config.get(
+        'SHOW_DURATION_MINUTES', DEFAULT_DURATION_MINUTES))
+
+
+class IntervalIndex:
+    '''
+    The start times of the bookings of each venue or artist, sorted.
+    All bookings last the same duration, so the ones overlapping an
+    interval are a slice of the list, found by bisection.
+    '''
+
+    def __init__(self, duration):
+        self.duration = duration
+        self._starts = defaultdict(list)
+        self._bookings = defaultdict(list)
+
+    def add(self, key, booking):
+        starts = self._starts[key]
+        position = bisect_right(starts, booking.start_time)
+        starts.insert(position, booking.start_time)
+        self._bookings[key].insert(position, booking)
+
+    def remove(self, key, booking):
+        starts = self._starts.get(key, [])
+        position = bisect_left(starts, booking.start_time)
+        while position < len(starts) and starts[position] == booking.start_time:
+            if self._bookings[key][position] == booking:
+                del starts[position]
+                del self._bookings[key][position]
+                return
+            position += 1
+
+    def bookings(self, key):
+        return list(self._bookings.get(key, ()))
+
+    def overlapping(self, key, start, end):
+        '''Returns the bookings of key overlapping [start, end).
+        '''
+        starts = self._starts.get(key)
+        if not starts:
+            return []
+        # A booking overlaps when it starts before end and ends after start
+        low = bisect_right(starts, start - self.duration)
+        high = bisect_left(starts, end)
+        return self._bookings[key][low:high]
+
+    def __len__(self):
+        return sum(len(starts) for starts in self._starts.values())
+
+
+class ScheduleIndex:
+    '''
+    Interval indexes of the bookings of the venues and of the artists.
+    '''
+
+    def __init__(self, duration):
+        self.duration = duration
+        self.venues = IntervalIndex(duration)
+        self.artists = IntervalIndex(duration)
+
+    def add(self, booking):
+        self.venues.add(booking.venue_id, booking)
+        self.artists.add(booking.artist_id, booking)
+
+    def remove(self, booking):
+        self.venues.remove(booking.venue_id, booking)
+        self.artists.remove(booking.artist_id, booking)
+
+    def conflicts(self, venue_id, artist_id, start_time, duration=None):
+        '''Returns the bookings a new show would overlap, venue ones first.
+        '''
+        end = start_time + (duration or self.duration)
+        return [Conflict('venue', booking) for booking in
+                self.venues.overlapping(venue_id, start_time, end)] + \
+            [Conflict('artist', booking) for booking in
+             self.artists.overlapping(artist_id, start_time, end)]
+
+    @classmethod
+    def load(cls, duration, venue_ids=None, artist_ids=None, start=None,
+             end=None):
+        '''
+        Indexes the shows of the venues and artists starting in [start, end),
+        all of them when no ids are given. The (venue_id, start_time) and
+        (artist_id, start_time) indexes of shows keep the query cheap.
+        '''
+        index = cls(duration)
+        query = db.session.query(
+            Show.id, Show.venue_id, Show.artist_id, Show.start_time)
+
+        filters = []
+        if venue_ids is not None:
+            filters.append(Show.venue_id.in_(venue_ids))
+        if artist_ids is not None:
+            filters.append(Show.artist_id.in_(artist_ids))
+        if filters:
+            query = query.filter(or_(*filters))
+        if start is not None:
+            query = query.filter(Show.start_time >= start)
+        if end is not None:
+            query = query.filter(Show.start_time < end)
+
+        for show_id, venue_id, artist_id, start_time in query:
+            index.add(Booking(show_id, None, venue_id, artist_id, start_time))
+        return index
+
+
+class LiveSchedule(LiveIndex):
+    '''
+    The ScheduleIndex of the shows that can still overlap a new one,
+    built on first use since the show duration comes from the app's
+    config. Deleting a venue or an artist removes its shows.
+    '''
+    models = (Show,)
+    parents = (Venue, Artist)
+
+    def __init__(self, session=None, **kwargs):
+        self.schedule = None
+        self.bookings = {}
+        super().__init__(session, **kwargs)
+
+    def clear(self):
+        self.schedule = ScheduleIndex(show_duration())
+        self.bookings = {}
+
+    def load(self):
+        # Shows ended before now never overlap a new one
+        rows = db.session.query(
+            Show.id, Show.venue_id, Show.artist_id, Show.start_time).filter(
+            Show.start_time >= datetime.now() - self.schedule.duration)
+        for show_id, venue_id, artist_id, start_time in rows:
+            yield Booking(show_id, None, venue_id, artist_id, start_time)
+
+    def record(self, obj):
+        return Booking(obj.id, None, obj.venue_id, obj.artist_id, obj.start_time)
+
+    def put(self, booking):
+        self.bookings[booking.show_id] = booking
+        self.schedule.add(booking)
+
+    def discard(self, model, id):
+        if model is Show:
+            show_ids = [id]
+        else:
+            index = self.schedule.venues if model is Venue else self.schedule.artists
+            show_ids = [booking.show_id for booking in index.bookings(id)]
+        for show_id in show_ids:
+            booking = self.bookings.pop(show_id, None)
+            if booking is not None:
+                self.schedule.remove(booking)
+
+    def conflicts(self, venue_id, artist_id, start_time, duration=None):
+        self.ensure_loaded()
+        with self.lock:
+            return self.schedule.conflicts(
+                venue_id, artist_id, start_time, duration)
+
+
+schedule_index = LiveSchedule(db.session)
+
+
+def find_conflicts(venue_id, artist_id, start_time, duration=None):
+    '''Returns the shows a new show would overlap, from memory.
+    '''
+    return schedule_index.conflicts(venue_id, artist_id, start_time, duration)
+
+
+def stored_conflicts(venue_id, artist_id, start_time, duration=None):
+    '''Returns the shows a new show would overlap, from the database.
+    '''
+    duration = duration or show_duration()
+    index = ScheduleIndex.load(
+        duration, [venue_id], [artist_id],
+        start_time - duration, start_time + duration)
+    return index.conflicts(venue_id, artist_id, start_time)
+
+
+def book(venue_id, artist_id, start_time):
+    '''
+    Lists a show unless it overlaps another. Returns the new Show and the
+    conflicts, the Show is None when there are some.
+
+    The database decides, while the venue and artist rows are locked
+    (SELECT ... FOR UPDATE) so concurrent bookings of either wait for
+    this one to commit. The in-memory index misses the shows other
+    processes listed and keeps the ones they deleted until it is
+    rebuilt, its conflicts are only dropped from it when the database
+    has none. SQLite ignores the locks and writes one transaction at a
+    time.
+    '''
+    hinted = find_conflicts(venue_id, artist_id, start_time)
+
+    # Always in this order, so two bookings never wait for each other
+    db.session.query(Venue.id).filter(Venue.id == venue_id).\
+        with_for_update().all()
+    db.session.query(Artist.id).filter(Artist.id == artist_id).\
+        with_for_update().all()
+    conflicts = stored_conflicts(venue_id, artist_id, start_time)
+    if conflicts:
+        db.session.rollback()
+        return None, conflicts
+
+    # Deleted since the index was built
+    with schedule_index.lock:
+        for conflict in hinted:
+            schedule_index.discard(Show, conflict.booking.show_id)
+
+    show = Show(venue_id=venue_id, artist_id=artist_id, start_time=start_time)
+    show.insert()
+    return show, []
+
+
+def conflict_report(rows, duration=None):
+    '''
+    Checks shows to import, given as (venue_id, artist_id, start_time),
+    against the scheduled shows and each other.
+
+    Returns a dict per conflicting row with its position, values and
+    the bookings it overlaps.
+    '''
+    duration = duration or show_duration()
+    bookings = [Booking(None, row, venue_id, artist_id, start_time)
+                for row, (venue_id, artist_id, start_time) in enumerate(rows)]
+    if not bookings:
+        return []
+
+    start_times = [booking.start_time for booking in bookings]
+    index = ScheduleIndex.load(
+        duration,
+        {booking.venue_id for booking in bookings},
+        {booking.artist_id for booking in bookings},
+        min(start_times) - duration, max(start_times) + duration)
+
+    report = []
+    for booking in bookings:
+        conflicts = index.conflicts(
+            booking.venue_id, booking.artist_id, booking.start_time)
+        if conflicts:
+            report.append({
+                'row': booking.row,
+                'venue_id': booking.venue_id,
+                'artist_id': booking.artist_id,
+                'start_time': booking.start_time,
+                'conflicts': conflicts
+            })
+        # Later rows are checked against this one too
+        index.add(booking)
+    return report
+
+
+def describe(conflict):
+    booking = conflict.booking
+    if booking.show_id is not None:
+        source = 'show {}'.format(booking.show_id)
+    else:
+        source = 'row {}'.format(booking.row + 1)
+    return '{} {} already booked by {} at {}'.format(
+        conflict.kind,
+        booking.venue_id if conflict.kind == 'venue' else booking.artist_id,
+        source, booking.start_time)
+
+
+@click.command('check-shows')
+@click.argument('filename', type=click.Path(exists=True, dir_okay=False))
+@with_appcontext
+def check_shows_command(filename):
+    '''
+    Reports the double bookings of a CSV of shows to import, with the
+    columns venue_id, artist_id and start_time.
+    '''
+    with open(filename, newline='') as f:
+        rows = [(int(row['venue_id']), int(row['artist_id']),
+                 dateutil.parser.parse(row['start_time']))
+                for row in csv.DictReader(f)]
+
+    report = conflict_report(rows)
+    for entry in report:
+        for conflict in entry['conflicts']:
+            click.echo('row {}: {}'.format(entry['row'] + 1, describe(conflict)))
+    click.echo('{} of {} shows conflict.'.format(len(report), len(rows)))
@@ -0,0 +1,96 @@
+--
+-- Partition shows by month of start_time.
+--
+-- Queries on upcoming shows then only read the partitions from the
+-- current month on, and flask archive-shows drops whole past months
+-- instead of deleting their rows one by one. Shows outside of every
+-- month partition go to shows_default. Requires PostgreSQL 11 or later.
+--
+-- Run once, after flask db upgrade, from the starter_code folder:
+--
+--     psql fyyur < sql/001_partition_shows.sql
+--
+-- The shows are copied, the table is locked meanwhile.
+--
+
+BEGIN;
+
+-- Creates the partition of a month, moving the shows of that month out
+-- of shows_default first. Does nothing when it exists.
+CREATE OR REPLACE FUNCTION create_show_partition(month date) RETURNS text
+LANGUAGE plpgsql AS $$
+DECLARE
+    lower_bound date := date_trunc('month', month)::date;
+    upper_bound date := (date_trunc('month', month) + interval '1 month')::date;
+    partition_name text := 'shows_p' || to_char(lower_bound, 'YYYYMM');
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN partition_name;
+    END IF;
+    EXECUTE format(
+        'CREATE TABLE %I (LIKE shows INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+        partition_name);
+    EXECUTE format(
+        'WITH moved AS (DELETE FROM shows_default'
+        '    WHERE start_time >= %L AND start_time < %L RETURNING *)'
+        ' INSERT INTO %I SELECT * FROM moved',
+        lower_bound, upper_bound, partition_name);
+    EXECUTE format(
+        'ALTER TABLE shows ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+        partition_name, lower_bound, upper_bound);
+    RETURN partition_name;
+END
+$$;
+
+LOCK TABLE public.shows IN ACCESS EXCLUSIVE MODE;
+
+ALTER TABLE public.shows RENAME TO shows_unpartitioned;
+-- The ids keep coming from the same sequence
+ALTER SEQUENCE public.shows_id_seq OWNED BY NONE;
+
+CREATE TABLE public.shows (LIKE public.shows_unpartitioned INCLUDING DEFAULTS)
+    PARTITION BY RANGE (start_time);
+
+CREATE TABLE public.shows_default PARTITION OF public.shows DEFAULT;
+
+-- Every month from the first show to a year from now
+SELECT create_show_partition(month::date)
+    FROM generate_series(
+        date_trunc('month', coalesce(
+            (SELECT min(start_time) FROM public.shows_unpartitioned), now())),
+        date_trunc('month', now()) + interval '12 months',
+        interval '1 month') AS month;
+
+INSERT INTO public.shows SELECT * FROM public.shows_unpartitioned;
+
+DROP TABLE public.shows_unpartitioned;
+
+ALTER SEQUENCE public.shows_id_seq OWNED BY public.shows.id;
+
+-- Constraints and indexes are built once the rows are in, on every
+-- partition. The key of a partitioned table includes start_time.
+ALTER TABLE public.shows
+    ADD CONSTRAINT shows_pkey PRIMARY KEY (id, start_time);
+
+ALTER TABLE public.shows
+    ADD CONSTRAINT shows_venue_id_fkey FOREIGN KEY (venue_id) REFERENCES public.venues(id) ON DELETE CASCADE;
+
+ALTER TABLE public.shows
+    ADD CONSTRAINT shows_artist_id_fkey FOREIGN KEY (artist_id) REFERENCES public.artists(id) ON DELETE CASCADE;
+
+CREATE INDEX ix_shows_venue_id_start_time
+    ON public.shows USING btree (venue_id, start_time);
+
+CREATE INDEX ix_shows_artist_id_start_time
+    ON public.shows USING btree (artist_id, start_time);
+
+CREATE INDEX ix_shows_deleted_at
+    ON public.shows USING btree (deleted_at);
+
+CREATE INDEX ix_shows_stats_pending
+    ON public.shows USING btree (id)
+    WHERE (counted_genres IS NULL) = (deleted_at IS NULL);
+
+ANALYZE public.shows;
+
+COMMIT;
@@ -0,0 +1,683 @@
+import math
+import os
+import sys
+import unittest
+from unittest import mock
+from datetime import datetime, timedelta
+
+# The shared modules of the projects folder, before any import of them
+sys.path.append(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+from flask import Flask, url_for
+from sqlalchemy import event
+
+from app import app
+from models import (db, Venue, Artist, Show, ShowArchive, ShowStat,
+                    ConcurrentUpdateError)
+from testing import DatabaseTestCase
+from common.assets import IMMUTABLE, Assets
+from common.softdelete import include_deleted, purge, utcnow
+import analytics
+import archive
+import geo
+import scheduling
+from matching import match_index
+from autocomplete import SortedKeys, fold, suggest_index
+from scheduling import Booking, IntervalIndex, ScheduleIndex
+
+HOURS = timedelta(hours=1)
+EVENING = datetime(2030, 1, 1, 20)
+
+
+class IntervalIndexTestCase(unittest.TestCase):
+    """Overlaps of bookings of the same duration"""
+
+    def setUp(self):
+        self.index = IntervalIndex(3 * HOURS)
+        self.booking = Booking(1, None, 1, 1, EVENING)
+        self.index.add(1, self.booking)
+
+    def test_overlapping_intervals(self):
+        self.assertEqual(self.index.overlapping(
+            1, EVENING - 2 * HOURS, EVENING + HOURS), [self.booking])
+        self.assertEqual(self.index.overlapping(
+            1, EVENING + 2 * HOURS, EVENING + 5 * HOURS), [self.booking])
+
+    def test_adjacent_intervals_do_not_overlap(self):
+        self.assertEqual(self.index.overlapping(
+            1, EVENING - 3 * HOURS, EVENING), [])
+        self.assertEqual(self.index.overlapping(
+            1, EVENING + 3 * HOURS, EVENING + 6 * HOURS), [])
+
+    def test_other_keys_do_not_overlap(self):
+        self.assertEqual(self.index.overlapping(
+            2, EVENING, EVENING + 3 * HOURS), [])
+
+    def test_remove_keeps_same_start_bookings(self):
+        other = Booking(2, None, 1, 2, EVENING)
+        self.index.add(1, other)
+        self.index.remove(1, self.booking)
+
+        self.assertEqual(self.index.overlapping(
+            1, EVENING, EVENING + HOURS), [other])
+        self.assertEqual(len(self.index), 1)
+
+    def test_schedule_conflicts_list_venue_first(self):
+        schedule = ScheduleIndex(3 * HOURS)
+        schedule.add(self.booking)
+
+        conflicts = schedule.conflicts(1, 1, EVENING + HOURS)
+
+        self.assertEqual([conflict.kind for conflict in conflicts],
+                         ['venue', 'artist'])
+
+
+class SchedulingTestCase(DatabaseTestCase):
+    """Double bookings of the shows listed"""
+
+    def setUp(self):
+        super().setUp()
+        self.venue = self.add_venue()
+        self.artist = self.add_artist()
+        self.show = self.add_show(self.venue, self.artist, EVENING)
+
+    def test_committed_show_is_indexed(self):
+        other = self.add_show(self.venue, self.artist, EVENING + 6 * HOURS)
+
+        conflicts = scheduling.find_conflicts(
+            self.venue.id, self.artist.id, EVENING + 7 * HOURS)
+
+        self.assertEqual({conflict.booking.show_id for conflict in conflicts},
+                         {other.id})
+
+    def test_deleted_show_is_removed(self):
+        scheduling.find_conflicts(self.venue.id, self.artist.id, EVENING)
+        self.show.delete()
+
+        self.assertEqual(scheduling.find_conflicts(
+            self.venue.id, self.artist.id, EVENING), [])
+
+    def test_rolled_back_show_is_not_indexed(self):
+        scheduling.find_conflicts(self.venue.id, self.artist.id, EVENING)
+        db.session.add(Show(self.venue.id, self.artist.id, EVENING + 6 * HOURS))
+        db.session.flush()
+        db.session.rollback()
+
+        self.assertEqual(scheduling.find_conflicts(
+            self.venue.id, self.artist.id, EVENING + 6 * HOURS), [])
+
+    def test_book_refuses_overlapping_show(self):
+        show, conflicts = scheduling.book(
+            self.venue.id, self.artist.id, EVENING + HOURS)
+
+        self.assertIsNone(show)
+        self.assertEqual(len(conflicts), 2)
+        self.assertEqual(Show.query.count(), 1)
+
+    def test_book_checks_shows_missing_from_the_index(self):
+        scheduling.find_conflicts(self.venue.id, self.artist.id, EVENING)
+        # Listed by another process, the index does not know of it
+        db.session.execute(Show.__table__.insert().values(
+            venue_id=self.venue.id, artist_id=self.artist.id,
+            start_time=EVENING + 6 * HOURS))
+        db.session.commit()
+
+        show, conflicts = scheduling.book(
+            self.venue.id, self.artist.id, EVENING + 7 * HOURS)
+
+        self.assertIsNone(show)
+        self.assertTrue(conflicts)
+
+    def test_deleted_venue_removes_its_shows(self):
+        scheduling.find_conflicts(self.venue.id, self.artist.id, EVENING)
+        other = self.add_venue(name='Park Square Live Music & Coffee')
+        self.venue.delete()
+
+        self.assertEqual(scheduling.find_conflicts(
+            other.id, self.artist.id, EVENING), [])
+        show, conflicts = scheduling.book(other.id, self.artist.id, EVENING)
+        self.assertEqual(conflicts, [])
+
+    def test_book_confirms_index_conflicts_in_the_database(self):
+        scheduling.find_conflicts(self.venue.id, self.artist.id, EVENING)
+        other = self.add_venue(name='Park Square Live Music & Coffee')
+        # Deleted by another process, the index still has it
+        table = Show.__table__
+        db.session.execute(table.update().values(deleted_at=utcnow()))
+        db.session.commit()
+        self.assertTrue(scheduling.find_conflicts(
+            other.id, self.artist.id, EVENING))
+
+        show, conflicts = scheduling.book(other.id, self.artist.id, EVENING)
+
+        self.assertEqual(conflicts, [])
+        self.assertEqual(Show.query.count(), 1)
+        conflicts = scheduling.find_conflicts(other.id, self.artist.id, EVENING)
+        self.assertEqual([conflict.booking.show_id for conflict in conflicts],
+                         [show.id, show.id])
+
+    def test_past_shows_are_not_loaded(self):
+        past = self.add_show(self.venue, self.artist, datetime(2000, 1, 1))
+        scheduling.find_conflicts(self.venue.id, self.artist.id, EVENING)
+
+        self.assertNotIn(past.id, scheduling.schedule_index.bookings)
+        self.assertIn(self.show.id, scheduling.schedule_index.bookings)
+
+    def test_book_lists_free_show(self):
+        show, conflicts = scheduling.book(
+            self.venue.id, self.artist.id, EVENING + 3 * HOURS)
+
+        self.assertEqual(conflicts, [])
+        self.assertEqual(Show.query.count(), 2)
+        self.assertTrue(scheduling.find_conflicts(
+            self.venue.id, self.artist.id, show.start_time))
+
+    def test_create_show_flashes_conflicts(self):
+        client = self.client()
+        client.post('/shows/create', data={
+            'venue_id': self.venue.id,
+            'artist_id': self.artist.id,
+            'start_time': '2030-01-01 21:00:00'
+        })
+
+        with client.session_transaction() as session:
+            messages = [message for _, message in session['_flashes']]
+        self.assertEqual(messages[0], 'Show could not be listed.')
+        self.assertEqual(Show.query.count(), 1)
+
+
+class UpdateTestCase(DatabaseTestCase):
+    """Updates of the changed columns with optimistic versions"""
+
+    def setUp(self):
+        super().setUp()
+        self.venue = self.add_venue()
+        self.statements = []
+        event.listen(db.engine, 'before_cursor_execute', self.record)
+
+    def tearDown(self):
+        event.remove(db.engine, 'before_cursor_execute', self.record)
+        super().tearDown()
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('UPDATE'):
+            self.statements.append(statement)
+
+    def test_unchanged_values_write_nothing(self):
+        changed = self.venue.update({'name': 'The Musical Hop', 'state': 'CA'})
+
+        self.assertEqual(changed, [])
+        self.assertEqual(self.statements, [])
+        self.assertEqual(self.venue.version, 1)
+
+    def test_only_changed_columns_are_written(self):
+        changed = self.venue.update({'name': 'The Musical Hop',
+                                     'phone': '415-000-0000'}, version=1)
+
+        self.assertEqual(changed, ['phone'])
+        self.assertEqual(len(self.statements), 1)
+        self.assertIn('phone', self.statements[0])
+        self.assertNotIn('name', self.statements[0])
+        self.assertEqual(self.venue.version, 2)
+
+    def test_outdated_version_is_refused(self):
+        self.venue.update({'phone': '415-000-0000'})
+
+        with self.assertRaises(ConcurrentUpdateError):
+            self.venue.update({'phone': '415-111-1111'}, version=1)
+        self.assertEqual(Venue.query.one().phone, '415-000-0000')
+
+    def test_concurrent_write_is_detected(self):
+        venue_id = self.venue.id
+        self.assertEqual(self.venue.version, 1)
+        # Written by another request after this one read the row
+        table = Venue.__table__
+        with db.engine.begin() as connection:
+            connection.execute(table.update().where(table.c.id == venue_id)
+                               .values(phone='415-222-2222', version=2))
+
+        with self.assertRaises(ConcurrentUpdateError):
+            self.venue.update({'phone': '415-111-1111'}, version=1)
+        self.assertEqual(Venue.query.get(venue_id).phone, '415-222-2222')
+
+
+class SoftDeleteTestCase(DatabaseTestCase):
+    """Soft deletes and purges of common/softdelete.py"""
+
+    def setUp(self):
+        super().setUp()
+        self.venue = self.add_venue()
+        self.artist = self.add_artist()
+        self.show = self.add_show(self.venue, self.artist, EVENING)
+
+    def test_deleted_rows_are_hidden(self):
+        other_id = self.add_venue(name='Park Square Live Music & Coffee').id
+        venue_id = self.venue.id
+        self.venue.delete()
+
+        self.assertEqual([venue.id for venue in Venue.query], [other_id])
+        self.assertIsNone(Venue.query.get(venue_id))
+        self.assertEqual(
+            include_deleted(Venue.query).filter_by(id=venue_id).count(), 1)
+
+    def test_relationship_loads_hide_deleted_children(self):
+        self.show.delete()
+
+        self.assertEqual(Venue.query.get(self.venue.id).shows, [])
+
+    def test_delete_cascades_to_children(self):
+        artist_id = self.artist.id
+        self.venue.delete()
+
+        venue = include_deleted(Venue.query).one()
+        show = include_deleted(Show.query).one()
+        self.assertIsNotNone(venue.deleted_at)
+        self.assertEqual(show.deleted_at, venue.deleted_at)
+        self.assertIsNone(Artist.query.get(artist_id).deleted_at)
+
+    def test_purge_by_batches(self):
+        for name in ('Dueling Pianos Bar', 'The Blue Note'):
+            self.add_venue(name=name).delete()
+        self.venue.delete()
+
+        deleted = purge(db.session, [Show, Venue], batch_size=2)
+
+        self.assertEqual(deleted, {'shows': 1, 'venues': 3})
+        self.assertEqual(include_deleted(Venue.query).count(), 0)
+
+    def test_purge_stops_after_max_batches(self):
+        for name in ('Dueling Pianos Bar', 'The Blue Note'):
+            self.add_venue(name=name).delete()
+
+        deleted = purge(db.session, [Venue], batch_size=1, max_batches=1)
+
+        self.assertEqual(deleted, {'venues': 1})
+        self.assertEqual(include_deleted(Venue.query).count(), 2)
+
+    def test_purge_keeps_recent_deletes(self):
+        old = self.add_venue(name='The Blue Note')
+        old.soft_delete(db.session, utcnow() - timedelta(days=2))
+        db.session.commit()
+        venue_id = self.venue.id
+        self.venue.delete()
+
+        deleted = purge(db.session, [Venue], older_than=timedelta(days=1))
+
+        self.assertEqual(deleted, {'venues': 1})
+        self.assertEqual(
+            [venue.id for venue in include_deleted(Venue.query)], [venue_id])
+
+
+class GeoTestCase(DatabaseTestCase):
+    """Geohash cells and venue locations"""
+
+    def test_prefix_range(self):
+        self.assertEqual(geo.prefix_range('9q8'), ('9q8', '9q9'))
+        self.assertEqual(geo.prefix_range('9qz'), ('9qz', '9r'))
+        self.assertEqual(geo.prefix_range('zz'), ('zz', None))
+
+    def test_covering_cells_contain_the_circle(self):
+        latitude, longitude = 37.7749, -122.4194
+        cells = geo.covering_cells(latitude, longitude, 10)
+
+        self.assertLessEqual(len(cells), geo.MAX_CELLS)
+        # Points on the edge of the circle fall in one of the cells
+        for bearing in range(0, 360, 15):
+            edge_latitude = latitude + 9.9 / geo.KM_PER_DEGREE_LATITUDE * \
+                math.cos(math.radians(bearing))
+            edge_longitude = longitude + 9.9 / (
+                geo.KM_PER_DEGREE_LONGITUDE * math.cos(math.radians(latitude))) * \
+                math.sin(math.radians(bearing))
+            geohash = geo.encode(edge_latitude, edge_longitude)
+            self.assertTrue(any(geohash.startswith(cell) for cell in cells))
+
+    def test_covering_cells_of_a_pole(self):
+        cells = geo.covering_cells(89.9, 0, 50)
+
+        self.assertTrue(cells)
+        self.assertLessEqual(len(cells), geo.MAX_CELLS)
+
+    def test_nearby_venues(self):
+        self.add_venue(name='Mission Venue').update(
+            geo.geocode('San Francisco', 'CA'))
+        self.add_venue(name='Bay Venue', city='Oakland').update(
+            geo.geocode('Oakland', 'CA'))
+
+        venues = geo.nearby_venues(37.7749, -122.4194, 5, 10)
+
+        self.assertEqual([venue['name'] for venue in venues], ['Mission Venue'])
+
+    def test_unknown_city_is_not_located(self):
+        self.assertEqual(geo.geocode('Nowhere', 'CA'), {
+            'latitude': None, 'longitude': None, 'geohash': None})
+
+    def test_geocode_venues_lists_unknown_cities(self):
+        self.add_venue(name='Lost Venue', city='Nowhere')
+        self.add_venue()
+
+        output = self.app.test_cli_runner().invoke(args=['geocode-venues']).output
+
+        self.assertIn('(Lost Venue): Nowhere, CA is not in the gazetteer', output)
+        self.assertIn('Located 1 of 2 venues.', output)
+
+    def test_create_venue_flashes_unknown_city(self):
+        client = self.client()
+        client.post('/venues/create', data={
+            'name': 'Lost Venue',
+            'city': 'Nowhere',
+            'state': 'CA',
+            'address': '1 Main Street',
+            'phone': '123-123-1234',
+            'genres': 'Jazz'
+        })
+
+        with client.session_transaction() as session:
+            messages = [message for _, message in session['_flashes']]
+        self.assertIn('Nowhere, CA is not in the gazetteer, the venue will '
+                      'not show up in nearby searches.', messages)
+        self.assertIsNone(Venue.query.one().geohash)
+
+
+class MatchingTestCase(DatabaseTestCase):
+    """Matches from the live genre indexes"""
+
+    def setUp(self):
+        super().setUp()
+        self.venue = self.add_venue(genres='Jazz,Reggae')
+        self.venue.update({'seeking_talent': True})
+        self.artist = self.add_artist(genres='Jazz,Blues')
+        self.artist.update({'seeking_venue': True})
+
+    def test_matches_share_genres(self):
+        matches = match_index.matches('venue', self.venue.id)
+
+        self.assertEqual([match['id'] for match in matches], [self.artist.id])
+        self.assertEqual(matches[0]['shared_genres'], ['Jazz'])
+        self.assertEqual(matches[0]['score'], round(1 / 3, 4))
+
+    def test_committed_profile_is_indexed(self):
+        match_index.matches('venue', self.venue.id)
+        better = self.add_artist(name='The Wild Sax Band', genres='Jazz,Reggae')
+        better.update({'seeking_venue': True})
+
+        matches = match_index.matches('venue', self.venue.id)
+
+        self.assertEqual([match['id'] for match in matches],
+                         [better.id, self.artist.id])
+
+    def test_rolled_back_profile_is_not_indexed(self):
+        match_index.matches('venue', self.venue.id)
+        self.artist.genres = 'Reggae'
+        db.session.flush()
+        db.session.rollback()
+
+        matches = match_index.matches('venue', self.venue.id)
+
+        self.assertEqual(matches[0]['shared_genres'], ['Jazz'])
+
+    def test_profile_not_seeking_is_left_out(self):
+        match_index.matches('venue', self.venue.id)
+        self.artist.update({'seeking_venue': False})
+
+        self.assertEqual(match_index.matches('venue', self.venue.id), [])
+
+    def test_other_city_matches_in_state_scope(self):
+        other = self.add_artist(name='Matt Quevedo', city='Oakland',
+                                genres='Jazz')
+        other.update({'seeking_venue': True})
+
+        city = match_index.matches('venue', self.venue.id)
+        state = match_index.matches('venue', self.venue.id, scope='state')
+
+        self.assertNotIn(other.id, [match['id'] for match in city])
+        self.assertIn(other.id, [match['id'] for match in state])
+
+
+class SortedKeysTestCase(unittest.TestCase):
+    """Prefix searches of sorted keys"""
+
+    def setUp(self):
+        self.keys = SortedKeys()
+        for key, id in (('park square', 2), ('the musical hop', 1),
+                        ('park square', 3)):
+            self.keys.append(key, id)
+        self.keys.sort()
+
+    def test_starting_with(self):
+        self.assertEqual(self.keys.starting_with('park', 10),
+                         [('park square', 2), ('park square', 3)])
+        self.assertEqual(self.keys.starting_with('park', 1), [('park square', 2)])
+        self.assertEqual(self.keys.starting_with('zz', 10), [])
+
+    def test_starting_with_excludes_ids(self):
+        self.assertEqual(self.keys.starting_with('park', 10, [2]),
+                         [('park square', 3)])
+
+    def test_insert_keeps_order(self):
+        self.keys.insert('park avenue', 4)
+
+        self.assertEqual(self.keys.keys, sorted(self.keys.keys))
+        self.assertEqual(self.keys.starting_with('park', 10)[0],
+                         ('park avenue', 4))
+
+    def test_remove_only_the_given_id(self):
+        self.keys.remove('park square', 3)
+        self.keys.remove('park square', 9)
+
+        self.assertEqual(self.keys.starting_with('park', 10),
+                         [('park square', 2)])
+
+    def test_fold(self):
+        self.assertEqual(fold('  Café   ZINC '), 'cafe zinc')
+
+
+class SuggestTestCase(DatabaseTestCase):
+    """Suggestions from the live name indexes"""
+
+    def setUp(self):
+        super().setUp()
+        self.venue = self.add_venue(name='Café Zinc')
+        self.artist = self.add_artist(name='The Wild Sax Band')
+
+    def test_suggest_names_and_cities(self):
+        suggestions = suggest_index.suggest('san')
+
+        self.assertEqual(suggestions, [('city', 'San Francisco, CA',
+                                        'San Francisco, CA')])
+        self.assertEqual(suggest_index.suggest('cafe'),
+                         [('venue', self.venue.id, 'Café Zinc')])
+
+    def test_later_words_come_after_first_words(self):
+        other = self.add_artist(name='Saxophone Quartet')
+
+        suggestions = suggest_index.suggest('sax', kinds=('artist',))
+
+        self.assertEqual([id for _, id, _ in suggestions],
+                         [other.id, self.artist.id])
+
+    def test_renamed_row_is_reindexed(self):
+        suggest_index.suggest('cafe')
+        self.venue.update({'name': 'Park Square Live Music'})
+
+        self.assertEqual(suggest_index.suggest('cafe'), [])
+        self.assertEqual(suggest_index.suggest('square')[0][1], self.venue.id)
+
+    def test_city_is_kept_while_a_row_is_in_it(self):
+        suggest_index.suggest('san')
+        self.venue.delete()
+        self.assertTrue(suggest_index.suggest('san'))
+
+        self.artist.delete()
+        self.assertEqual(suggest_index.suggest('san'), [])
+
+    def test_rolled_back_name_is_not_indexed(self):
+        suggest_index.suggest('cafe')
+        db.session.add(Artist('Zinc Brothers', 'San Francisco', 'CA', '', '',
+                              '', 'Jazz', '', False, ''))
+        db.session.flush()
+        db.session.rollback()
+
+        self.assertEqual(suggest_index.suggest('zinc'),
+                         [('venue', self.venue.id, 'Café Zinc')])
+
+
+class AnalyticsTestCase(DatabaseTestCase):
+    """Show statistics counted by refreshes"""
+
+    def setUp(self):
+        super().setUp()
+        self.venue = self.add_venue()
+        self.artist = self.add_artist(genres='Jazz,Blues')
+        self.shows = [
+            self.add_show(self.venue, self.artist, EVENING + i * 24 * HOURS)
+            for i in range(3)]
+        self.month = analytics.month_of(EVENING)
+
+    def counts(self):
+        return {(stat.dimension, stat.key): stat.shows
+                for stat in ShowStat.query.filter_by(month=self.month)}
+
+    def test_refresh_counts_new_shows_by_batches(self):
+        self.assertEqual(analytics.refresh(db.session, batch_size=2), (3, 0))
+
+        self.assertEqual(self.counts(), {
+            ('all', ''): 3, ('venue', str(self.venue.id)): 3,
+            ('artist', str(self.artist.id)): 3, ('genre', 'Blues'): 3,
+            ('genre', 'Jazz'): 3})
+        self.assertEqual(analytics.refresh(db.session), (0, 0))
+
+    def test_refresh_takes_out_deleted_shows_under_counted_genres(self):
+        analytics.refresh(db.session)
+        self.artist.update({'genres': 'Soul'})
+        self.shows[0].delete()
+
+        self.assertEqual(analytics.refresh(db.session), (0, 1))
+        counts = self.counts()
+        self.assertEqual(counts[('all', '')], 2)
+        self.assertEqual(counts[('genre', 'Jazz')], 2)
+        self.assertNotIn(('genre', 'Soul'), counts)
+
+    def test_claim_fails_for_shows_claimed_meanwhile(self):
+        ids = [show.id for show in self.shows]
+        self.assertTrue(analytics.claim(db.session, {'Jazz': ids[:1]}, []))
+
+        self.assertFalse(analytics.claim(db.session, {'Jazz': ids}, []))
+        db.session.rollback()
+
+    def test_rebuild_counts_the_same(self):
+        analytics.refresh(db.session)
+        counts = self.counts()
+        # Lost statistics are counted again
+        db.session.execute(ShowStat.__table__.delete().where(
+            ShowStat.dimension == 'genre'))
+        db.session.commit()
+
+        self.assertEqual(analytics.rebuild(db.session, batch_size=2), (3, 0))
+        self.assertEqual(self.counts(), counts)
+
+
+class ArchiveTestCase(DatabaseTestCase):
+    """Past shows moved to shows_archive"""
+
+    def setUp(self):
+        super().setUp()
+        self.venue = self.add_venue()
+        self.artist = self.add_artist()
+        self.cutoff = datetime(2020, 1, 1)
+        self.old = [self.add_show(self.venue, self.artist,
+                                  self.cutoff - (i + 1) * 24 * HOURS).id
+                    for i in range(3)]
+        self.recent = self.add_show(self.venue, self.artist, self.cutoff).id
+
+    def test_archive_rows_moves_counted_shows_by_batches(self):
+        analytics.refresh(db.session)
+
+        self.assertEqual(archive.archive_rows(db.session, self.cutoff, 2), 3)
+        self.assertEqual([show.id for show in Show.query], [self.recent])
+        self.assertEqual(sorted(show.id for show in ShowArchive.query),
+                         self.old)
+        self.assertEqual(
+            [show.id for show, _ in archive.archived(venue_id=self.venue.id)],
+            self.old)
+
+    def test_archive_rows_waits_for_the_statistics(self):
+        self.assertEqual(archive.archive_rows(db.session, self.cutoff, 10), 0)
+        self.assertEqual(Show.query.count(), 4)
+
+    def test_deleted_shows_are_not_archived(self):
+        analytics.refresh(db.session)
+        Show.query.get(self.old[0]).delete()
+        analytics.refresh(db.session)
+
+        self.assertEqual(archive.archive_rows(db.session, self.cutoff, 10), 2)
+        self.assertEqual(sorted(show.id for show in ShowArchive.query),
+                         self.old[1:])
+
+    def test_purge_deletes_archived_shows_of_purged_venues(self):
+        analytics.refresh(db.session)
+        archive.archive_rows(db.session, self.cutoff, 10)
+        self.venue.delete()
+        analytics.refresh(db.session)
+
+        output = self.app.test_cli_runner().invoke(args=['purge-deleted']).output
+
+        self.assertEqual(output, '1 shows, 1 venues, 0 artists purged.\n')
+        self.assertEqual(ShowArchive.query.count(), 0)
+
+
+class AssetsTestCase(unittest.TestCase):
+    """Static files served under fingerprinted names"""
+
+    def setUp(self):
+        self.app = Flask(__name__, static_folder=app.static_folder)
+        self.app.config['ASSETS_FINGERPRINT'] = True
+        Assets(self.app)
+        self.client = self.app.test_client()
+
+    def test_static_url_is_fingerprinted(self):
+        with self.app.test_request_context():
+            url = url_for('static', filename='css/main.css')
+
+        self.assertRegex(url, r'^/static/css/main\.[0-9a-f]{12}\.css$')
+
+    def test_fingerprinted_file_is_immutable(self):
+        with self.app.test_request_context():
+            url = url_for('static', filename='css/main.css')
+        with open(os.path.join(app.static_folder, 'css', 'main.css'),
+                  'rb') as f:
+            data = f.read()
+
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Cache-Control'], IMMUTABLE)
+        self.assertEqual(response.data, data)
+        response.close()
+
+    def test_unknown_name_is_left_to_the_app(self):
+        response = self.client.get('/static/css/main.000000000000.css')
+
+        self.assertEqual(response.status_code, 404)
+
+
+class TemplatesTestCase(unittest.TestCase):
+    """Templates compiled when the app starts"""
+
+    def test_preload_compiles_every_template(self):
+        names = [os.path.relpath(os.path.join(folder, name),
+                                 app.template_folder).replace(os.sep, '/')
+                 for folder, _, files in os.walk(app.template_folder)
+                 for name in files if not name.startswith('.')]
+        env = app.jinja_env
+        env.cache.clear()
+
+        self.assertEqual(app.extensions['templates'].preload(app), len(names))
+        with mock.patch.object(env.loader, 'get_source',
+                               side_effect=AssertionError('not preloaded')):
+            for name in names:
+                env.get_template(name)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+
+from app import app
+from models import db, Venue, Artist, Show
+from scheduling import schedule_index
+from matching import match_index
+from autocomplete import suggest_index
+
+'''
+Test fixtures for Fyyur
+
+The tests run against an in-memory SQLite database instead of the
+fyyur Postgres database of config.py. The code under test commits and
+rolls back its own transactions, so each test gets an empty schema,
+created in setUp and dropped in tearDown, rather than a transaction
+rolled back afterwards. The in-memory indexes are rebuilt for each
+test since the ids of the rows start over.
+'''
+
+LIVE_INDEXES = (schedule_index, match_index, suggest_index)
+
+app.config.update({
+    'TESTING': True,
+    'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+    'SQLALCHEMY_ENGINE_OPTIONS': {}
+})
+
+
+class DatabaseTestCase(unittest.TestCase):
+    '''Runs each test against an empty database.
+    '''
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = app
+        cls.client = cls.app.test_client
+
+    def setUp(self):
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        for index in LIVE_INDEXES:
+            index.invalidate()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def add_venue(self, name='The Musical Hop', city='San Francisco',
+                  state='CA', genres='Jazz,Reggae'):
+        venue = Venue(name, city, state, '1015 Folsom Street', '123-123-1234',
+                      'https://example.com/venue.jpg', '', genres, '', False, '')
+        venue.insert()
+        return venue
+
+    def add_artist(self, name='Guns N Petals', city='San Francisco',
+                   state='CA', genres='Rock n Roll'):
+        artist = Artist(name, city, state, '326-123-5000',
+                        'https://example.com/artist.jpg', '', genres, '',
+                        False, '')
+        artist.insert()
+        return artist
+
+    def add_show(self, venue, artist, start_time):
+        show = Show(venue.id, artist.id, start_time)
+        show.insert()
+        return show
@@ -0,0 +1,10 @@
+'''
+Trivia API benchmarks
+
+Seeds a scratch database with generated categories and questions and
+measures the read endpoints through the Flask test client and through a
+local WSGI server. Run from the backend folder:
+
+    python -m benchmarks --questions 10000 --output baseline.json
+    python -m benchmarks --questions 10000 --compare baseline.json
+'''
@@ -0,0 +1,135 @@
+import argparse
+import datetime
+import json
+import math
+import subprocess
+import sys
+
+from flaskr import create_app, QUESTIONS_PER_PAGE
+
+from .runner import DRIVERS, SCENARIOS, run_scenario
+from .seed import seed_db
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description='Benchmark the trivia API endpoints.')
+    parser.add_argument(
+        '--database-url', default='sqlite://',
+        help='scratch database to seed, ALL TABLES ARE DROPPED '
+             '(default: in-memory SQLite)')
+    parser.add_argument('--categories', type=int, default=6)
+    parser.add_argument('--questions', type=int, default=1000)
+    parser.add_argument(
+        '--iterations', type=int, default=200,
+        help='operations measured per scenario and driver')
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument(
+        '--quiz-steps', type=int, default=5,
+        help='questions requested per quiz session')
+    parser.add_argument(
+        '--drivers', nargs='+', choices=sorted(DRIVERS),
+        default=sorted(DRIVERS))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the results to this file')
+    parser.add_argument(
+        '--compare', help='results file of an earlier run to compare with')
+    return parser.parse_args(argv)
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def result_key(result):
+    return result['driver'], result['endpoint']
+
+
+def print_results(results, baseline=None):
+    previous = {}
+    if baseline is not None:
+        previous = {result_key(result): result
+                    for result in baseline['results']}
+
+    header = '{:<12} {:<32} {:>10} {:>10} {:>10} {:>7}'.format(
+        'driver', 'endpoint', 'p50 ms', 'p99 ms', 'req/s', 'errors')
+    print(header)
+    print('-' * len(header))
+
+    for result in results:
+        line = '{:<12} {:<32} {:>10.3f} {:>10.3f} {:>10.1f} {:>7}'.format(
+            result['driver'], result['endpoint'], result['p50_ms'],
+            result['p99_ms'], result['rps'], result['errors'])
+
+        before = previous.get(result_key(result))
+        if before is not None and before['rps']:
+            change = (result['rps'] - before['rps']) / before['rps'] * 100
+            line += '  req/s {:+.1f}% vs {}'.format(
+                change, baseline.get('commit') or 'baseline')
+        print(line)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': args.database_url})
+    with app.app_context():
+        category_ids = seed_db(args.categories, args.questions, args.seed)
+
+    context = {
+        'category_ids': category_ids,
+        'questions': args.questions,
+        'pages': max(1, math.ceil(args.questions / QUESTIONS_PER_PAGE)),
+        'quiz_steps': args.quiz_steps
+    }
+
+    results = []
+    for driver_name in args.drivers:
+        driver = DRIVERS[driver_name](app)
+        try:
+            for endpoint, scenario in SCENARIOS.items():
+                result = run_scenario(
+                    driver, scenario, context,
+                    args.iterations, args.warmup, args.seed)
+                result.update({'driver': driver_name, 'endpoint': endpoint})
+                results.append(result)
+        finally:
+            driver.close()
+
+    report = {
+        'commit': current_commit(),
+        'created_at': datetime.datetime.utcnow().isoformat() + 'Z',
+        'python': sys.version.split()[0],
+        'config': {
+            'database': app.config['SQLALCHEMY_DATABASE_URI'].split(':')[0],
+            'categories': args.categories,
+            'questions': args.questions,
+            'iterations': args.iterations,
+            'warmup': args.warmup,
+            'quiz_steps': args.quiz_steps,
+            'seed': args.seed
+        },
+        'results': results
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print('\nResults saved to {}'.format(args.output))
+
+
+if __name__ == '__main__':
+    main()
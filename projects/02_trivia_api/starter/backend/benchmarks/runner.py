@@ -0,0 +1,174 @@
+import http.client
+import json
+import math
+import random
+import threading
+import time
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from .seed import SEARCH_TERMS
+
+'''
+Drivers
+    send one request and return the response status code and body
+'''
+
+
+class TestClientDriver:
+    name = 'test_client'
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body=None):
+        res = self.client.open(path, method=method, json=body)
+        return res.status_code, res.data
+
+    def close(self):
+        pass
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class WSGIServerDriver:
+    name = 'wsgi_server'
+
+    def __init__(self, app):
+        self.server = make_server(
+            '127.0.0.1', 0, app, request_handler=QuietRequestHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def request(self, method, path, body=None):
+        headers = {}
+        if body is not None:
+            body = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+
+        conn = http.client.HTTPConnection('127.0.0.1', self.server.port)
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            res = conn.getresponse()
+            return res.status, res.read()
+        finally:
+            conn.close()
+
+    def close(self):
+        self.server.shutdown()
+        self.thread.join()
+
+
+DRIVERS = {
+    TestClientDriver.name: TestClientDriver,
+    WSGIServerDriver.name: WSGIServerDriver
+}
+
+'''
+Scenarios
+    each call runs one operation and returns its list of status codes,
+    a quiz session is a single operation made of several requests
+'''
+
+
+def list_questions(driver, rng, context):
+    page = rng.randint(1, context['pages'])
+    status, _ = driver.request('GET', '/questions?page={}'.format(page))
+    return [status]
+
+
+def questions_by_category(driver, rng, context):
+    category_id = rng.choice(context['category_ids'])
+    status, _ = driver.request(
+        'GET', '/categories/{}/questions'.format(category_id))
+    return [status]
+
+
+def search_questions(driver, rng, context):
+    term = rng.choice(SEARCH_TERMS)
+    status, _ = driver.request(
+        'POST', '/questions/search', {'searchTerm': term})
+    return [status]
+
+
+def quiz_session(driver, rng, context):
+    category_id = rng.choice([0] + context['category_ids'])
+    previous_questions = []
+    statuses = []
+
+    for _ in range(context['quiz_steps']):
+        body = {
+            'previous_questions': previous_questions,
+            'quiz_category': {'id': category_id, 'type': ''}
+        }
+        status, data = driver.request('POST', '/quizzes', body)
+        statuses.append(status)
+
+        if status != 200:
+            break
+
+        question = json.loads(data)['question']
+        if question is None:
+            break
+        previous_questions.append(question['id'])
+
+    return statuses
+
+
+SCENARIOS = {
+    'GET /questions': list_questions,
+    'GET /categories/<id>/questions': questions_by_category,
+    'POST /questions/search': search_questions,
+    'POST /quizzes (session)': quiz_session
+}
+
+
+def percentile(sorted_values, fraction):
+    '''Nearest-rank percentile of an already sorted list.
+    '''
+    if not sorted_values:
+        return None
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def run_scenario(driver, scenario, context, iterations, warmup, seed):
+    '''Runs a scenario and summarises its latency and throughput.
+
+    Returns:
+        A dictionary with the number of operations and requests, the
+        p50/p99 latency of one operation in milliseconds, requests per
+        second and the number of non-200 responses.
+    '''
+    rng = random.Random(seed)
+
+    for _ in range(warmup):
+        scenario(driver, rng, context)
+
+    timings = []
+    requests = 0
+    errors = 0
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        op_started = time.perf_counter()
+        statuses = scenario(driver, rng, context)
+        timings.append(time.perf_counter() - op_started)
+
+        requests += len(statuses)
+        errors += sum(1 for status in statuses if status != 200)
+    elapsed = time.perf_counter() - started
+
+    timings.sort()
+    return {
+        'operations': iterations,
+        'requests': requests,
+        'errors': errors,
+        'p50_ms': round(percentile(timings, 0.50) * 1000, 3),
+        'p99_ms': round(percentile(timings, 0.99) * 1000, 3),
+        'rps': round(requests / elapsed, 1) if elapsed else None
+    }
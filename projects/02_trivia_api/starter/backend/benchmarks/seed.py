@@ -0,0 +1,55 @@
+import random
+
+from models import db, Question, Category
+
+# Every generated question contains one of these words, so searches for
+# them always have matches
+SEARCH_TERMS = ['title', 'river', 'painter', 'planet', 'goal']
+
+WORDS = [
+    'which', 'what', 'who', 'famous', 'largest', 'first', 'ancient',
+    'capital', 'country', 'invented', 'discovered', 'wrote', 'album',
+    'film', 'element', 'team', 'century', 'island', 'language', 'war'
+]
+
+CHUNK_SIZE = 1000
+
+
+def make_question(rng, category_id):
+    words = rng.sample(WORDS, 6)
+    words.insert(rng.randrange(len(words)), rng.choice(SEARCH_TERMS))
+    return {
+        'question': ' '.join(words).capitalize() + '?',
+        'answer': rng.choice(WORDS),
+        'difficulty': rng.randint(1, 5),
+        'category': category_id
+    }
+
+
+'''
+seed_db(categories, questions, seed)
+    recreates the schema and fills it with generated rows
+    returns the list of category ids
+    !!NOTE this drops every table of the bound database
+'''
+
+
+def seed_db(categories=6, questions=1000, seed=0):
+    rng = random.Random(seed)
+
+    db.drop_all()
+    db.create_all()
+
+    db.session.bulk_insert_mappings(Category, [
+        {'type': 'Category {}'.format(i)} for i in range(1, categories + 1)])
+    category_ids = [
+        category.id for category in Category.query.order_by(Category.id)]
+
+    for start in range(0, questions, CHUNK_SIZE):
+        count = min(CHUNK_SIZE, questions - start)
+        db.session.bulk_insert_mappings(Question, [
+            make_question(rng, rng.choice(category_ids))
+            for _ in range(count)])
+
+    db.session.commit()
+    return category_ids
@@ -0,0 +1,87 @@
+'''
+Cold start benchmark
+
+Each run starts a fresh interpreter and times importing the app
+package, building the app with create_app() and serving the first
+request, which is when the engine and its first connection are created.
+
+    python -m benchmarks.startup --runs 20
+'''
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from flaskr import create_app
+from models import db
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD_SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+from flaskr import create_app
+imported = time.perf_counter()
+app = create_app({'SQLALCHEMY_DATABASE_URI': sys.argv[1]})
+created = time.perf_counter()
+status = app.test_client().get('/categories').status_code
+served = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (served - created) * 1000,
+    'status': status
+}))
+'''
+
+PHASES = ['import_ms', 'create_app_ms', 'first_request_ms']
+
+
+def measure(database_url, runs):
+    samples = []
+    for _ in range(runs):
+        output = subprocess.check_output(
+            [sys.executable, '-c', CHILD_SCRIPT, database_url],
+            cwd=BACKEND_DIR)
+        samples.append(json.loads(output))
+    return samples
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.startup',
+        description='Measure trivia app cold start.')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument(
+        '--database-url',
+        help='database with the trivia schema (default: a temporary '
+             'SQLite file)')
+    parser.add_argument('--output', help='write the samples to this file')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url
+        if database_url is None:
+            database_url = 'sqlite:///' + os.path.join(tmp, 'trivia.db')
+            app = create_app({'SQLALCHEMY_DATABASE_URI': database_url})
+            with app.app_context():
+                db.create_all()
+
+        samples = measure(database_url, args.runs)
+
+    print('{:<18} {:>10} {:>10}'.format('phase', 'median ms', 'max ms'))
+    for phase in PHASES:
+        values = [sample[phase] for sample in samples]
+        print('{:<18} {:>10.2f} {:>10.2f}'.format(
+            phase, statistics.median(values), max(values)))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'runs': args.runs, 'samples': samples}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
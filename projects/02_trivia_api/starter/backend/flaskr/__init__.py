@@ -1,14 +1,37 @@
 import os
-from flask import Flask, request, abort, jsonify
+import sys
+from flask import Flask, request, abort
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 import random
 # from sqlalchemy.sql import func
 
-from models import setup_db, Question, Category
+# The shared modules of the projects folder, before any import of them
+sys.path.append(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', '..'))
+
+from models import setup_db, db, Question, Category
+from common.compression import Compress
+from common.fastjson import FastJSON, jsonify, list_response
 
 QUESTIONS_PER_PAGE = 10
 
+# Fields requested with ?fields=, all of them by default
+
+
+def get_fields(request, projection):
+    try:
+        return projection.parse(request.args.get('fields'))
+    except ValueError:
+        abort(400)
+
+# Select only the columns of the requested question fields
+
+
+def query_questions(request):
+    fields = get_fields(request, Question.projection)
+    return Question.projection.query(db.session, fields), fields
+
 # Paginate questions
 
 
@@ -16,19 +39,20 @@ def paginate_quesions(request):
     page = request.args.get('page', 1, type=int)
     current_index = page - 1
 
-    questions = Question.query.order_by(
+    query, fields = query_questions(request)
+    questions = query.order_by(
         Question.id).offset(
         current_index *
         QUESTIONS_PER_PAGE).limit(QUESTIONS_PER_PAGE).all()
 
-    questions_format = [question.format() for question in questions]
+    questions_format = Question.projection.format(questions, fields)
     return questions_format
 
 # Format categories to a dictionary
 
 
 def format_categories(categories):
-    categories_format = [category.format() for category in categories]
+    categories_format = Category.projection.format(categories)
     categories_dict = {str(category["id"]): category["type"]
                        for category in categories_format}
 
@@ -38,7 +62,12 @@ def format_categories(categories):
 def create_app(test_config=None):
     # create and configure the app
     app = Flask(__name__)
+
+    if test_config is not None:
+        app.config.from_mapping(test_config)
     setup_db(app)
+    FastJSON(app)
+    app.wsgi_app = Compress(app.wsgi_app)
 
     cors = CORS(app, resources={r"/*": {"origins": "*"}})
 
@@ -63,7 +92,8 @@ def create_app(test_config=None):
     # Route for retrieving all categories
     @app.route('/categories')
     def get_categories():
-        categories = Category.query.order_by(Category.id).all()
+        categories = Category.projection.query(db.session).order_by(
+            Category.id).all()
         categories_dict = format_categories(categories)
 
         return jsonify({
@@ -88,7 +118,8 @@ def create_app(test_config=None):
     def get_questions():
         current_questions = paginate_quesions(request)
 
-        categories = Category.query.order_by(Category.id).all()
+        categories = Category.projection.query(db.session).order_by(
+            Category.id).all()
         categories_dict = format_categories(categories)
 
         if len(current_questions) == 0:
@@ -152,7 +183,7 @@ def create_app(test_config=None):
             question = Question(
                 question=new_question,
                 answer=new_answer,
-                category=new_category,
+                category=int(new_category),
                 difficulty=new_difficulty)
             question.insert()
 
@@ -179,21 +210,21 @@ def create_app(test_config=None):
         body = request.get_json()
         search_term = body.get('searchTerm', None)
 
-        questions = Question.query.filter(
+        query, fields = query_questions(request)
+        questions = query.filter(
             Question.question.ilike(
                 '%{}%'.format(search_term))).order_by(
             Question.id).all()
-        questions_format = [question.format() for question in questions]
+        questions_format = Question.projection.format(questions, fields)
 
         if len(questions_format) == 0:
             abort(404)
 
-        return jsonify({
+        return list_response({
             'success': True,
-            'questions': questions_format,
-            'total_questions': len(Question.query.all()),
+            'total_questions': Question.query.count(),
             'current_category': None
-        })
+        }, 'questions', questions_format)
 
     '''
     GET endpoint to get questions based on category.
@@ -203,24 +234,22 @@ def create_app(test_config=None):
     category to be shown.
     '''
     # Route for getting questions based on category
-    @app.route('/categories/<category_id>/questions')
+    @app.route('/categories/<int:category_id>/questions')
     def get_questions_by_category(category_id):
-        questions = Question.query.filter(
+        query, fields = query_questions(request)
+        questions = query.filter(
             Question.category == category_id).order_by(
             Question.id).all()
-        questions_format = [question.format() for question in questions]
+        questions_format = Question.projection.format(questions, fields)
 
         if len(questions_format) == 0:
             abort(404)
 
-        current_category = questions_format[0]['category']
-
-        return jsonify({
+        return list_response({
             'success': True,
-            'questions': questions_format,
-            'total_questions': len(Question.query.all()),
-            'current_category': int(current_category)
-        })
+            'total_questions': Question.query.count(),
+            'current_category': category_id
+        }, 'questions', questions_format)
 
     '''
     POST endpoint to get questions to play the quiz.
@@ -240,17 +269,18 @@ def create_app(test_config=None):
 
         quiz_category = body.get('quiz_category', None)
         previous_questions = body.get('previous_questions', None)
+        query, fields = query_questions(request)
 
         if quiz_category['id'] == 0:
             # question = Question.query.filter(
             # ~Question.id.in_(previous_questions)).order_by(
             # func.random()).first()
-            questions = Question.query.filter(
+            questions = query.filter(
                 ~Question.id.in_(previous_questions)).all()
         else:
+            category_id = int(quiz_category['id'])
             category = Category.query.filter(
-                Category.id == int(
-                    quiz_category['id'])).one_or_none()
+                Category.id == category_id).one_or_none()
 
             if category is None:
                 abort(404)
@@ -258,14 +288,15 @@ def create_app(test_config=None):
             # question = Question.query.filter(
             # Question.category == quiz_category['id'], ~Question.id.in_(
             # previous_questions)).order_by(func.random()).first()
-            questions = Question.query.filter(
-                Question.category == quiz_category['id'],
+            questions = query.filter(
+                Question.category == category_id,
                 ~Question.id.in_(previous_questions)).all()
 
         # if question is not None:
         #   question = question.format()
         if len(questions) > 0:
-            question = random.choice(questions).format()
+            question = Question.projection.format_one(
+                random.choice(questions), fields)
         else:
             question = None
 
@@ -0,0 +1,39 @@
+--
+-- Migrate questions.category to an indexed integer foreign key.
+--
+-- Databases created by db.create_all() before this change store the
+-- category as a varchar, so category lookups compare text against
+-- categories.id and cannot use an index. Run once against an existing
+-- database from the backend folder:
+--
+--     psql trivia < migrations/001_question_category_fk.sql
+--
+
+BEGIN;
+
+-- Values that cannot be cast to a category id are cleared.
+UPDATE public.questions
+    SET category = NULL
+    WHERE btrim(category::text) !~ '^[0-9]+$';
+
+ALTER TABLE public.questions
+    ALTER COLUMN category TYPE integer USING btrim(category::text)::integer;
+
+-- Orphaned rows follow the ON DELETE SET NULL rule of the constraint.
+UPDATE public.questions
+    SET category = NULL
+    WHERE category IS NOT NULL
+    AND category NOT IN (SELECT id FROM public.categories);
+
+ALTER TABLE ONLY public.questions
+    DROP CONSTRAINT IF EXISTS category;
+
+ALTER TABLE ONLY public.questions
+    ADD CONSTRAINT category FOREIGN KEY (category) REFERENCES public.categories(id) ON UPDATE CASCADE ON DELETE SET NULL;
+
+CREATE INDEX IF NOT EXISTS ix_questions_category_id
+    ON public.questions USING btree (category, id);
+
+ANALYZE public.questions;
+
+COMMIT;
@@ -1,28 +1,64 @@
 import os
-from sqlalchemy import Column, String, Integer, create_engine
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import Column, String, Integer, ForeignKey, Index
 from flask_sqlalchemy import SQLAlchemy
 import json
 
-database_host = os.getenv('DB_HOST', '127.0.0.1:5432')
-database_user = os.getenv('DB_USER', 'postgres')
-database_password = os.getenv('DB_PASSWORD', '123456')
-database_name = os.getenv('DB_NAME', 'trivia')
-database_path = 'postgresql://{}:{}@{}/{}'.format(
-    database_user, database_password, database_host, database_name)
+from common.database import configure_database, register_pool_metrics
+from common.projection import Projection
+
 db = SQLAlchemy()
 
+'''
+get_database_path(database_name)
+    builds the connection URL from the environment when it is needed
+    rather than when the module is imported
+'''
+
+
+def get_database_path(database_name=None):
+    database_host = os.getenv('DB_HOST', '127.0.0.1:5432')
+    database_user = os.getenv('DB_USER', 'postgres')
+    database_password = os.getenv('DB_PASSWORD', '123456')
+    if database_name is None:
+        database_name = os.getenv('DB_NAME', 'trivia')
+    return 'postgresql://{}:{}@{}/{}'.format(
+        database_user, database_password, database_host, database_name)
+
+
 '''
 setup_db(app)
     binds a flask application and a SQLAlchemy service
+    the engine and its pool are created on first use, in the process
+    that uses them, and the schema is left to `flask init-db`
+    pool settings come from the environment, see common/database.py
 '''
 
 
-def setup_db(app, database_path=database_path):
-    app.config["SQLALCHEMY_DATABASE_URI"] = database_path
-    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-    db.app = app
+def setup_db(app, database_path=None):
+    if database_path is None:
+        database_path = app.config.get('SQLALCHEMY_DATABASE_URI')
+    if database_path is None:
+        database_path = get_database_path()
+
+    configure_database(app, database_path)
     db.init_app(app)
+    register_pool_metrics(app, db)
+    app.cli.add_command(init_db_command)
+
+
+'''
+init_db_command()
+    creates the tables that do not exist yet
+'''
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
     db.create_all()
+    click.echo('Initialized the database.')
 
 
 '''
@@ -33,11 +69,22 @@ Question
 
 class Question(db.Model):
     __tablename__ = 'questions'
+    # (category, id) serves both the category filter and the id ordering
+    # used by category browsing and quiz play
+    __table_args__ = (
+        Index('ix_questions_category_id', 'category', 'id'),
+    )
 
     id = Column(Integer, primary_key=True)
     question = Column(String)
     answer = Column(String)
-    category = Column(String)
+    category = Column(
+        Integer,
+        ForeignKey(
+            'categories.id',
+            name='category',
+            onupdate='CASCADE',
+            ondelete='SET NULL'))
     difficulty = Column(Integer)
 
     def __init__(self, question, answer, category, difficulty):
@@ -67,6 +114,16 @@ class Question(db.Model):
         }
 
 
+# The fields of format(), selectable with ?fields=
+Question.projection = Projection({
+    'id': Question.id,
+    'question': Question.question,
+    'answer': Question.answer,
+    'category': Question.category,
+    'difficulty': Question.difficulty
+})
+
+
 '''
 Category
 
@@ -91,3 +148,9 @@ class Category(db.Model):
             'id': self.id,
             'type': self.type
         }
+
+
+Category.projection = Projection({
+    'id': Category.id,
+    'type': Category.type
+})
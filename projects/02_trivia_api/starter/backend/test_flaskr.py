@@ -1,29 +1,27 @@
+import gzip
 import os
+import sys
 import unittest
 import json
-from flask_sqlalchemy import SQLAlchemy
 
-from flaskr import create_app
-from models import setup_db, Question, Category
+# The shared modules of the projects folder, before any import of them
+sys.path.append(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
 
+from werkzeug.test import Client
+from werkzeug.wrappers import Response
 
-class TriviaTestCase(unittest.TestCase):
+from common.compression import Compress
+from models import Question, Category
+from testing import TransactionalTestCase
+
+
+class TriviaTestCase(TransactionalTestCase):
     """This class represents the trivia test case"""
 
     def setUp(self):
-        """Define test variables and initialize app."""
-        self.app = create_app()
-        self.client = self.app.test_client
-        self.database_host = os.getenv('DB_HOST', '127.0.0.1:5432')
-        self.database_user = os.getenv('DB_USER', 'postgres')
-        self.database_password = os.getenv('DB_PASSWORD', '123456')
-        self.database_name = os.getenv('DB_NAME', 'trivia_test')
-        self.database_path = 'postgresql://{}:{}@{}/{}'.format(
-            self.database_user,
-            self.database_password,
-            self.database_host,
-            self.database_name)
-        setup_db(self.app, self.database_path)
+        """Define test variables and open the per-test transaction."""
+        super().setUp()
 
         # create a new question
         self.new_question = {
@@ -33,17 +31,6 @@ class TriviaTestCase(unittest.TestCase):
             'difficulty': 2
         }
 
-        # binds the app to the current context
-        with self.app.app_context():
-            self.db = SQLAlchemy()
-            self.db.init_app(self.app)
-            # create all tables
-            self.db.create_all()
-
-    def tearDown(self):
-        """Executed after reach test"""
-        pass
-
     # Test for getting categories
 
     def test_get_categories(self):
@@ -66,6 +53,22 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data['current_category'], None)
         self.assertTrue(len(data['categories']))
 
+    # Test for getting only the requested question fields
+    def test_get_questions_sparse_fields(self):
+        res = self.client().get('/questions?fields=id,answer')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(set(data['questions'][0]), {'id', 'answer'})
+
+    # Test for error behavior that requesting an unknown field
+    def test_400_sent_requesting_unknown_field(self):
+        res = self.client().get('/questions?fields=id,secret')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(data['success'], False)
+
     # Test for error behavior that sending requesting beyond valid page
     def test_404_sent_requesting_beyond_valid_page(self):
         res = self.client().get('/questions?page=1000')
@@ -213,6 +216,69 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data['message'], 'resource not found')
 
 
+class CompressionTestCase(unittest.TestCase):
+    """Content negotiation of the compression middleware"""
+
+    def setUp(self):
+        self.body = b'{"question": "Whose autobiography is entitled?"}\n' * 40
+        self.closed = []
+
+    def client(self, streamed=False):
+        def app(environ, start_response):
+            if streamed:
+                response = Response(iter([self.body, self.body]),
+                                    mimetype='text/plain')
+            else:
+                response = Response(self.body, mimetype='application/json')
+            response.call_on_close(lambda: self.closed.append(True))
+            return response(environ, start_response)
+        return Client(Compress(app), Response)
+
+    def test_gzip_is_negotiated(self):
+        response = self.client().get(headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(response.headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(response.data), self.body)
+
+    def test_refused_encoding_is_not_used(self):
+        response = self.client().get(
+            headers={'Accept-Encoding': 'gzip;q=0, identity'})
+
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(response.headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(response.data, self.body)
+
+    def test_streamed_response_is_compressed(self):
+        response = self.client(streamed=True).get(
+            headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Length', response.headers)
+        self.assertEqual(gzip.decompress(response.data), self.body * 2)
+        response.close()
+        self.assertEqual(self.closed, [True])
+
+    def test_head_has_the_headers_of_get(self):
+        headers = {'Accept-Encoding': 'gzip'}
+        get = self.client().get(headers=headers)
+
+        head = self.client().head(headers=headers)
+
+        self.assertEqual(head.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(head.headers['Content-Length'],
+                         get.headers['Content-Length'])
+        self.assertEqual(head.data, b'')
+
+    def test_head_of_streamed_response_closes_it(self):
+        head = self.client(streamed=True).head(
+            headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(head.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(head.data, b'')
+        self.assertEqual(self.closed, [True])
+
+
 # Make the tests conveniently executable
 if __name__ == "__main__":
     unittest.main()
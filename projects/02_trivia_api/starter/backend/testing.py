@@ -0,0 +1,132 @@
+import os
+import unittest
+
+from flaskr import create_app
+from models import db, get_database_path, Question, Category
+
+'''
+Test fixtures for the trivia API
+
+The app and its schema are built once per test session and shared by
+every test case. Each test runs inside a transaction that is rolled
+back in tearDown, so tests never see each other's writes and the
+database does not need to be restored between runs.
+
+Set TEST_DB=sqlite to run the suite against an in-memory SQLite
+database seeded from trivia.psql instead of the trivia_test Postgres
+database.
+'''
+
+SEED_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'trivia.psql')
+
+
+def get_test_database_path():
+    if os.getenv('TEST_DB', 'postgres') == 'sqlite':
+        return 'sqlite://'
+    return get_database_path(os.getenv('DB_NAME', 'trivia_test'))
+
+
+'''
+load_seed_data(path)
+    reads the rows of the COPY blocks in a pg_dump file
+    returns a dictionary of table name: list of row dictionaries
+'''
+
+
+def load_seed_data(path=SEED_FILE):
+    tables = {}
+    columns = None
+    rows = None
+
+    with open(path, encoding='utf-8') as dump:
+        for line in dump:
+            line = line.rstrip('\n')
+
+            if rows is None:
+                if line.startswith('COPY '):
+                    # COPY public.questions (id, question, ...) FROM stdin;
+                    name = line.split()[1].split('.')[-1]
+                    columns = line[line.index('(') + 1:line.index(')')]
+                    columns = [column.strip() for column in columns.split(',')]
+                    rows = tables.setdefault(name, [])
+            elif line == '\\.':
+                rows = None
+            else:
+                values = [None if value == '\\N' else value
+                          for value in line.split('\t')]
+                rows.append(dict(zip(columns, values)))
+
+    return tables
+
+
+def seed_db(tables):
+    categories = [{'id': int(row['id']), 'type': row['type']}
+                  for row in tables.get('categories', [])]
+    questions = [{
+        'id': int(row['id']),
+        'question': row['question'],
+        'answer': row['answer'],
+        'difficulty': int(row['difficulty']),
+        'category': int(row['category'])
+    } for row in tables.get('questions', [])]
+
+    db.session.bulk_insert_mappings(Category, categories)
+    db.session.bulk_insert_mappings(Question, questions)
+    db.session.commit()
+
+
+_app = None
+
+
+def get_test_app():
+    '''Returns the app shared by every test, building it on first use.
+    '''
+    global _app
+
+    if _app is None:
+        database_path = get_test_database_path()
+        _app = create_app({'SQLALCHEMY_DATABASE_URI': database_path})
+
+        with _app.app_context():
+            db.create_all()
+
+            # The in-memory database starts empty, Postgres is restored
+            # from trivia.psql before the suite runs (see README)
+            if database_path.startswith('sqlite'):
+                seed_db(load_seed_data())
+
+    return _app
+
+
+class TransactionalTestCase(unittest.TestCase):
+    '''Runs each test inside a transaction that is rolled back afterwards.
+
+    The scoped session is rebound to a connection with an open
+    transaction, so commits made by the endpoints only end a
+    subtransaction and nothing reaches the database.
+    '''
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = get_test_app()
+        cls.client = cls.app.test_client
+
+    def setUp(self):
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+        self.connection = db.engine.connect()
+        self.transaction = self.connection.begin()
+
+        self._session = db.session
+        db.session = db.create_scoped_session(
+            options={'bind': self.connection, 'binds': {}})
+
+    def tearDown(self):
+        db.session.remove()
+        db.session = self._session
+
+        self.transaction.rollback()
+        self.connection.close()
+        self.app_context.pop()
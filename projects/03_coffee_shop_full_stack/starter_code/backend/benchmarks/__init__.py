@@ -0,0 +1,5 @@
+'''
+Coffee shop API benchmarks, run from the backend folder:
+
+    python -m benchmarks.serving_modes
+'''
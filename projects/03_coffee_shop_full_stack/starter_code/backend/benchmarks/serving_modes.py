@@ -0,0 +1,234 @@
+'''
+Sync WSGI vs ASGI throughput under upstream latency
+
+Starts a local stand-in for Auth0 that serves a generated key set after
+a configurable delay, then runs the same concurrent load of
+GET /drinks-detail requests against:
+
+    wsgi     src.api:app on the threaded Werkzeug server, a thread per
+             request, as flask run serves it
+    gthread  src.api:app on one gunicorn gthread worker with --threads
+             threads, how the sync app is deployed
+    asgi     src.asgi:app on uvicorn with one worker
+
+JWKS caching is disabled by default so every request waits on the
+stand-in, as the API did before the key set was cached. Pass
+--jwks-cache-ttl to measure with caching instead.
+
+    python -m benchmarks.serving_modes --latency-ms 100 --concurrency 20
+'''
+import argparse
+import base64
+import http.client
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from Crypto.PublicKey import RSA
+from jose import jwt
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+KEY_ID = 'benchmark'
+AUTH0_DOMAIN = 'auth0.benchmark.local'
+
+MODES = ('wsgi', 'gthread', 'asgi')
+
+
+def server_command(mode, port, threads):
+    if mode == 'wsgi':
+        return [
+            sys.executable, '-c',
+            'import logging, sys; from werkzeug.serving import run_simple; '
+            'logging.getLogger("werkzeug").setLevel(logging.ERROR); '
+            'from src.api import app; '
+            'run_simple("127.0.0.1", int(sys.argv[1]), app, threaded=True)',
+            str(port)
+        ]
+    if mode == 'gthread':
+        return [
+            sys.executable, '-m', 'gunicorn', 'src.api:app',
+            '--worker-class', 'gthread', '--workers', '1',
+            '--threads', str(threads), '--log-level', 'warning',
+            '--bind', '127.0.0.1:{}'.format(port)
+        ]
+    return [
+        sys.executable, '-m', 'uvicorn', 'src.asgi:app',
+        '--host', '127.0.0.1', '--log-level', 'warning', '--port', str(port)
+    ]
+
+
+def b64url_uint(value):
+    data = value.to_bytes((value.bit_length() + 7) // 8, 'big')
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def make_signing_key():
+    '''Returns a private key in PEM format and the matching key set.
+    '''
+    key = RSA.generate(2048)
+    jwks = {'keys': [{
+        'kty': 'RSA',
+        'kid': KEY_ID,
+        'use': 'sig',
+        'alg': 'RS256',
+        'n': b64url_uint(key.n),
+        'e': b64url_uint(key.e)
+    }]}
+    return key.export_key('PEM').decode('ascii'), jwks
+
+
+def make_token(private_key):
+    now = int(time.time())
+    claims = {
+        'iss': 'https://{}/'.format(AUTH0_DOMAIN),
+        'aud': 'drinks',
+        'sub': 'benchmark',
+        'iat': now,
+        'exp': now + 3600,
+        'permissions': ['get:drinks-detail']
+    }
+    return jwt.encode(
+        claims, private_key, algorithm='RS256', headers={'kid': KEY_ID})
+
+
+def start_auth0_stub(jwks, latency):
+    body = json.dumps(jwks).encode('utf-8')
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_listening(port, process, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('server exited with {}'.format(
+                process.returncode))
+        try:
+            socket.create_connection(('127.0.0.1', port), 0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError('server did not start on port {}'.format(port))
+
+
+def get(port, path, token):
+    started = time.perf_counter()
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    try:
+        conn.request(
+            'GET', path, headers={'Authorization': 'Bearer ' + token})
+        res = conn.getresponse()
+        res.read()
+        return res.status, time.perf_counter() - started
+    finally:
+        conn.close()
+
+
+def run_load(port, token, requests, concurrency):
+    with ThreadPoolExecutor(concurrency) as pool:
+        started = time.perf_counter()
+        results = list(pool.map(
+            lambda _: get(port, '/drinks-detail', token), range(requests)))
+        elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for _, latency in results)
+
+    def percentile(fraction):
+        index = max(0, math.ceil(fraction * len(latencies)) - 1)
+        return latencies[index] * 1000
+
+    return {
+        'requests': requests,
+        'errors': sum(1 for status, _ in results if status != 200),
+        'rps': requests / elapsed,
+        'p50_ms': percentile(0.50),
+        'p99_ms': percentile(0.99)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.serving_modes',
+        description='Compare the sync WSGI and the ASGI serving modes.')
+    parser.add_argument(
+        '--latency-ms', type=float, default=100,
+        help='delay of the Auth0 stand-in')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument(
+        '--jwks-cache-ttl', type=float, default=0,
+        help='seconds the API caches the key set (default: no caching)')
+    parser.add_argument(
+        '--threads', type=int, default=8,
+        help='threads of the gunicorn gthread worker')
+    parser.add_argument(
+        '--modes', nargs='+', choices=MODES, default=list(MODES))
+    args = parser.parse_args(argv)
+
+    private_key, jwks = make_signing_key()
+    token = make_token(private_key)
+    stub = start_auth0_stub(jwks, args.latency_ms / 1000)
+
+    env = dict(os.environ)
+    env.update({
+        'AUTH0_DOMAIN': AUTH0_DOMAIN,
+        'AUTH0_JWKS_URL': 'http://127.0.0.1:{}/.well-known/jwks.json'.format(
+            stub.server_address[1]),
+        'JWKS_CACHE_TTL': str(args.jwks_cache_ttl)
+    })
+
+    print('{:<8} {:>9} {:>7} {:>9} {:>9} {:>9}'.format(
+        'mode', 'requests', 'errors', 'req/s', 'p50 ms', 'p99 ms'))
+
+    try:
+        for mode in args.modes:
+            port = free_port()
+            process = subprocess.Popen(
+                server_command(mode, port, args.threads), cwd=BACKEND_DIR,
+                env=env)
+            try:
+                wait_until_listening(port, process)
+                result = run_load(port, token, args.requests, args.concurrency)
+            finally:
+                process.terminate()
+                process.wait()
+
+            print('{:<8} {:>9} {:>7} {:>9.1f} {:>9.1f} {:>9.1f}'.format(
+                mode, result['requests'], result['errors'], result['rps'],
+                result['p50_ms'], result['p99_ms']))
+    finally:
+        stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
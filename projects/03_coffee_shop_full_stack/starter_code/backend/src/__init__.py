@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The shared modules of the projects folder, before any module of the
+# package imports them
+sys.path.append(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', '..'))
@@ -1,22 +1,27 @@
 import os
-from flask import Flask, request, jsonify, abort
+from flask import Flask, request, abort
 from sqlalchemy import exc
 import json
 from flask_cors import CORS
 
 from .database.models import db_drop_and_create_all, setup_db, Drink, db
 from .auth.auth import AuthError, requires_auth
+from common.compression import Compress
+from common.fastjson import FastJSON, jsonify, list_response
 
 app = Flask(__name__)
 setup_db(app)
+FastJSON(app)
 CORS(app)
+app.wsgi_app = Compress(app.wsgi_app)
 
 '''
 @TODO uncomment the following line to initialize the datbase
 !! NOTE THIS WILL DROP ALL RECORDS AND START YOUR DB FROM SCRATCH
 !! NOTE THIS MUST BE UNCOMMENTED ON FIRST RUN
 '''
-# db_drop_and_create_all()
+# with app.app_context():
+#     db_drop_and_create_all()
 
 
 def validate_recipe(recipe):
@@ -46,48 +51,60 @@ def validate_recipe(recipe):
     return is_valid
 
 
+def get_fields(projection):
+    '''Returns the fields requested with ?fields=, all of them by default.
+    '''
+    try:
+        return projection.parse(request.args.get('fields'))
+    except ValueError:
+        abort(400)
+
+
+def list_drinks(projection, fields):
+    '''Returns the drinks built from the columns of the fields only.
+    '''
+    drinks = projection.query(db.session, fields).order_by(Drink.id).all()
+    return projection.format(drinks, fields)
+
+
 ## ROUTES
 '''
     GET /drinks
         it is a public endpoint
         contains only the drink.short() data representation
+        ?fields=id,title returns only those fields
         returns status code 200 and json {"success": True, "drinks": drinks} where drinks is the list of drinks
         or appropriate status code indicating reason for failure
 '''
 @app.route('/drinks')
 def get_drinks():
+    fields = get_fields(Drink.short_projection)
     try:
-        drinks = Drink.query.order_by(Drink.id).all()
-        drinks_short = [drink.short() for drink in drinks]
+        drinks_short = list_drinks(Drink.short_projection, fields)
     except Exception:
         abort(500)
 
-    return jsonify({
-        'success': True,
-        'drinks': drinks_short
-    })
+    return list_response({'success': True}, 'drinks', drinks_short)
 
 
 '''
     GET /drinks-detail
         requires the 'get:drinks-detail' permission
         contains the drink.long() data representation
+        ?fields=id,title returns only those fields
     returns status code 200 and json {"success": True, "drinks": drinks} where drinks is the list of drinks
         or appropriate status code indicating reason for failure
 '''
 @app.route('/drinks-detail')
 @requires_auth('get:drinks-detail')
 def get_drinks_in_detail(jwt):
+    fields = get_fields(Drink.long_projection)
     try:
-        drinks = Drink.query.order_by(Drink.id).all()
-        drinks_long = [drink.long() for drink in drinks]
+        drinks_long = list_drinks(Drink.long_projection, fields)
     except Exception:
         abort(500)
 
-    return jsonify({
-        'success': True,
-        'drinks': drinks_long
-    })
+    return list_response({'success': True}, 'drinks', drinks_long)
 
 
 '''
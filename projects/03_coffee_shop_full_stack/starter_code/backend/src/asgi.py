@@ -0,0 +1,267 @@
+import asyncio
+import json
+from quart import Quart, request, jsonify, abort
+from quart_cors import cors
+
+from .api import app as wsgi_app, list_drinks, validate_recipe
+from .database.models import Drink, db
+from .auth.auth import AuthError
+from .auth.auth_async import requires_auth
+from common.fastjson import FastJSON
+
+'''
+ASGI mode of the coffee shop API
+
+Serves the same routes as api.py with async handlers. JWKS retrieval
+and database calls run in worker threads so the event loop keeps
+serving other requests while they wait. Run it with an ASGI server:
+
+    uvicorn src.asgi:app
+'''
+
+app = cors(Quart(__name__))
+FastJSON(app)
+
+
+async def run_db(f, *args):
+    '''Runs a blocking database function in a worker thread.
+
+    The function runs inside the app context of the WSGI app, which owns
+    the SQLAlchemy configuration, and its session is removed afterwards.
+    '''
+    def call():
+        with wsgi_app.app_context():
+            try:
+                return f(*args)
+            finally:
+                db.session.remove()
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, call)
+
+
+## Database operations
+
+def insert_drink(title, recipe):
+    try:
+        drink = Drink(title=title, recipe=json.dumps(recipe))
+        drink.insert()
+        return drink.long()
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def update_drink_by_id(id, title, recipe):
+    '''Returns the updated drink, or None if there is no drink with the id.
+    '''
+    drink = Drink.query.filter(Drink.id == id).one_or_none()
+
+    if drink is None:
+        return None
+
+    try:
+        if title:
+            drink.title = title
+
+        if recipe:
+            drink.recipe = json.dumps(recipe)
+
+        drink.update()
+        return drink.long()
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def delete_drink_by_id(id):
+    '''Returns False if there is no drink with the id.
+    '''
+    drink = Drink.query.filter(Drink.id == id).one_or_none()
+
+    if drink is None:
+        return False
+
+    try:
+        drink.delete()
+        return True
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+## ROUTES
+'''
+    See api.py for the contract of each endpoint.
+'''
+def get_fields(projection):
+    try:
+        return projection.parse(request.args.get('fields'))
+    except ValueError:
+        abort(400)
+
+
+@app.route('/drinks')
+async def get_drinks():
+    fields = get_fields(Drink.short_projection)
+    try:
+        drinks_short = await run_db(
+            list_drinks, Drink.short_projection, fields)
+    except Exception:
+        abort(500)
+
+    return jsonify({
+        'success': True,
+        'drinks': drinks_short
+    })
+
+
+@app.route('/drinks-detail')
+@requires_auth('get:drinks-detail')
+async def get_drinks_in_detail(jwt):
+    fields = get_fields(Drink.long_projection)
+    try:
+        drinks_long = await run_db(
+            list_drinks, Drink.long_projection, fields)
+    except Exception:
+        abort(500)
+
+    return jsonify({
+        'success': True,
+        'drinks': drinks_long
+    })
+
+
+@app.route('/drinks', methods=['POST'])
+@requires_auth('post:drinks')
+async def create_drink(jwt):
+    body = await request.get_json()
+    title = body.get('title', None)
+    recipe = body.get("recipe", [])
+
+    if type(recipe) != list:
+        recipe = [recipe]
+
+    # Input validation for recipe
+    if not recipe or not validate_recipe(recipe):
+        abort(400)
+
+    try:
+        drink = await run_db(insert_drink, title, recipe)
+    except Exception:
+        abort(422)
+
+    return jsonify({
+        'success': True,
+        'drinks': [drink]
+    })
+
+
+@app.route('/drinks/<int:id>', methods=['PATCH'])
+@requires_auth('patch:drinks')
+async def update_drink(jwt, id):
+    body = await request.get_json()
+    title = body.get('title', None)
+    recipe = body.get("recipe", [])
+
+    if type(recipe) != list:
+        recipe = [recipe]
+
+    # Input validation for recipe
+    if recipe and not validate_recipe(recipe):
+        abort(400)
+
+    try:
+        drink = await run_db(update_drink_by_id, id, title, recipe)
+    except Exception:
+        abort(422)
+
+    if drink is None:
+        abort(404)
+
+    return jsonify({
+        'success': True,
+        'drinks': [drink]
+    })
+
+
+@app.route('/drinks/<int:id>', methods=['DELETE'])
+@requires_auth('delete:drinks')
+async def delete_drink(jwt, id):
+    try:
+        deleted = await run_db(delete_drink_by_id, id)
+    except Exception:
+        abort(422)
+
+    if not deleted:
+        abort(404)
+
+    return jsonify({
+        'success': True,
+        'delete': id
+    })
+
+
+## Error Handling
+
+@app.errorhandler(422)
+async def unprocessable(error):
+    return jsonify({
+        "success": False,
+        "error": 422,
+        "message": "unprocessable"
+    }), 422
+
+@app.errorhandler(400)
+async def bad_request(error):
+    return jsonify({
+        "success": False,
+        "error": 400,
+        "message": "bad request"
+    }), 400
+
+@app.errorhandler(401)
+async def unauthorized(error):
+    return jsonify({
+        "success": False,
+        "error": 401,
+        "message": "unauthorized"
+    }), 401
+
+@app.errorhandler(403)
+async def forbidden(error):
+    return jsonify({
+        "success": False,
+        "error": 403,
+        "message": "forbidden"
+    }), 403
+
+@app.errorhandler(404)
+async def not_found(error):
+    return jsonify({
+        "success": False,
+        "error": 404,
+        "message": "resource not found"
+    }), 404
+
+@app.errorhandler(405)
+async def not_allowed(error):
+    return jsonify({
+        'success': False,
+        'error': 405,
+        'message': 'method not allowed'
+    }), 405
+
+@app.errorhandler(500)
+async def server_error(error):
+    return jsonify({
+        "success": False,
+        "error": 500,
+        "message": "internal server error"
+    }), 500
+
+@app.errorhandler(AuthError)
+async def handle_auth_error(ex):
+    response = jsonify(ex.error)
+    response.status_code = ex.status_code
+    return response
@@ -1,13 +1,20 @@
 import json
-from flask import request, _request_ctx_stack
+import os
+import threading
+import time
+from flask import request
 from functools import wraps
 from jose import jwt
 from urllib.request import urlopen
 
 
-AUTH0_DOMAIN = 'dev-nisher.us.auth0.com'
+AUTH0_DOMAIN = os.getenv('AUTH0_DOMAIN', 'dev-nisher.us.auth0.com')
 ALGORITHMS = ['RS256']
 API_AUDIENCE = 'drinks'
+JWKS_URL = os.getenv(
+    'AUTH0_JWKS_URL', f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
+# Seconds the signing keys are reused before they are fetched again
+JWKS_CACHE_TTL = float(os.getenv('JWKS_CACHE_TTL', '600'))
 
 ## AuthError Exception
 '''
@@ -34,8 +41,22 @@ def get_token_auth_header():
     """
 
     # Get the header from the request
-    auth_header = request.headers.get('Authorization', None)
-    
+    return parse_auth_header(request.headers.get('Authorization', None))
+
+
+def parse_auth_header(auth_header):
+    """Obtains the access token from an Authorization header value.
+
+    Arg:
+        auth_header: the header value, or None if it is missing.
+
+    Returns:
+        The token part of the header as a string.
+
+    Raises:
+        AuthError: An error occurred if no header is present or 
+          the header is malformed.
+    """
     # Raise an AuthError if no header is present
     if not auth_header:
         raise AuthError({
@@ -92,10 +113,55 @@ def check_permissions(permission, payload):
     return True
 
 
-def verify_decode_jwt(token):
+## JSON Web Key Set
+
+_jwks_lock = threading.Lock()
+_jwks_cache = {'keys': None, 'fetched_at': 0.0}
+
+
+def fetch_jwks():
+    '''Loads the public key set from Auth0.
+    '''
+    url = urlopen(JWKS_URL)
+    return json.loads(url.read())
+
+
+def get_cached_jwks():
+    '''Returns the cached key set, or None if it has expired.
+    '''
+    if time.monotonic() - _jwks_cache['fetched_at'] < JWKS_CACHE_TTL:
+        return _jwks_cache['keys']
+    return None
+
+
+def store_jwks(jwks):
+    _jwks_cache['keys'] = jwks
+    _jwks_cache['fetched_at'] = time.monotonic()
+
+
+def get_jwks():
+    '''Returns the Auth0 key set, fetching it at most once per JWKS_CACHE_TTL.
+    '''
+    if JWKS_CACHE_TTL <= 0:
+        return fetch_jwks()
+
+    jwks = get_cached_jwks()
+    if jwks is not None:
+        return jwks
+
+    with _jwks_lock:
+        jwks = get_cached_jwks()
+        if jwks is None:
+            jwks = fetch_jwks()
+            store_jwks(jwks)
+        return jwks
+
+
+def verify_decode_jwt(token, jwks=None):
     '''Verify the input token and decodes the payload from it.
     Arg:
         token: A json web token (string). It should be an Auth0 token with key id (kid)
+        jwks: the Auth0 key set, fetched with get_jwks() if not given
     
     Returns:
         The decoded payload as a string. 
@@ -108,8 +174,8 @@ def verify_decode_jwt(token):
     '''
 
     # Load the public key from Auth0
-    url = urlopen(f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
-    jwks = json.loads(url.read())
+    if jwks is None:
+        jwks = get_jwks()
 
     # Unpack the jwt header
     unverified_header = jwt.get_unverified_header(token)
@@ -0,0 +1,71 @@
+import asyncio
+from functools import wraps
+from quart import request
+
+from .auth import (
+    JWKS_CACHE_TTL,
+    check_permissions,
+    fetch_jwks,
+    get_cached_jwks,
+    parse_auth_header,
+    store_jwks,
+    verify_decode_jwt
+)
+
+'''
+Async counterparts of the auth helpers for the ASGI app
+
+The key set is fetched in a worker thread, so a slow Auth0 response
+only delays the request that needs the keys instead of blocking the
+event loop. Concurrent requests share one fetch.
+'''
+
+_jwks_fetch = None
+
+
+async def get_jwks_async():
+    '''Returns the Auth0 key set without blocking the event loop.
+    '''
+    global _jwks_fetch
+
+    loop = asyncio.get_running_loop()
+    if JWKS_CACHE_TTL <= 0:
+        return await loop.run_in_executor(None, fetch_jwks)
+
+    jwks = get_cached_jwks()
+    if jwks is not None:
+        return jwks
+
+    if _jwks_fetch is None:
+        _jwks_fetch = loop.run_in_executor(None, fetch_jwks)
+    fetch = _jwks_fetch
+    try:
+        jwks = await fetch
+        store_jwks(jwks)
+    finally:
+        if _jwks_fetch is fetch:
+            _jwks_fetch = None
+    return jwks
+
+
+def requires_auth(permission=''):
+    '''Async version of auth.requires_auth for Quart route handlers.
+
+    Arg:
+        permission: string permission (i.e. 'post:drink').
+
+    Returns:
+        The decorator which passes the decoded payload to the decorated coroutine.
+    '''
+    def requires_auth_decorator(f):
+        @wraps(f)
+        async def wrapper(*args, **kwargs):
+            token = parse_auth_header(request.headers.get('Authorization', None))
+            jwks = await get_jwks_async()
+            payload = verify_decode_jwt(token, jwks)
+            check_permissions(permission, payload)
+            return await f(payload, *args, **kwargs)
+
+        return wrapper
+
+    return requires_auth_decorator
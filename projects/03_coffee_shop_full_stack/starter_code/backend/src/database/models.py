@@ -3,6 +3,8 @@ from sqlalchemy import Column, String, Integer
 from flask_sqlalchemy import SQLAlchemy
 import json
 
+from common.projection import Field, Projection
+
 database_filename = "database.db"
 project_dir = os.path.dirname(os.path.abspath(__file__))
 database_path = "sqlite:///{}".format(os.path.join(project_dir, database_filename))
@@ -16,7 +18,6 @@ setup_db(app)
 def setup_db(app):
     app.config["SQLALCHEMY_DATABASE_URI"] = database_path
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-    db.app = app
     db.init_app(app)
 
 '''
@@ -24,6 +25,7 @@ db_drop_and_create_all()
     drops the database tables and starts fresh
     can be used to initialize a clean database
     !!NOTE you can change the database_filename variable to have multiple verisons of a database
+    must run inside an app context
 '''
 def db_drop_and_create_all():
     db.drop_all()
@@ -104,4 +106,33 @@ class Drink(db.Model):
         db.session.commit()
 
     def __repr__(self):
-        return json.dumps(self.short())
\ No newline at end of file
+        return json.dumps(self.short())
+
+
+'''
+short_recipe(recipe)
+    the colors and parts of a recipe blob, as in Drink.short()
+'''
+def short_recipe(recipe):
+    return [{'color': r['color'], 'parts': r['parts']} for r in json.loads(recipe)]
+
+
+'''
+Drink.short_projection, Drink.long_projection
+    the fields of short() and long(), built from selected columns only
+    EXAMPLE
+        fields = Drink.short_projection.parse('id,title')
+        rows = Drink.short_projection.query(db.session, fields).all()
+        drinks = Drink.short_projection.format(rows, fields)
+'''
+Drink.short_projection = Projection({
+    'id': Drink.id,
+    'title': Drink.title,
+    'recipe': Field(Drink.recipe, value=short_recipe)
+})
+
+Drink.long_projection = Projection({
+    'id': Drink.id,
+    'title': Drink.title,
+    'recipe': Field(Drink.recipe, value=json.loads)
+})
@@ -0,0 +1,65 @@
+import asyncio
+import json
+import unittest
+
+from src.api import app as wsgi_app
+from src.asgi import app
+from src.database.models import Drink, db
+
+'''
+Tests of the ASGI mode, run them in the environment of
+requirements-asgi.txt from the backend directory:
+
+    python -m pytest -q test_asgi.py
+
+The app runs against an in-memory SQLite database, not database.db.
+'''
+
+wsgi_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+
+RECIPE = [{'name': 'milk', 'color': 'white', 'parts': 1}]
+
+
+class AsgiTestCase(unittest.TestCase):
+    """This class represents the ASGI coffee shop API test case"""
+
+    def setUp(self):
+        with wsgi_app.app_context():
+            db.create_all()
+            Drink(title='Flat White', recipe=json.dumps(RECIPE)).insert()
+        self.client = app.test_client()
+
+    def tearDown(self):
+        with wsgi_app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def get(self, path, **kwargs):
+        async def request():
+            response = await self.client.get(path, **kwargs)
+            return response.status_code, await response.get_json()
+        return asyncio.run(request())
+
+    def test_get_drinks(self):
+        status, data = self.get('/drinks')
+
+        self.assertEqual(status, 200)
+        self.assertEqual(data['success'], True)
+        self.assertEqual([drink['title'] for drink in data['drinks']],
+                         ['Flat White'])
+
+    def test_get_drinks_sparse_fields(self):
+        status, data = self.get('/drinks', query_string={'fields': 'title'})
+
+        self.assertEqual(status, 200)
+        self.assertEqual(data['drinks'], [{'title': 'Flat White'}])
+
+    def test_401_drinks_detail_without_token(self):
+        status, data = self.get('/drinks-detail')
+
+        self.assertEqual(status, 401)
+        self.assertEqual(data['code'], 'authorization_header_missing')
+
+
+if __name__ == "__main__":
+    unittest.main()
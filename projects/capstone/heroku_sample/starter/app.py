@@ -1,27 +1,87 @@
 import os
+import sys
+from importlib import import_module
 from flask import Flask
+
+# The shared modules of the projects folder, before any import of them
+sys.path.append(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+
+from auth import AuthError
+from extensions import auth, cors
 from models import setup_db
+from settings import load_settings
+from common.fastjson import FastJSON, jsonify
+
+'''
+Blueprints registered by create_app(), as 'module:attribute'
+
+Imported while the app is created, so importing this module stays cheap.
+'''
+BLUEPRINTS = (
+    'greetings:bp',
+    'resources:bp',
+)
+
+
+def register_blueprints(app):
+    for path in BLUEPRINTS:
+        module_name, attribute = path.split(':')
+        app.register_blueprint(getattr(import_module(module_name), attribute))
+
+
+ERROR_MESSAGES = {
+    400: 'bad request',
+    401: 'unauthorized',
+    403: 'forbidden',
+    404: 'resource not found',
+    405: 'method not allowed',
+    422: 'unprocessable',
+    500: 'internal server error'
+}
+
+
+def register_error_handlers(app):
+    def handle_error(error):
+        return jsonify({
+            'success': False,
+            'error': error.code,
+            'message': ERROR_MESSAGES[error.code]
+        }), error.code
+
+    for code in ERROR_MESSAGES:
+        app.register_error_handler(code, handle_error)
+
+    @app.errorhandler(AuthError)
+    def handle_auth_error(ex):
+        response = jsonify(ex.error)
+        response.status_code = ex.status_code
+        return response
+
 
 def create_app(test_config=None):
+    '''Builds the app.
 
+    Args:
+        test_config: settings overriding the environment, see settings.py,
+          also applied to the Flask config.
+    '''
     app = Flask(__name__)
-    setup_db(app)
-    CORS(app)
+    if test_config is not None:
+        app.config.from_mapping(test_config)
 
-    @app.route('/')
-    def get_greeting():
-        excited = os.environ['EXCITED']
-        greeting = "Hello" 
-        if excited == 'true': greeting = greeting + "!!!!!"
-        return greeting
+    settings = load_settings(test_config)
+    app.extensions['settings'] = settings
 
-    @app.route('/coolkids')
-    def be_cool():
-        return "Be cool, man, be coooool! You're almost a FSND grad!"
+    setup_db(app)
+    FastJSON(app)
+    cors.init_app(app, origins=settings.cors_origins)
+    auth.init_app(app)
+    register_blueprints(app)
+    register_error_handlers(app)
 
     return app
 
-app = create_app()
 
 if __name__ == '__main__':
-    app.run()
\ No newline at end of file
+    create_app().run()
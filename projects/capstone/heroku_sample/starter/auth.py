@@ -0,0 +1,205 @@
+import json
+import threading
+import time
+from flask import current_app, request
+from functools import wraps
+from urllib.request import urlopen
+
+ALGORITHMS = ['RS256']
+
+'''
+Auth0 access token checks, set up as a Flask extension
+
+Follows the coffee shop API (projects/03_coffee_shop_full_stack), the
+Auth0 tenant and audience come from the app settings instead of module
+constants. python-jose is imported on the first token check so apps
+that never verify a token do not pay for it at startup.
+'''
+
+
+## AuthError Exception
+'''
+AuthError Exception
+A standardized way to communicate auth failure modes
+'''
+class AuthError(Exception):
+    def __init__(self, error, status_code):
+        self.error = error
+        self.status_code = status_code
+
+
+def get_token_auth_header():
+    '''Obtains the access token from the Authorization header.
+
+    Raises:
+        AuthError: the header is missing or malformed.
+    '''
+    auth_header = request.headers.get('Authorization', None)
+    if not auth_header:
+        raise AuthError({
+            'code': 'authorization_header_missing',
+            'description': 'Authorization header is missing.'
+        }, 401)
+
+    header_parts = auth_header.split(' ')
+
+    if len(header_parts) != 2:
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Authorization header is malformed.'
+        }, 401)
+
+    if header_parts[0].lower() != 'bearer':
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Authorization header must start with "Bearer"'
+        }, 401)
+
+    return header_parts[1]
+
+
+def check_permissions(permission, payload):
+    '''Checks if the permission string is in the payload permissions.
+
+    Raises:
+        AuthError: the payload has no permissions, or not this one.
+    '''
+    if 'permissions' not in payload:
+        raise AuthError({
+            'code': 'invalid_claims',
+            'description': 'Permissions are not included in the payload.'
+        }, 400)
+
+    if permission not in payload['permissions']:
+        raise AuthError({
+            'code': 'unauthorized',
+            'description': 'Permission is not found.'
+        }, 403)
+
+    return True
+
+
+class Auth:
+    '''Verifies Auth0 tokens for the apps it is initialized with.
+    '''
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        settings = app.extensions['settings']
+        app.extensions['auth'] = _AuthState(
+            settings.auth0_domain,
+            settings.api_audience,
+            settings.jwks_cache_ttl)
+
+    @staticmethod
+    def state():
+        return current_app.extensions['auth']
+
+
+class _AuthState:
+    def __init__(self, domain, audience, jwks_cache_ttl):
+        self.domain = domain
+        self.audience = audience
+        self.jwks_url = 'https://{}/.well-known/jwks.json'.format(domain)
+        self.jwks_cache_ttl = jwks_cache_ttl
+        self._lock = threading.Lock()
+        self._jwks = None
+        self._fetched_at = 0.0
+
+    def fetch_jwks(self):
+        return json.loads(urlopen(self.jwks_url).read())
+
+    def get_jwks(self):
+        '''Returns the Auth0 key set, fetched at most once per TTL.
+        '''
+        if self.jwks_cache_ttl <= 0:
+            return self.fetch_jwks()
+
+        with self._lock:
+            if (self._jwks is None or
+                    time.monotonic() - self._fetched_at >=
+                    self.jwks_cache_ttl):
+                self._jwks = self.fetch_jwks()
+                self._fetched_at = time.monotonic()
+            return self._jwks
+
+    def verify_decode_jwt(self, token):
+        '''Verifies the token and returns its decoded payload.
+
+        Raises:
+            AuthError: the token cannot be verified.
+        '''
+        from jose import jwt
+
+        unverified_header = jwt.get_unverified_header(token)
+        if 'kid' not in unverified_header:
+            raise AuthError({
+                'code': 'invalid_header',
+                'description': 'The jwt header is malformed.'
+            }, 401)
+
+        rsa_key = {}
+        for key in self.get_jwks()['keys']:
+            if key['kid'] == unverified_header['kid']:
+                rsa_key = {
+                    'kty': key['kty'],
+                    'kid': key['kid'],
+                    'use': key['use'],
+                    'n': key['n'],
+                    'e': key['e']
+                }
+
+        if not rsa_key:
+            raise AuthError({
+                'code': 'invalid_header',
+                'description': 'Unable to find the appropriate key.'
+            }, 400)
+
+        try:
+            return jwt.decode(
+                token,
+                rsa_key,
+                algorithms=ALGORITHMS,
+                audience=self.audience,
+                issuer='https://' + self.domain + '/'
+            )
+        except jwt.ExpiredSignatureError:
+            raise AuthError({
+                'code': 'token_expired',
+                'description': 'Token is expired.'
+            }, 401)
+        except jwt.JWTClaimsError:
+            raise AuthError({
+                'code': 'invalid_claims',
+                'description': 'Incorrect claims. Please check the audience and issuer.'
+            }, 401)
+        except Exception:
+            raise AuthError({
+                'code': 'invalid_header',
+                'description': 'Unable to decode token.'
+            }, 400)
+
+
+def requires_auth(permission=''):
+    '''Checks the access token of the request for a permission.
+
+    Arg:
+        permission: string permission (i.e. 'post:movies').
+
+    Returns:
+        The decorator which passes the decoded payload to the decorated method.
+    '''
+    def requires_auth_decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            token = get_token_auth_header()
+            payload = Auth.state().verify_decode_jwt(token)
+            check_permissions(permission, payload)
+            return f(payload, *args, **kwargs)
+
+        return wrapper
+
+    return requires_auth_decorator
@@ -0,0 +1,15 @@
+from flask_cors import CORS
+from flask_sqlalchemy import SQLAlchemy
+
+from auth import Auth
+
+'''
+Extensions shared by every app create_app() builds
+
+Created unbound and initialized per app, the database engine is only
+created when a request first uses it.
+'''
+
+db = SQLAlchemy()
+cors = CORS()
+auth = Auth()
@@ -0,0 +1,16 @@
+from flask import Blueprint, current_app
+
+bp = Blueprint('greetings', __name__)
+
+
+@bp.route('/')
+def get_greeting():
+    greeting = "Hello"
+    if current_app.extensions['settings'].excited:
+        greeting = greeting + "!!!!!"
+    return greeting
+
+
+@bp.route('/coolkids')
+def be_cool():
+    return "Be cool, man, be coooool! You're almost a FSND grad!"
@@ -1,33 +1,87 @@
-from sqlalchemy import Column, String, create_engine
-from flask_sqlalchemy import SQLAlchemy
-import json
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import Column, Date, ForeignKey, Integer, String, Table
+from sqlalchemy.orm import relationship
 
-database_path = os.environ['DATABASE_URL']
+from common.database import configure_database, register_pool_metrics
+from common.projection import Projection
 
-db = SQLAlchemy()
+from extensions import db
 
 '''
 setup_db(app)
     binds a flask application and a SQLAlchemy service
+    the database URL comes from the app settings, pool settings from the
+    environment, see common/database.py
+    the engine is created on first use, run `flask init-db` to create
+    the tables
 '''
-def setup_db(app, database_path=database_path):
-    app.config["SQLALCHEMY_DATABASE_URI"] = database_path
-    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-    db.app = app
+def setup_db(app, database_path=None):
+    if database_path is None:
+        database_path = app.extensions['settings'].database_url
+    configure_database(app, database_path)
     db.init_app(app)
+    register_pool_metrics(app, db)
+    app.cli.add_command(init_db_command)
+
+
+'''
+init_db_command()
+    creates the tables that do not exist yet
+'''
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
     db.create_all()
+    click.echo('Initialized the database.')
+
+
+'''
+CRUDMethods
+    insert, update and delete helpers shared by the models
+'''
+class CRUDMethods:
+  def insert(self):
+    db.session.add(self)
+    db.session.commit()
+
+  def update(self):
+    db.session.commit()
+
+  def delete(self):
+    db.session.delete(self)
+    db.session.commit()
+
+
+'''
+movie_cast
+    the people that appear in each movie
+'''
+movie_cast = Table(
+  'movie_cast', db.Model.metadata,
+  Column('movie_id', Integer,
+         ForeignKey('movies.id', ondelete='CASCADE'), primary_key=True),
+  Column('person_id', Integer,
+         ForeignKey('People.id', ondelete='CASCADE'), primary_key=True,
+         index=True))
 
 
 '''
 Person
-Have title and release year
+Have name and catchphrase
+
+Relationships are never loaded implicitly (lazy='raise'), reads select
+the related rows of a whole page at once, see resources.load_related().
 '''
-class Person(db.Model):  
+class Person(CRUDMethods, db.Model):
   __tablename__ = 'People'
 
   id = Column(Integer, primary_key=True)
-  name = Column(String)
+  name = Column(String, nullable=False)
   catchphrase = Column(String)
+  movies = relationship(
+    'Movie', secondary=movie_cast, back_populates='cast',
+    order_by='Movie.id', lazy='raise')
 
   def __init__(self, name, catchphrase=""):
     self.name = name
@@ -37,4 +91,60 @@ class Person(db.Model):
     return {
       'id': self.id,
       'name': self.name,
-      'catchphrase': self.catchphrase}
\ No newline at end of file
+      'catchphrase': self.catchphrase}
+
+
+'''
+Movie
+Have title and release date
+'''
+class Movie(CRUDMethods, db.Model):
+  __tablename__ = 'movies'
+
+  id = Column(Integer, primary_key=True)
+  title = Column(String, nullable=False)
+  release_date = Column(Date)
+  cast = relationship(
+    'Person', secondary=movie_cast, back_populates='movies',
+    order_by='Person.id', lazy='raise')
+
+  def format(self):
+    return {
+      'id': self.id,
+      'title': self.title,
+      'release_date': self.release_date}
+
+
+'''
+Projections
+    the fields of format(), selectable with ?fields=, and the summary
+    sent for each related row
+'''
+Person.projection = Projection({
+  'id': Person.id,
+  'name': Person.name,
+  'catchphrase': Person.catchphrase
+})
+Person.summary = Projection({
+  'id': Person.id,
+  'name': Person.name
+})
+
+Movie.projection = Projection({
+  'id': Movie.id,
+  'title': Movie.title,
+  'release_date': Movie.release_date
+})
+Movie.summary = Projection({
+  'id': Movie.id,
+  'title': Movie.title
+})
+
+# Relationship fields: the association columns linking a row to its
+# related rows and the model of those rows
+Person.related = {
+  'movies': (movie_cast.c.person_id, movie_cast.c.movie_id, Movie)
+}
+Movie.related = {
+  'cast': (movie_cast.c.movie_id, movie_cast.c.person_id, Person)
+}
@@ -0,0 +1,406 @@
+import base64
+from datetime import date
+from flask import Blueprint, abort, request
+from sqlalchemy.orm import load_only, selectinload
+
+from auth import requires_auth
+from extensions import db
+from models import Movie, Person
+from common.fastjson import jsonify
+
+'''
+People and movies API
+
+Lists are paginated with keyset cursors: a page ends with next_cursor,
+pass it back as ?cursor= to get the next page. Unlike offsets a cursor
+keeps its cost constant however deep the client pages, and rows added
+meanwhile do not shift the pages.
+
+Every read takes ?fields=id,name to return only those fields. Only the
+requested columns are selected and the output is built from the result
+tuples, see common/projection.py. Relationships (a person's movies, a
+movie's cast) are returned only when named and are selected with one
+extra query per page.
+
+POST and PATCH on a collection take a single object or a list of up to
+MAX_BULK_SIZE objects and commit them in one transaction.
+'''
+
+bp = Blueprint('resources', __name__)
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+MAX_BULK_SIZE = 100
+
+
+## Fields and pagination
+
+def parse_fields(model):
+    '''Returns the column and relationship fields named in ?fields=.
+
+    Without ?fields= every column field and no relationship is sent.
+    '''
+    value = request.args.get('fields', '')
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    if not names:
+        return model.projection.default, ()
+
+    relations = tuple(dict.fromkeys(
+        name for name in names if name in model.related))
+    columns = [name for name in names if name not in model.related]
+    try:
+        fields = model.projection.parse(','.join(columns)) if columns else ()
+    except ValueError:
+        abort(400)
+    return fields, relations
+
+
+def query_fields(model, fields):
+    '''Returns a query selecting the columns of the fields and the id.
+    '''
+    selected = fields if 'id' in fields else ('id',) + fields
+    return model.projection.query(db.session, selected)
+
+
+def load_related(model, name, ids):
+    '''Returns the summaries of the related rows of each id.
+
+    One query for all the ids, however many rows they relate to.
+    '''
+    owner_column, target_column, target = model.related[name]
+    related = {id: [] for id in ids}
+    if not ids:
+        return related
+
+    rows = db.session.query(owner_column, *target.summary.columns()) \
+        .select_from(owner_column.table) \
+        .join(target, target.id == target_column) \
+        .filter(owner_column.in_(ids)) \
+        .order_by(owner_column, target.id).all()
+
+    format_row = target.summary.formatter()
+    for row in rows:
+        related[row[0]].append(format_row(row[1:]))
+    return related
+
+
+def format_rows(model, rows, fields, relations):
+    '''Builds the output of rows selected with query_fields().
+    '''
+    selected = fields if 'id' in fields else ('id',) + fields
+    results = model.projection.format(rows, selected)
+    ids = [result['id'] for result in results]
+
+    for name in relations:
+        related = load_related(model, name, ids)
+        for result in results:
+            result[name] = related[result['id']]
+
+    if 'id' not in fields:
+        for result in results:
+            del result['id']
+    return results
+
+
+def encode_cursor(id):
+    return base64.urlsafe_b64encode(str(id).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return int(base64.urlsafe_b64decode(padded.encode()).decode())
+    except ValueError:
+        abort(400)
+
+
+def paginate(model, query):
+    '''Returns one page of the query and the cursor of the next page.
+    '''
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        query = query.filter(model.id > decode_cursor(cursor))
+
+    # One extra row tells whether there is a next page
+    rows = query.order_by(model.id).limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1].id) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+## Request bodies
+
+def get_items():
+    '''Returns the objects of a JSON body holding one object or a list.
+    '''
+    body = request.get_json(silent=True)
+    items = body if isinstance(body, list) else [body]
+    if (not items or len(items) > MAX_BULK_SIZE or
+            not all(isinstance(item, dict) for item in items)):
+        abort(422)
+    return items
+
+
+def string_value(item, name, required):
+    value = item.get(name)
+    if value is None and not required:
+        return None
+    if not isinstance(value, str) or not value.strip():
+        abort(422)
+    return value
+
+
+def person_values(item, partial=False):
+    values = {}
+    if not partial or 'name' in item:
+        values['name'] = string_value(item, 'name', required=True)
+    if 'catchphrase' in item:
+        catchphrase = item['catchphrase']
+        if catchphrase is not None and not isinstance(catchphrase, str):
+            abort(422)
+        values['catchphrase'] = catchphrase or ''
+    return values
+
+
+def movie_values(item, partial=False):
+    values = {}
+    if not partial or 'title' in item:
+        values['title'] = string_value(item, 'title', required=True)
+    if 'release_date' in item:
+        release_date = string_value(item, 'release_date', required=False)
+        try:
+            values['release_date'] = (
+                date.fromisoformat(release_date) if release_date else None)
+        except ValueError:
+            abort(422)
+    if 'cast' in item:
+        cast = item['cast']
+        if (not isinstance(cast, list) or
+                not all(isinstance(id, int) for id in cast)):
+            abort(422)
+        values['cast'] = cast
+    return values
+
+
+def resolve_cast(values_list):
+    '''Replaces the person ids under 'cast' with people, in one query.
+    '''
+    ids = {id for values in values_list for id in values.get('cast', ())}
+    if not ids:
+        return
+
+    people = Person.query.options(load_only('id')) \
+        .filter(Person.id.in_(ids)).all()
+    if len(people) != len(ids):
+        abort(422)
+
+    by_id = {person.id: person for person in people}
+    for values in values_list:
+        if 'cast' in values:
+            values['cast'] = [by_id[id] for id in values['cast']]
+
+
+RESOURCES = {
+    Person: ('people', person_values),
+    Movie: ('movies', movie_values)
+}
+
+
+## Generic handlers
+
+def list_resources(model):
+    key = RESOURCES[model][0]
+    fields, relations = parse_fields(model)
+    query = query_fields(model, fields)
+    rows, next_cursor = paginate(model, query)
+
+    return jsonify({
+        'success': True,
+        key: format_rows(model, rows, fields, relations),
+        'next_cursor': next_cursor
+    })
+
+
+def get_resource(model, id):
+    key = RESOURCES[model][0]
+    fields, relations = parse_fields(model)
+    query = query_fields(model, fields)
+    row = query.filter(model.id == id).one_or_none()
+
+    if row is None:
+        abort(404)
+
+    return jsonify({
+        'success': True,
+        key: format_rows(model, [row], fields, relations)
+    })
+
+
+def format_by_ids(model, ids, fields, relations):
+    '''Selects the rows with the ids in one query and formats them.
+    '''
+    query = query_fields(model, fields)
+    rows = query.filter(model.id.in_(ids)).order_by(model.id).all()
+    return format_rows(model, rows, fields, relations)
+
+
+def create_resources(model):
+    key, parse_values = RESOURCES[model]
+    fields, relations = parse_fields(model)
+    values_list = [parse_values(item) for item in get_items()]
+    resolve_cast(values_list)
+
+    rows = [model(**values) for values in values_list]
+
+    try:
+        db.session.add_all(rows)
+        db.session.commit()
+        ids = [row.id for row in rows]
+    except Exception:
+        db.session.rollback()
+        abort(422)
+
+    return jsonify({
+        'success': True,
+        key: format_by_ids(model, ids, fields, relations)
+    })
+
+
+def update_resources(model, items):
+    key, parse_values = RESOURCES[model]
+    fields, relations = parse_fields(model)
+
+    changes = {}
+    for item in items:
+        if not isinstance(item.get('id'), int) or item['id'] in changes:
+            abort(422)
+        changes[item['id']] = parse_values(item, partial=True)
+    resolve_cast(changes.values())
+
+    # Load every row in one query, with the relationships being replaced
+    query = model.query.filter(model.id.in_(changes))
+    for name in model.related:
+        if any(name in values for values in changes.values()):
+            query = query.options(selectinload(getattr(model, name)))
+    rows = query.all()
+
+    if len(rows) != len(changes):
+        abort(404)
+
+    try:
+        for row in rows:
+            for name, value in changes[row.id].items():
+                setattr(row, name, value)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        abort(422)
+
+    return jsonify({
+        'success': True,
+        key: format_by_ids(model, list(changes), fields, relations)
+    })
+
+
+def delete_resource(model, id):
+    # The association rows are deleted with the row, load them up front
+    query = model.query.options(load_only('id'))
+    for name in model.related:
+        query = query.options(selectinload(getattr(model, name)).load_only('id'))
+    row = query.filter(model.id == id).one_or_none()
+
+    if row is None:
+        abort(404)
+
+    try:
+        row.delete()
+    except Exception:
+        db.session.rollback()
+        abort(422)
+
+    return jsonify({
+        'success': True,
+        'delete': id
+    })
+
+
+## ROUTES
+
+@bp.route('/people')
+@requires_auth('get:people')
+def get_people(jwt):
+    return list_resources(Person)
+
+
+@bp.route('/people/<int:id>')
+@requires_auth('get:people')
+def get_person(jwt, id):
+    return get_resource(Person, id)
+
+
+@bp.route('/people', methods=['POST'])
+@requires_auth('post:people')
+def create_people(jwt):
+    return create_resources(Person)
+
+
+@bp.route('/people', methods=['PATCH'])
+@requires_auth('patch:people')
+def update_people(jwt):
+    return update_resources(Person, get_items())
+
+
+@bp.route('/people/<int:id>', methods=['PATCH'])
+@requires_auth('patch:people')
+def update_person(jwt, id):
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        abort(422)
+    return update_resources(Person, [dict(body, id=id)])
+
+
+@bp.route('/people/<int:id>', methods=['DELETE'])
+@requires_auth('delete:people')
+def delete_person(jwt, id):
+    return delete_resource(Person, id)
+
+
+@bp.route('/movies')
+@requires_auth('get:movies')
+def get_movies(jwt):
+    return list_resources(Movie)
+
+
+@bp.route('/movies/<int:id>')
+@requires_auth('get:movies')
+def get_movie(jwt, id):
+    return get_resource(Movie, id)
+
+
+@bp.route('/movies', methods=['POST'])
+@requires_auth('post:movies')
+def create_movies(jwt):
+    return create_resources(Movie)
+
+
+@bp.route('/movies', methods=['PATCH'])
+@requires_auth('patch:movies')
+def update_movies(jwt):
+    return update_resources(Movie, get_items())
+
+
+@bp.route('/movies/<int:id>', methods=['PATCH'])
+@requires_auth('patch:movies')
+def update_movie(jwt, id):
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        abort(422)
+    return update_resources(Movie, [dict(body, id=id)])
+
+
+@bp.route('/movies/<int:id>', methods=['DELETE'])
+@requires_auth('delete:movies')
+def delete_movie(jwt, id):
+    return delete_resource(Movie, id)
@@ -0,0 +1,60 @@
+import os
+from dataclasses import dataclass, fields
+
+'''
+Settings of the capstone app
+
+Read once when the app is created, from the environment and the
+test_config passed to create_app():
+
+    DATABASE_URL        database the app connects to (required)
+    EXCITED             adds excitement to the greeting (default false)
+    CORS_ORIGINS        comma separated origins allowed to call the API
+                        (default *)
+    AUTH0_DOMAIN        Auth0 tenant that issues the access tokens
+    API_AUDIENCE        audience the access tokens are issued for
+    JWKS_CACHE_TTL      seconds the Auth0 keys are reused (default 600)
+'''
+
+TRUE_VALUES = ('1', 'true', 'yes', 'on')
+
+
+@dataclass(frozen=True)
+class Settings:
+    database_url: str
+    excited: bool = False
+    cors_origins: tuple = ('*',)
+    auth0_domain: str = ''
+    api_audience: str = ''
+    jwks_cache_ttl: float = 600.0
+
+    @classmethod
+    def from_mapping(cls, mapping):
+        '''Builds the settings from upper case names, e.g. os.environ.
+
+        Raises:
+            KeyError: DATABASE_URL is missing.
+        '''
+        values = {}
+        for field in fields(cls):
+            name = field.name.upper()
+            if name not in mapping:
+                continue
+            value = mapping[name]
+            if field.type is bool and isinstance(value, str):
+                value = value.strip().lower() in TRUE_VALUES
+            elif field.type is float:
+                value = float(value)
+            elif field.type is tuple and isinstance(value, str):
+                value = tuple(item.strip() for item in value.split(',')
+                              if item.strip())
+            values[field.name] = value
+        return cls(**values)
+
+
+def load_settings(overrides=None):
+    '''Returns the settings from the environment, overrides win.
+    '''
+    mapping = dict(os.environ)
+    mapping.update(overrides or {})
+    return Settings.from_mapping(mapping)
@@ -0,0 +1,309 @@
+import base64
+import json
+import os
+import subprocess
+import sys
+import time
+import unittest
+from Crypto.PublicKey import RSA
+from jose import jwt
+from sqlalchemy import event
+
+from app import create_app
+from extensions import db
+
+STARTER_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Budgets for a cold worker, raise them on slow machines
+STARTUP_BUDGET_SECONDS = float(os.getenv('STARTUP_BUDGET_SECONDS', '2.0'))
+MEMORY_BUDGET_MB = float(os.getenv('MEMORY_BUDGET_MB', '100'))
+
+'''
+Runs in a fresh interpreter, like a worker that was just started, and
+prints the time and peak memory of importing the app, creating it and
+serving its first request
+'''
+MEASURE_STARTUP = '''
+import json, resource, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+created_app = app.create_app()
+created = time.perf_counter()
+created_app.test_client().get('/')
+served = time.perf_counter()
+print(json.dumps({
+    'import': imported - started,
+    'create_app': created - imported,
+    'first_request': served - created,
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'jose_imported': 'jose' in sys.modules
+}))
+'''
+
+
+class CapstoneTestCase(unittest.TestCase):
+    """This class represents the capstone app factory test case"""
+
+    def setUp(self):
+        self.app = create_app({'DATABASE_URL': 'sqlite://', 'EXCITED': 'true'})
+        self.client = self.app.test_client()
+
+    def test_settings_are_loaded_once(self):
+        settings = self.app.extensions['settings']
+        self.assertTrue(settings.excited)
+        self.assertEqual(settings.database_url, 'sqlite://')
+
+    def test_cors_origins_are_split(self):
+        app = create_app({
+            'DATABASE_URL': 'sqlite://',
+            'CORS_ORIGINS': 'https://a.example.com, https://b.example.com'
+        })
+
+        res = app.test_client().get(
+            '/', headers={'Origin': 'https://b.example.com'})
+
+        self.assertEqual(app.extensions['settings'].cors_origins,
+                         ('https://a.example.com', 'https://b.example.com'))
+        self.assertEqual(res.headers['Access-Control-Allow-Origin'],
+                         'https://b.example.com')
+
+    def test_greeting(self):
+        res = self.client.get('/')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data, b'Hello!!!!!')
+
+    def test_apps_do_not_share_settings(self):
+        calm_app = create_app({'DATABASE_URL': 'sqlite://', 'EXCITED': 'false'})
+
+        self.assertEqual(calm_app.test_client().get('/').data, b'Hello')
+        self.assertEqual(self.client.get('/').data, b'Hello!!!!!')
+
+    def test_engine_is_created_on_first_use(self):
+        self.assertEqual(self.app.extensions['sqlalchemy'].connectors, {})
+
+    def test_missing_token_is_unauthorized(self):
+        from auth import requires_auth
+
+        @self.app.route('/protected')
+        @requires_auth('get:movies')
+        def protected(payload):
+            return 'ok'
+
+        res = self.client.get('/protected')
+
+        self.assertEqual(res.status_code, 401)
+        self.assertEqual(res.get_json()['code'], 'authorization_header_missing')
+
+    def test_startup_time_and_memory(self):
+        env = dict(os.environ, DATABASE_URL='sqlite://')
+        output = subprocess.run(
+            [sys.executable, '-c', MEASURE_STARTUP], cwd=STARTER_DIR, env=env,
+            check=True, stdout=subprocess.PIPE).stdout
+        result = json.loads(output)
+        startup = result['import'] + result['create_app'] + result['first_request']
+
+        self.assertLess(startup, STARTUP_BUDGET_SECONDS,
+                        'startup took {:.3f}s'.format(startup))
+        self.assertLess(result['max_rss_mb'], MEMORY_BUDGET_MB,
+                        'peak memory {:.1f} MB'.format(result['max_rss_mb']))
+        # Token checks import python-jose when they first run
+        self.assertFalse(result['jose_imported'])
+
+
+
+def b64url_uint(value):
+    data = value.to_bytes((value.bit_length() + 7) // 8, 'big')
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+class ResourcesTestCase(unittest.TestCase):
+    """This class represents the people and movies API test case"""
+
+    @classmethod
+    def setUpClass(cls):
+        key = RSA.generate(2048)
+        cls.private_key = key.export_key('PEM').decode('ascii')
+        cls.jwks = {'keys': [{
+            'kty': 'RSA',
+            'kid': 'test',
+            'use': 'sig',
+            'n': b64url_uint(key.n),
+            'e': b64url_uint(key.e)
+        }]}
+
+    def setUp(self):
+        self.app = create_app({
+            'DATABASE_URL': 'sqlite://',
+            'AUTH0_DOMAIN': 'capstone.test',
+            'API_AUDIENCE': 'capstone'
+        })
+        self.client = self.app.test_client()
+
+        # Signing keys the app would otherwise fetch from Auth0
+        auth_state = self.app.extensions['auth']
+        auth_state._jwks = self.jwks
+        auth_state._fetched_at = time.monotonic()
+
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        self.statements = []
+        event.listen(db.engine, 'before_cursor_execute', self.count_statement)
+
+    def tearDown(self):
+        event.remove(db.engine, 'before_cursor_execute', self.count_statement)
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def count_statement(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def headers(self, *permissions):
+        token = jwt.encode({
+            'iss': 'https://capstone.test/',
+            'aud': 'capstone',
+            'sub': 'test',
+            'exp': int(time.time()) + 3600,
+            'permissions': list(permissions)
+        }, self.private_key, algorithm='RS256', headers={'kid': 'test'})
+        return {'Authorization': 'Bearer ' + token}
+
+    def create_people(self, count):
+        res = self.client.post('/people', headers=self.headers('post:people'),
+                               json=[{'name': 'Person {}'.format(i),
+                                      'catchphrase': 'Hi'}
+                                     for i in range(count)])
+        return [person['id'] for person in res.get_json()['people']]
+
+    def test_bulk_create_people(self):
+        res = self.client.post('/people', headers=self.headers('post:people'),
+                               json=[{'name': 'Ada'}, {'name': 'Grace'}])
+        data = res.get_json()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([person['name'] for person in data['people']],
+                         ['Ada', 'Grace'])
+
+    def test_422_bulk_create_rolls_back_invalid_batch(self):
+        res = self.client.post('/people', headers=self.headers('post:people'),
+                               json=[{'name': 'Ada'}, {'catchphrase': 'Hi'}])
+
+        self.assertEqual(res.status_code, 422)
+        self.assertEqual(db.session.query(db.func.count('*')).select_from(
+            db.Model.metadata.tables['People']).scalar(), 0)
+
+    def test_422_catchphrase_must_be_a_string(self):
+        res = self.client.post('/people', headers=self.headers('post:people'),
+                               json=[{'name': 'Ada', 'catchphrase': 42}])
+
+        self.assertEqual(res.status_code, 422)
+        self.assertEqual(db.session.query(db.func.count('*')).select_from(
+            db.Model.metadata.tables['People']).scalar(), 0)
+
+    def test_403_create_without_permission(self):
+        res = self.client.post('/people', headers=self.headers('get:people'),
+                               json={'name': 'Ada'})
+
+        self.assertEqual(res.status_code, 403)
+
+    def test_keyset_pagination(self):
+        ids = self.create_people(5)
+        headers = self.headers('get:people')
+
+        first = self.client.get('/people?limit=2', headers=headers).get_json()
+        second = self.client.get(
+            '/people?limit=2&cursor=' + first['next_cursor'],
+            headers=headers).get_json()
+        last = self.client.get(
+            '/people?limit=2&cursor=' + second['next_cursor'],
+            headers=headers).get_json()
+
+        self.assertEqual([p['id'] for p in first['people']], ids[:2])
+        self.assertEqual([p['id'] for p in second['people']], ids[2:4])
+        self.assertEqual([p['id'] for p in last['people']], ids[4:])
+        self.assertIsNone(last['next_cursor'])
+
+    def test_400_invalid_cursor(self):
+        res = self.client.get('/people?cursor=not-a-cursor',
+                              headers=self.headers('get:people'))
+
+        self.assertEqual(res.status_code, 400)
+
+    def test_sparse_fieldsets(self):
+        self.create_people(1)
+        del self.statements[:]
+
+        res = self.client.get('/people?fields=id,name',
+                              headers=self.headers('get:people'))
+
+        self.assertEqual(set(res.get_json()['people'][0]), {'id', 'name'})
+        self.assertNotIn('catchphrase', self.statements[0])
+
+    def test_400_unknown_field(self):
+        res = self.client.get('/people?fields=id,password',
+                              headers=self.headers('get:people'))
+
+        self.assertEqual(res.status_code, 400)
+
+    def test_cast_is_loaded_without_n_plus_one(self):
+        people = self.create_people(3)
+        self.client.post('/movies', headers=self.headers('post:movies'),
+                         json=[{'title': 'Movie {}'.format(i),
+                                'release_date': '2021-01-0{}'.format(i + 1),
+                                'cast': people}
+                               for i in range(5)])
+        del self.statements[:]
+
+        res = self.client.get('/movies?fields=title,cast',
+                              headers=self.headers('get:movies'))
+        movies = res.get_json()['movies']
+
+        self.assertEqual(len(movies), 5)
+        self.assertEqual([p['id'] for p in movies[0]['cast']], people)
+        # One query for the page, one for the cast of every movie on it
+        self.assertEqual(len(self.statements), 2)
+
+    def test_bulk_update_movies(self):
+        people = self.create_people(2)
+        res = self.client.post('/movies', headers=self.headers('post:movies'),
+                               json=[{'title': 'A'}, {'title': 'B'}])
+        ids = [movie['id'] for movie in res.get_json()['movies']]
+
+        res = self.client.patch(
+            '/movies?fields=id,title,cast', headers=self.headers('patch:movies'),
+            json=[{'id': ids[0], 'title': 'A2', 'cast': people},
+                  {'id': ids[1], 'release_date': '2021-06-01'}])
+        movies = res.get_json()['movies']
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(movies[0]['title'], 'A2')
+        self.assertEqual([p['id'] for p in movies[0]['cast']], people)
+        self.assertEqual(movies[1]['cast'], [])
+
+    def test_404_bulk_update_missing_row(self):
+        res = self.client.patch('/people', headers=self.headers('patch:people'),
+                                json=[{'id': 1000, 'name': 'Nobody'}])
+
+        self.assertEqual(res.status_code, 404)
+
+    def test_delete_person(self):
+        id = self.create_people(1)[0]
+        self.client.post('/movies', headers=self.headers('post:movies'),
+                         json={'title': 'A', 'cast': [id]})
+
+        res = self.client.delete('/people/{}'.format(id),
+                                 headers=self.headers('delete:people'))
+
+        self.assertEqual(res.get_json()['delete'], id)
+        self.assertEqual(self.client.get(
+            '/people/{}'.format(id),
+            headers=self.headers('get:people')).status_code, 404)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
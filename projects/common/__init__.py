@@ -0,0 +1,8 @@
+'''
+Modules shared by the projects in this repository
+
+The entry point of each app (its app module or package, its tests and
+benchmarks) adds the projects folder to sys.path before importing
+anything else, so it works without being installed. The modules of the
+apps then import it like any other package.
+'''
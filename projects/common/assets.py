@@ -0,0 +1,285 @@
+'''
+Fingerprinted static assets
+
+Assets(app) rewrites url_for('static', filename=...) to a name that
+carries a hash of the file contents, e.g. css/main.3f2a9c0d41b7.css,
+and serves those names with a one year immutable Cache-Control. A
+changed file gets a new name, so browsers never revalidate or keep a
+stale copy.
+
+Hashes are computed when the app starts, unless a build wrote them to
+static/dist/manifest.json. A build also copies the files under their
+fingerprinted names, writes the bundles listed in ASSET_BUNDLES and
+precompresses everything with common.compression:
+
+    python -m common.assets build 01_fyyur/starter_code/static \\
+        --bundles 01_fyyur/starter_code/config.py
+
+Templates link bundles with asset_urls(), which returns the bundle when
+it was built and the files it is made of otherwise:
+
+    {% for url in asset_urls('css/fyyur.css') %}
+    <link rel="stylesheet" href="{{ url }}" />
+    {% endfor %}
+
+Config:
+    ASSETS_FINGERPRINT      rewrite static URLs (default: not app.debug)
+    ASSET_BUNDLES           dict of bundle name to the files it joins
+'''
+import argparse
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import runpy
+import shutil
+
+from flask import url_for
+from werkzeug.wsgi import wrap_file
+
+from .compression import PRECOMPRESSED_SUFFIXES, choose_encoding, precompress
+
+HASH_LENGTH = 12
+IMMUTABLE = 'public, max-age=31536000, immutable'
+DIST_FOLDER = 'dist'
+MANIFEST = 'manifest.json'
+IGNORED_SUFFIXES = tuple(PRECOMPRESSED_SUFFIXES.values()) + ('.map',)
+
+
+def fingerprint(filename, data):
+    digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+    root, ext = os.path.splitext(filename)
+    return '{}.{}{}'.format(root, digest, ext)
+
+
+def static_files(static_folder):
+    '''Yields the names of the files in the static folder, '/' separated.
+    '''
+    for folder, folders, files in os.walk(static_folder):
+        folders[:] = [name for name in folders if name != DIST_FOLDER]
+        for name in files:
+            if name.startswith('.') or name.endswith(IGNORED_SUFFIXES):
+                continue
+            path = os.path.relpath(os.path.join(folder, name), static_folder)
+            yield path.replace(os.sep, '/')
+
+
+def read(static_folder, filename):
+    with open(os.path.join(static_folder, filename), 'rb') as f:
+        return f.read()
+
+
+def scan(static_folder):
+    '''Fingerprints the static files in place, without building.
+
+    Returns the manifest, the fingerprinted names of the files.
+    '''
+    return {
+        'files': {
+            filename: fingerprint(filename, read(static_folder, filename))
+            for filename in static_files(static_folder)
+        },
+        'bundles': {}
+    }
+
+
+## Build
+
+def minify_css(text):
+    '''Removes comments and collapses whitespace, keeps /*! licenses.
+    '''
+    text = re.sub(r'/\*(?!!).*?\*/', '', text, flags=re.S)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def minify_js(text):
+    # Safe JavaScript minification needs a real tokenizer
+    try:
+        import rjsmin
+    except ImportError:
+        return text
+    return rjsmin.jsmin(text)
+
+
+def bundle(static_folder, filenames, minify=True):
+    parts = [read(static_folder, filename).decode('utf-8')
+             for filename in filenames]
+    if filenames[0].endswith('.js'):
+        text = ';\n'.join(parts)
+        return (minify_js(text) if minify else text).encode('utf-8')
+    text = '\n'.join(parts)
+    return (minify_css(text) if minify else text).encode('utf-8')
+
+
+def build(static_folder, bundles=None, minify=True):
+    '''Writes the fingerprinted files, bundles and manifest to static/dist.
+
+    Returns the manifest.
+    '''
+    dist = os.path.join(static_folder, DIST_FOLDER)
+    if os.path.isdir(dist):
+        shutil.rmtree(dist)
+
+    def write(name, data):
+        path = os.path.join(dist, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+
+    manifest = {'files': {}, 'bundles': {}}
+    for filename in static_files(static_folder):
+        data = read(static_folder, filename)
+        manifest['files'][filename] = fingerprint(filename, data)
+        write(manifest['files'][filename], data)
+
+    for name, filenames in (bundles or {}).items():
+        data = bundle(static_folder, filenames, minify)
+        manifest['bundles'][name] = fingerprint(name, data)
+        write(manifest['bundles'][name], data)
+
+    precompress([dist])
+    with open(os.path.join(dist, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+## Runtime
+
+class Assets:
+    '''Serves the app's static files under fingerprinted names.
+    '''
+
+    def __init__(self, app=None):
+        self.manifest = {'files': {}, 'bundles': {}}
+        self.paths = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['assets'] = self
+        self.app = app
+        self.bundles = app.config.get('ASSET_BUNDLES', {})
+        app.jinja_env.globals['asset_urls'] = self.asset_urls
+
+        if not app.config.get('ASSETS_FINGERPRINT', not app.debug):
+            return
+
+        static_folder = app.static_folder
+        dist = os.path.join(static_folder, DIST_FOLDER)
+        try:
+            with open(os.path.join(dist, MANIFEST)) as f:
+                self.manifest = json.load(f)
+            source = dist
+        except FileNotFoundError:
+            self.manifest = scan(static_folder)
+            source = None
+
+        # Fingerprinted name to the file on disk
+        for filename, name in self.manifest['files'].items():
+            self.paths[name] = os.path.join(
+                source or static_folder, name if source else filename)
+        for name in self.manifest['bundles'].values():
+            self.paths[name] = os.path.join(dist, name)
+
+        app.url_defaults(self.fingerprint_url)
+        app.wsgi_app = AssetFiles(
+            app.wsgi_app, self.paths, app.static_url_path)
+
+    def fingerprint_url(self, endpoint, values):
+        if endpoint != 'static':
+            return
+        filename = values.get('filename')
+        name = self.manifest['bundles'].get(filename) or \
+            self.manifest['files'].get(filename)
+        if name is not None:
+            values['filename'] = name
+
+    def asset_urls(self, name):
+        '''Returns the URL of a bundle, or of each file it joins.
+        '''
+        if name in self.manifest['bundles'] or name not in self.bundles:
+            return [url_for('static', filename=name)]
+        return [url_for('static', filename=filename)
+                for filename in self.bundles[name]]
+
+
+class AssetFiles:
+    '''WSGI middleware answering fingerprinted static URLs before the app.
+    '''
+
+    def __init__(self, app, paths, static_url_path='/static'):
+        self.app = app
+        self.paths = paths
+        self.prefix = static_url_path.rstrip('/') + '/'
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if not path.startswith(self.prefix):
+            return self.app(environ, start_response)
+        name = path[len(self.prefix):]
+        filename = self.paths.get(name)
+        if filename is None or environ.get('REQUEST_METHOD') not in (
+                'GET', 'HEAD'):
+            return self.app(environ, start_response)
+
+        content_type = mimetypes.guess_type(name)[0] or \
+            'application/octet-stream'
+        if content_type.startswith('text/'):
+            content_type += '; charset=utf-8'
+        headers = [
+            ('Content-Type', content_type),
+            ('Cache-Control', IMMUTABLE),
+            ('ETag', '"{}"'.format(name)),
+            ('Vary', 'Accept-Encoding')
+        ]
+
+        if '"{}"'.format(name) in environ.get('HTTP_IF_NONE_MATCH', ''):
+            start_response('304 Not Modified', headers)
+            return []
+
+        # Built files have precompressed copies next to them
+        for encoding, suffix in PRECOMPRESSED_SUFFIXES.items():
+            if choose_encoding(environ.get('HTTP_ACCEPT_ENCODING'),
+                               (encoding,)) is None:
+                continue
+            try:
+                if os.stat(filename + suffix).st_mtime < \
+                        os.stat(filename).st_mtime:
+                    continue
+            except OSError:
+                continue
+            filename += suffix
+            headers.append(('Content-Encoding', encoding))
+            break
+
+        headers.append(('Content-Length', str(os.path.getsize(filename))))
+        start_response('200 OK', headers)
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            return []
+        return wrap_file(environ, open(filename, 'rb'))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m common.assets',
+        description='Build fingerprinted static assets.')
+    parser.add_argument('command', choices=['build'])
+    parser.add_argument('static_folder')
+    parser.add_argument(
+        '--bundles', help='Python config file defining ASSET_BUNDLES')
+    parser.add_argument(
+        '--no-minify', action='store_true', help='only join bundled files')
+    args = parser.parse_args(argv)
+
+    bundles = {}
+    if args.bundles:
+        bundles = runpy.run_path(args.bundles).get('ASSET_BUNDLES', {})
+
+    manifest = build(args.static_folder, bundles, not args.no_minify)
+    print('Built {} files and {} bundles.'.format(
+        len(manifest['files']), len(manifest['bundles'])))
+
+
+if __name__ == '__main__':
+    main()
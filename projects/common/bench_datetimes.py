@@ -0,0 +1,110 @@
+'''
+Datetime filter benchmark
+
+Renders the Fyyur shows page with each implementation of its datetime
+filter and reports the time per render:
+
+    babel           babel.dates.format_datetime on every call, as before
+    compiled        DateTimeFormatter with the memo disabled
+    memoised        DateTimeFormatter, cold (empty memo) and warm
+
+Shows start in the evening on the hour, so like the real page many rows
+share a start time. Run from the projects folder:
+
+    python -m common.bench_datetimes --chdir 01_fyyur/starter_code \\
+        app:app --rows 10000
+'''
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+
+import babel.dates
+from flask import render_template
+
+from .datetimes import DateTimeFormatter
+from .launcher import load_app
+
+TEMPLATE = 'pages/shows.html'
+
+
+def shows(count, rng, days=365):
+    start = datetime.datetime(2030, 1, 1)
+    return [{
+        'id': i,
+        'venue_id': rng.randint(1, 100),
+        'venue_name': 'Venue {}'.format(i % 100),
+        'artist_id': rng.randint(1, 100),
+        'artist_name': 'Artist {}'.format(i % 100),
+        'artist_image_link': 'https://images.example.com/{}.jpg'.format(i),
+        'start_time': start + datetime.timedelta(
+            days=rng.randrange(days), hours=rng.randint(18, 22))
+    } for i in range(count)]
+
+
+def filters(formats):
+    def babel_filter(value, format='medium'):
+        return babel.dates.format_datetime(value, formats.get(format, format))
+
+    memoised = DateTimeFormatter(formats)
+
+    def cold(value, format='medium'):
+        return memoised(value, format)
+
+    return {
+        'babel': (babel_filter, None),
+        'compiled': (DateTimeFormatter(formats, cache_size=0), None),
+        'memoised cold': (cold, memoised.cache_clear),
+        'memoised warm': (memoised, None)
+    }
+
+
+def measure(app, items, repeat, before=None):
+    timings = []
+    with app.test_request_context('/shows'):
+        for _ in range(repeat):
+            if before is not None:
+                before()
+            started = time.perf_counter()
+            render_template(TEMPLATE, shows=items)
+            timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m common.bench_datetimes',
+        description='Compare datetime filters on the Fyyur shows page.')
+    parser.add_argument('app', help="the Fyyur app, 'module:name'")
+    parser.add_argument(
+        '--chdir', help='folder of the app, imported from there')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    if args.chdir:
+        os.chdir(args.chdir)
+    sys.path.insert(0, os.getcwd())
+    app = load_app(args.app)
+    formats = getattr(app.jinja_env.filters['datetime'], 'formats', {})
+
+    print('{:>7} {:<14} {:>10} {:>8}'.format('rows', 'filter', 'ms', 'speedup'))
+    for count in args.rows:
+        items = shows(count, random.Random(args.seed))
+        baseline = None
+        for label, (datetime_filter, before) in filters(formats).items():
+            app.jinja_env.filters['datetime'] = datetime_filter
+            # Compiled templates may hold on to the filters they use
+            if app.jinja_env.cache is not None:
+                app.jinja_env.cache.clear()
+            render_time = measure(app, items, args.repeat, before)
+            baseline = baseline or render_time
+            print('{:>7} {:<14} {:>10.1f} {:>7.1f}x'.format(
+                count, label, render_time * 1000, baseline / render_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+'''
+JSON response encoding benchmark
+
+Encodes payloads shaped like the largest list endpoints with each
+encoder and reports the time per response, body included:
+
+    drinks      /drinks-detail, drinks with their full recipes
+    questions   /questions/search, question rows
+    shows       Fyyur shows with datetimes (str() for flask.jsonify)
+
+Run from the projects folder:
+
+    python -m common.bench_json --items 100 1000 10000
+'''
+import argparse
+import datetime
+import random
+import time
+
+from flask import Flask, jsonify as flask_jsonify
+
+from . import fastjson
+
+COLORS = ('white', 'brown', 'grey', 'blue', 'green')
+
+
+def drinks(count, rng):
+    return [{
+        'id': i,
+        'title': 'Drink {}'.format(i),
+        'recipe': [{
+            'name': 'Ingredient {}'.format(j),
+            'color': rng.choice(COLORS),
+            'parts': rng.randint(1, 4)
+        } for j in range(rng.randint(1, 4))]
+    } for i in range(count)]
+
+
+def questions(count, rng):
+    return [{
+        'id': i,
+        'question': 'What is question number {} about?'.format(i) * 2,
+        'answer': 'Answer {}'.format(i),
+        'category': rng.randint(1, 6),
+        'difficulty': rng.randint(1, 5)
+    } for i in range(count)]
+
+
+def shows(count, rng):
+    start = datetime.datetime(2030, 1, 1, 20)
+    return [{
+        'id': i,
+        'venue_id': rng.randint(1, 100),
+        'venue_name': 'Venue {}'.format(i % 100),
+        'artist_id': rng.randint(1, 100),
+        'artist_name': 'Artist {}'.format(i % 100),
+        'artist_image_link': 'https://images.example.com/{}.jpg'.format(i),
+        'start_time': start + datetime.timedelta(hours=i)
+    } for i in range(count)]
+
+
+PAYLOADS = {
+    'drinks': drinks,
+    'questions': questions,
+    'shows': shows
+}
+
+
+def stringify_datetimes(items):
+    # flask.jsonify before Flask 2.2 sends datetimes as HTTP dates, the
+    # apps sent str() instead
+    return [{key: str(value) if isinstance(value, datetime.datetime)
+             else value for key, value in item.items()} for item in items]
+
+
+def encoders(app):
+    def flask_default(items):
+        return flask_jsonify({'success': True, 'items': stringify_datetimes(items)})
+
+    def stdlib(items):
+        orjson = fastjson.orjson
+        fastjson.orjson = None
+        try:
+            return fastjson.jsonify({'success': True, 'items': items})
+        finally:
+            fastjson.orjson = orjson
+
+    def fast(items):
+        return fastjson.jsonify({'success': True, 'items': items})
+
+    def streamed(items):
+        return fastjson.stream({'success': True}, 'items', items)
+
+    result = {'flask.jsonify': flask_default, 'fastjson stdlib': stdlib}
+    if fastjson.orjson is not None:
+        result['fastjson orjson'] = fast
+        result['fastjson stream'] = streamed
+    return result
+
+
+def measure(app, encode, items, repeat):
+    timings = []
+    with app.test_request_context():
+        for _ in range(repeat):
+            started = time.perf_counter()
+            response = encode(items)
+            size = len(b''.join(response.response))
+            timings.append(time.perf_counter() - started)
+    return min(timings), size
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m common.bench_json',
+        description='Compare JSON response encoders.')
+    parser.add_argument(
+        '--items', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument(
+        '--payloads', nargs='+', choices=sorted(PAYLOADS),
+        default=sorted(PAYLOADS))
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument(
+        '--debug', action='store_true',
+        help='debug app, flask.jsonify pretty-prints')
+    args = parser.parse_args(argv)
+
+    app = Flask(__name__)
+    app.debug = args.debug
+
+    print('{:<10} {:>7} {:<16} {:>10} {:>10} {:>8}'.format(
+        'payload', 'items', 'encoder', 'ms', 'KB', 'speedup'))
+    for name in args.payloads:
+        for count in args.items:
+            items = PAYLOADS[name](count, random.Random(args.seed))
+            baseline = None
+            for label, encode in encoders(app).items():
+                seconds, size = measure(app, encode, items, args.repeat)
+                baseline = baseline or seconds
+                print('{:<10} {:>7} {:<16} {:>10.3f} {:>10.1f} {:>7.1f}x'.format(
+                    name, count, label, seconds * 1000, size / 1024,
+                    baseline / seconds))
+
+
+if __name__ == '__main__':
+    main()
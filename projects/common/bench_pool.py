@@ -0,0 +1,120 @@
+'''
+Connection pool saturation benchmark
+
+Runs an increasing number of concurrent workers against one pool built
+from the shared database settings. Each request checks out a
+connection, runs a query and holds the connection for --hold-ms to
+stand in for request work. Run from the projects folder:
+
+    DB_POOL_SIZE=5 DB_MAX_OVERFLOW=5 python -m common.bench_pool \\
+        --database-url postgresql://postgres@localhost/trivia \\
+        --workers 4 8 16 32 64
+'''
+import argparse
+import math
+import os
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError
+
+from .database import InstrumentedQueuePool, engine_options, pool_metrics
+
+
+def build_engine(database_url):
+    options = engine_options(database_url)
+    if not options:
+        # SQLite gets no pool options by default, benchmark the same
+        # pool the Postgres apps use
+        options = engine_options('postgresql://')
+        options.pop('pool_pre_ping')
+        options['connect_args'] = {'check_same_thread': False}
+    return create_engine(database_url, **options)
+
+
+def run_workers(engine, workers, requests, hold):
+    latencies = []
+    timeouts = []
+    lock = threading.Lock()
+
+    def worker():
+        own_latencies = []
+        own_timeouts = 0
+        for _ in range(requests):
+            started = time.perf_counter()
+            try:
+                with engine.connect() as conn:
+                    conn.execute(text('SELECT 1'))
+                    time.sleep(hold)
+            except TimeoutError:
+                own_timeouts += 1
+                continue
+            own_latencies.append(time.perf_counter() - started)
+
+        with lock:
+            latencies.extend(own_latencies)
+            timeouts.append(own_timeouts)
+
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p99 = latencies[max(0, math.ceil(0.99 * len(latencies)) - 1)] \
+        if latencies else 0.0
+    return {
+        'workers': workers,
+        'completed': len(latencies),
+        'timeouts': sum(timeouts),
+        'rps': len(latencies) / elapsed if elapsed else 0.0,
+        'p99_ms': p99 * 1000
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m common.bench_pool',
+        description='Measure pool behaviour under concurrent workers.')
+    parser.add_argument(
+        '--database-url',
+        help='database to connect to (default: a temporary SQLite file)')
+    parser.add_argument(
+        '--workers', type=int, nargs='+', default=[2, 5, 10, 20, 40])
+    parser.add_argument(
+        '--requests', type=int, default=50, help='requests per worker')
+    parser.add_argument(
+        '--hold-ms', type=float, default=5.0,
+        help='time each request keeps its connection')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or \
+            'sqlite:///' + os.path.join(tmp, 'bench.db')
+
+        print('{:>8} {:>10} {:>9} {:>10} {:>10} {:>12} {:>12}'.format(
+            'workers', 'completed', 'timeouts', 'req/s', 'p99 ms',
+            'wait avg ms', 'wait max ms'))
+
+        for workers in args.workers:
+            # A fresh engine per step so the wait metrics are per step
+            engine = build_engine(database_url)
+            result = run_workers(
+                engine, workers, args.requests, args.hold_ms / 1000)
+            metrics = pool_metrics(engine)
+            engine.dispose()
+
+            print('{:>8} {:>10} {:>9} {:>10.1f} {:>10.2f} {:>12.3f} '
+                  '{:>12.3f}'.format(
+                      result['workers'], result['completed'],
+                      result['timeouts'], result['rps'], result['p99_ms'],
+                      metrics['wait_ms_avg'], metrics['wait_ms_max']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,394 @@
+'''
+Response compression for the WSGI apps
+
+Compress(app) negotiates brotli (when the brotli package is installed)
+or gzip from Accept-Encoding and compresses text, JSON and JavaScript
+responses:
+
+    - bodies smaller than min_size, other statuses than 200 and
+      responses that already have a Content-Encoding or Cache-Control:
+      no-transform are sent as they are
+    - HEAD requests are answered as a GET without the body, so their
+      Content-Encoding and Content-Length are those of the GET
+    - streamed responses without a Content-Length are compressed as they
+      stream
+    - responses with an ETag get a per-encoding ETag ("<etag>-gzip") and
+      their compressed bodies are kept in a small LRU cache, so
+      unchanged responses are compressed once
+
+With static_folder set, requests under static_url_path are answered
+from precompressed copies (file.css.br, file.css.gz) when the client
+accepts them, the app serves the file otherwise. Build the copies with:
+
+    python -m common.compression 01_fyyur/starter_code/static/css \\
+        01_fyyur/starter_code/static/js
+'''
+import argparse
+import gzip
+import mimetypes
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+from werkzeug.http import http_date, parse_accept_header, quote_etag
+from werkzeug.wsgi import ClosingIterator, wrap_file
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DEFAULT_MIN_SIZE = 500
+DEFAULT_CACHE_SIZE = 256
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml'
+)
+PRECOMPRESSED_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+def available_encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def choose_encoding(accept_encoding, encodings):
+    '''Returns the encoding the client prefers among encodings, or None.
+    '''
+    if not accept_encoding:
+        return None
+    accepted = parse_accept_header(accept_encoding)
+    best = None
+    best_quality = 0
+    for encoding in encodings:
+        quality = accepted[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data, encoding, level=6):
+    if encoding == 'br':
+        return brotli.compress(data, quality=min(level, 11))
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def compressed_stream(chunks, encoding, level=6):
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=min(level, 11))
+        finish = compressor.finish
+        compress_chunk = compressor.process
+    else:
+        # wbits 31 writes a gzip header and trailer
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        finish = compressor.flush
+        compress_chunk = compressor.compress
+
+    for chunk in chunks:
+        data = compress_chunk(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+def variant_etag(etag, encoding):
+    '''Returns the ETag of the encoded variant of a response.
+    '''
+    if etag.endswith('"'):
+        return '{}-{}"'.format(etag[:-1], encoding)
+    return '{}-{}'.format(etag, encoding)
+
+
+def strip_variant_etags(header, encodings):
+    '''Removes the encoding suffixes of the ETags in If-None-Match.
+    '''
+    for encoding in encodings:
+        header = header.replace('-{}"'.format(encoding), '"')
+    return header
+
+
+class LRUCache:
+    def __init__(self, size):
+        self.size = size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+
+class Compress:
+    '''WSGI middleware compressing responses, see the module docstring.
+
+    Args:
+        app: the WSGI app to wrap, e.g. flask_app.wsgi_app.
+        min_size: bodies with fewer bytes are sent uncompressed.
+        level: compression level, 1-9 for gzip and 1-11 for brotli.
+        cache_size: compressed bodies of responses with an ETag kept.
+        static_folder: folder with precompressed static files.
+        static_url_path: URL prefix the static files are served under.
+    '''
+
+    def __init__(self, app, min_size=DEFAULT_MIN_SIZE, level=6,
+                 cache_size=DEFAULT_CACHE_SIZE, static_folder=None,
+                 static_url_path='/static'):
+        self.app = app
+        self.min_size = min_size
+        self.level = level
+        self.cache = LRUCache(cache_size)
+        self.encodings = available_encodings()
+        self.static_folder = static_folder and os.path.abspath(static_folder)
+        self.static_url_path = static_url_path.rstrip('/') + '/'
+
+    def __call__(self, environ, start_response):
+        if environ.get('REQUEST_METHOD') != 'HEAD':
+            return self.respond(environ, start_response)
+
+        # The headers of the GET, negotiated and compressed the same way
+        def head_start_response(status, headers, exc_info=None):
+            start_response(status, headers, exc_info)
+            return lambda data: None
+
+        body = self.respond(dict(environ, REQUEST_METHOD='GET'),
+                            head_start_response)
+        if hasattr(body, 'close'):
+            body.close()
+        return []
+
+    def respond(self, environ, start_response):
+        encoding = choose_encoding(
+            environ.get('HTTP_ACCEPT_ENCODING'), self.encodings)
+
+        if encoding is not None and self.static_folder is not None:
+            path = environ.get('PATH_INFO', '')
+            if path.startswith(self.static_url_path):
+                response = self.serve_precompressed(
+                    environ, start_response, path, encoding)
+                if response is not None:
+                    return response
+
+        # Let the app compare the ETags of the variants it never sent
+        variant_requested = False
+        if encoding is not None and 'HTTP_IF_NONE_MATCH' in environ:
+            if_none_match = environ['HTTP_IF_NONE_MATCH']
+            environ['HTTP_IF_NONE_MATCH'] = strip_variant_etags(
+                if_none_match, self.encodings)
+            variant_requested = environ['HTTP_IF_NONE_MATCH'] != if_none_match
+
+        captured = {}
+
+        def capture_start_response(status, headers, exc_info=None):
+            captured['status'] = status
+            captured['headers'] = headers
+            captured['exc_info'] = exc_info
+            return lambda data: captured.setdefault('writes', []).append(data)
+
+        body = self.app(environ, capture_start_response)
+        status = captured['status']
+        headers = captured['headers']
+        exc_info = captured['exc_info']
+
+        etag = header_value(headers, 'ETag')
+        if status.startswith('304') and variant_requested and etag:
+            headers = replace_header(
+                headers, 'ETag', variant_etag(etag, encoding))
+            headers = replace_header(headers, 'Vary', vary(headers))
+            start_response(status, headers, exc_info)
+            return body
+
+        writes = captured.get('writes')
+        if writes or not self.is_compressible(status, headers):
+            write = start_response(status, headers, exc_info)
+            for data in writes or ():
+                write(data)
+            return body
+
+        headers = replace_header(headers, 'Vary', vary(headers))
+
+        if encoding is None:
+            start_response(status, headers, exc_info)
+            return body
+
+        length = header_value(headers, 'Content-Length')
+        if length is None:
+            # Streamed, compress it as it goes
+            headers = replace_header(headers, 'Content-Encoding', encoding)
+            if etag is not None:
+                headers = replace_header(
+                    headers, 'ETag', variant_etag(etag, encoding))
+            start_response(status, headers, exc_info)
+            return ClosingIterator(
+                compressed_stream(body, encoding, self.level),
+                getattr(body, 'close', None))
+
+        if int(length) < self.min_size:
+            start_response(status, headers, exc_info)
+            return body
+
+        data = None
+        if etag is not None:
+            key = (environ.get('PATH_INFO'), environ.get('QUERY_STRING'),
+                   etag, encoding)
+            data = self.cache.get(key)
+        if data is None:
+            try:
+                data = compress(b''.join(body), encoding, self.level)
+            finally:
+                if hasattr(body, 'close'):
+                    body.close()
+            if etag is not None:
+                self.cache.set(key, data)
+        elif hasattr(body, 'close'):
+            body.close()
+
+        headers = replace_header(headers, 'Content-Encoding', encoding)
+        headers = replace_header(headers, 'Content-Length', str(len(data)))
+        if etag is not None:
+            headers = replace_header(
+                headers, 'ETag', variant_etag(etag, encoding))
+        start_response(status, headers, exc_info)
+        return [data]
+
+    def is_compressible(self, status, headers):
+        if not status.startswith('200'):
+            return False
+        content_type = header_value(headers, 'Content-Type') or ''
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return False
+        if header_value(headers, 'Content-Encoding') is not None:
+            return False
+        cache_control = header_value(headers, 'Cache-Control') or ''
+        return 'no-transform' not in cache_control
+
+    def serve_precompressed(self, environ, start_response, path, encoding):
+        '''Serves the precompressed copy of a static file, if there is one.
+        '''
+        relative = path[len(self.static_url_path):]
+        filename = os.path.abspath(os.path.join(self.static_folder, relative))
+        if not filename.startswith(self.static_folder + os.sep):
+            return None
+
+        for candidate in (encoding,) + tuple(
+                e for e in self.encodings if e != encoding):
+            if choose_encoding(environ.get('HTTP_ACCEPT_ENCODING'),
+                               (candidate,)) is None:
+                continue
+            compressed = filename + PRECOMPRESSED_SUFFIXES[candidate]
+            try:
+                stat = os.stat(compressed)
+                # Ignore copies older than the file they were built from
+                if stat.st_mtime < os.stat(filename).st_mtime:
+                    continue
+            except OSError:
+                continue
+            return self.send_file(
+                environ, start_response, filename, compressed, stat,
+                candidate)
+        return None
+
+    def send_file(self, environ, start_response, filename, compressed,
+                  stat, encoding):
+        etag = quote_etag('{}-{}-{}'.format(
+            int(stat.st_mtime), stat.st_size, encoding))
+        content_type = mimetypes.guess_type(filename)[0] or \
+            'application/octet-stream'
+        if content_type.startswith('text/'):
+            content_type += '; charset=utf-8'
+
+        headers = [
+            ('Content-Type', content_type),
+            ('Content-Encoding', encoding),
+            ('Vary', 'Accept-Encoding'),
+            ('ETag', etag),
+            ('Last-Modified', http_date(stat.st_mtime)),
+            ('Cache-Control', 'public, max-age=43200')
+        ]
+
+        if etag in environ.get('HTTP_IF_NONE_MATCH', ''):
+            start_response('304 Not Modified', headers)
+            return []
+
+        headers.append(('Content-Length', str(stat.st_size)))
+        start_response('200 OK', headers)
+        return wrap_file(environ, open(compressed, 'rb'))
+
+
+def header_value(headers, name):
+    name = name.lower()
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def replace_header(headers, name, value):
+    lower = name.lower()
+    return [(key, v) for key, v in headers if key.lower() != lower] + \
+        [(name, value)]
+
+
+def vary(headers):
+    values = [value.strip() for value in
+              (header_value(headers, 'Vary') or '').split(',')
+              if value.strip()]
+    if 'accept-encoding' not in (value.lower() for value in values):
+        values.append('Accept-Encoding')
+    return ', '.join(values)
+
+
+def precompress(paths, level=9, min_size=DEFAULT_MIN_SIZE):
+    '''Writes .gz, and .br when brotli is installed, next to each file.
+
+    Returns the number of files written.
+    '''
+    written = 0
+    for path in paths:
+        for folder, _, files in os.walk(path):
+            for name in files:
+                if name.endswith(tuple(PRECOMPRESSED_SUFFIXES.values())):
+                    continue
+                filename = os.path.join(folder, name)
+                content_type = mimetypes.guess_type(filename)[0] or ''
+                if not content_type.startswith(COMPRESSIBLE_TYPES):
+                    continue
+                with open(filename, 'rb') as f:
+                    data = f.read()
+                if len(data) < min_size:
+                    continue
+                for encoding in available_encodings():
+                    with open(filename + PRECOMPRESSED_SUFFIXES[encoding],
+                              'wb') as f:
+                        f.write(compress(
+                            data, encoding, 11 if encoding == 'br' else level))
+                    written += 1
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m common.compression',
+        description='Write precompressed copies of static files.')
+    parser.add_argument('paths', nargs='+', help='folders to compress')
+    parser.add_argument('--level', type=int, default=9)
+    args = parser.parse_args(argv)
+
+    written = precompress(args.paths, args.level)
+    print('Wrote {} precompressed files.'.format(written))
+
+
+if __name__ == '__main__':
+    main()
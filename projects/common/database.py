@@ -0,0 +1,200 @@
+import os
+import threading
+import time
+
+from flask import jsonify
+from sqlalchemy import event
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.exc import DisconnectionError, TimeoutError
+from sqlalchemy.pool import Pool, QueuePool
+
+'''
+Database settings shared by the Postgres-backed apps
+
+Pool settings are read from the environment so every deploy can size
+its pools without code changes:
+
+    DB_POOL_SIZE        connections kept open per process (default 5)
+    DB_MAX_OVERFLOW     extra connections allowed under load (default 10)
+    DB_POOL_TIMEOUT     seconds to wait for a free connection (default 30)
+    DB_POOL_RECYCLE     seconds before a connection is replaced (default 1800)
+    DB_POOL_PRE_PING    test connections on checkout (default true)
+'''
+
+DEFAULT_POOL_SIZE = 5
+DEFAULT_MAX_OVERFLOW = 10
+DEFAULT_POOL_TIMEOUT = 30
+DEFAULT_POOL_RECYCLE = 1800
+
+
+def env_flag(name, default):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+'''
+PoolMetrics
+    running totals of checkouts from one pool
+'''
+
+
+class PoolMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def snapshot(self):
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            return {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'wait_ms_total': round(self.total_wait * 1000, 3),
+                'wait_ms_avg': round(
+                    self.total_wait / attempts * 1000, 3) if attempts else 0.0,
+                'wait_ms_max': round(self.max_wait * 1000, 3)
+            }
+
+
+'''
+InstrumentedQueuePool
+    a QueuePool that records how long each checkout waited for a free
+    connection, including opening a new one when the pool may grow
+'''
+
+
+class InstrumentedQueuePool(QueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except TimeoutError:
+            self.metrics.record(time.perf_counter() - started, True)
+            raise
+        self.metrics.record(time.perf_counter() - started)
+        return record
+
+
+def engine_options(database_path):
+    '''Builds create_engine() pool options from the environment.
+
+    Args:
+        database_path: the database URL the options are meant for.
+
+    Returns:
+        A dictionary for SQLALCHEMY_ENGINE_OPTIONS. SQLite URLs get no
+        pool options, Flask-SQLAlchemy picks a suitable pool for them.
+    '''
+    if make_url(database_path).drivername.startswith('sqlite'):
+        return {}
+
+    return {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': int(os.getenv('DB_POOL_SIZE', DEFAULT_POOL_SIZE)),
+        'max_overflow': int(
+            os.getenv('DB_MAX_OVERFLOW', DEFAULT_MAX_OVERFLOW)),
+        'pool_timeout': int(
+            os.getenv('DB_POOL_TIMEOUT', DEFAULT_POOL_TIMEOUT)),
+        'pool_recycle': int(
+            os.getenv('DB_POOL_RECYCLE', DEFAULT_POOL_RECYCLE)),
+        'pool_pre_ping': env_flag('DB_POOL_PRE_PING', True)
+    }
+
+
+def configure_database(app, database_path=None):
+    '''Applies the shared database settings to a Flask app config.
+
+    Pool options already present in SQLALCHEMY_ENGINE_OPTIONS take
+    precedence over the ones read from the environment.
+
+    Args:
+        app: the Flask application, before SQLAlchemy.init_app().
+        database_path: the database URL, defaults to the one already in
+          the app config.
+    '''
+    if database_path is not None:
+        app.config['SQLALCHEMY_DATABASE_URI'] = database_path
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    options = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+def pool_metrics(engine):
+    '''Returns the size and checkout wait metrics of an engine's pool.
+    '''
+    pool = engine.pool
+    metrics = {
+        'pid': os.getpid(),
+        'pool': type(pool).__name__,
+        'status': pool.status()
+    }
+
+    if isinstance(pool, QueuePool):
+        metrics.update({
+            'size': pool.size(),
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow()
+        })
+
+    if isinstance(pool, InstrumentedQueuePool):
+        metrics.update(pool.metrics.snapshot())
+
+    return metrics
+
+
+def register_pool_metrics(app, db, rule='/metrics/db-pool'):
+    '''Serves pool_metrics() for the app's engine as JSON.
+
+    The endpoint is only added when DB_POOL_METRICS is true, pool
+    metrics describe the current worker process only.
+    '''
+    if not env_flag('DB_POOL_METRICS', False):
+        return
+
+    def db_pool_metrics():
+        return jsonify(pool_metrics(db.get_engine(app)))
+
+    app.add_url_rule(rule, 'db_pool_metrics', db_pool_metrics)
+
+
+'''
+Connections inherited from a parent process share its sockets, a worker
+forked after the pool was used discards them on checkout and opens its own
+'''
+
+
+@event.listens_for(Pool, 'connect')
+def record_connection_pid(dbapi_connection, connection_record):
+    connection_record.info['pid'] = os.getpid()
+
+
+@event.listens_for(Pool, 'checkout')
+def check_connection_pid(dbapi_connection, connection_record,
+                         connection_proxy):
+    pid = os.getpid()
+    if connection_record.info['pid'] != pid:
+        connection_record.connection = connection_proxy.connection = None
+        raise DisconnectionError(
+            'Connection record belongs to pid {}, attempting to check out '
+            'in pid {}'.format(connection_record.info['pid'], pid))
@@ -0,0 +1,74 @@
+'''
+Memoised Babel datetime formatting for templates
+
+babel.dates.format_datetime parses the locale and looks up the pattern
+on every call, which adds up when a page formats thousands of dates.
+DateTimeFormatter resolves the locale once, keeps the compiled pattern
+of each named format and remembers recently formatted values, so pages
+listing many shows at the same few times format each of them once:
+
+    formatter = DateTimeFormatter({
+        'full': "EEEE MMMM, d, y 'at' h:mma",
+        'medium': 'EE MM, dd, y h:mma'
+    })
+    app.jinja_env.filters['datetime'] = formatter
+
+Values may be datetimes or strings, strings are parsed with dateutil.
+Benchmark it with python -m common.bench_datetimes.
+'''
+import datetime
+from functools import lru_cache
+
+import babel.dates
+import dateutil.parser
+from babel.core import Locale
+
+DEFAULT_CACHE_SIZE = 4096
+BABEL_FORMATS = ('full', 'long', 'medium', 'short')
+
+
+class DateTimeFormatter:
+    '''Formats datetimes with named or custom Babel patterns.
+
+    Args:
+        formats: dict of format name to a Babel pattern.
+        locale: locale identifier or Locale, defaults to LC_TIME.
+        cache_size: formatted values remembered, 0 disables the memo.
+    '''
+
+    def __init__(self, formats=None, locale=babel.dates.LC_TIME,
+                 cache_size=DEFAULT_CACHE_SIZE):
+        self.formats = dict(formats or {})
+        self.locale = Locale.parse(locale)
+        self._patterns = {}
+        if cache_size:
+            self.format = lru_cache(maxsize=cache_size)(self.format)
+
+    def __call__(self, value, format='medium'):
+        return self.format(value, format)
+
+    def pattern(self, format):
+        '''Returns the compiled pattern of a format name or pattern.
+        '''
+        pattern = self._patterns.get(format)
+        if pattern is None:
+            pattern = babel.dates.parse_pattern(self.formats.get(format, format))
+            self._patterns[format] = pattern
+        return pattern
+
+    def format(self, value, format='medium'):
+        if not isinstance(value, datetime.datetime):
+            value = dateutil.parser.parse(value)
+        if value.tzinfo is None:
+            # As babel.dates.format_datetime does
+            value = value.replace(tzinfo=babel.dates.UTC)
+
+        if format in BABEL_FORMATS and format not in self.formats:
+            # Locale dependent date and time formats joined by Babel
+            return babel.dates.format_datetime(
+                value, format, locale=self.locale)
+        return self.pattern(format).apply(value, self.locale)
+
+    def cache_clear(self):
+        if hasattr(self.format, 'cache_clear'):
+            self.format.cache_clear()
@@ -0,0 +1,160 @@
+'''
+Fast JSON responses for the Flask apps
+
+Encodes with orjson when it is installed and with the standard library
+otherwise, the output is the same compact JSON either way:
+
+    dates, times, datetimes     ISO 8601 strings
+    Decimal                     numbers
+    keys                        unsorted, non-string keys converted
+
+Use jsonify() from this module in place of flask.jsonify. Lists too big
+to encode in one go can be sent with stream(), which encodes and sends
+the items a chunk at a time, list_response() picks one by list length.
+
+FastJSON().init_app(app) also plugs the encoder into Flask's own JSON
+provider on Flask 2.2 and later, so flask.jsonify and Quart use it too.
+'''
+import datetime
+import decimal
+import json
+
+from flask import current_app
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+MIMETYPE = 'application/json'
+STREAM_CHUNK_SIZE = 500
+# Lists longer than this are streamed by list_response()
+STREAM_MIN_ITEMS = 1000
+
+
+def _default(obj):
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    raise TypeError(
+        'Object of type {} is not JSON serializable'.format(
+            type(obj).__name__))
+
+
+# Bodies are sent compact, whatever JSONIFY_PRETTYPRINT_REGULAR says
+_encoder = json.JSONEncoder(
+    ensure_ascii=False, separators=(',', ':'), default=_default)
+
+
+def dumps(obj):
+    '''Returns obj encoded as UTF-8 JSON bytes.
+    '''
+    if orjson is not None:
+        return orjson.dumps(
+            obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return _encoder.encode(obj).encode('utf-8')
+
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def jsonify(*args, **kwargs):
+    '''Same arguments as flask.jsonify, returns the response of dumps().
+    '''
+    if args and kwargs:
+        raise TypeError('jsonify() behavior undefined when passed both '
+                        'args and kwargs')
+    if len(args) == 1:
+        data = args[0]
+    else:
+        data = args or kwargs
+
+    return current_app.response_class(dumps(data), mimetype=MIMETYPE)
+
+
+def stream_chunks(payload, key, items, chunk_size=STREAM_CHUNK_SIZE):
+    '''Yields payload as JSON with the items under key, encoded in chunks.
+    '''
+    head = dumps(payload)
+    if payload:
+        yield head[:-1] + b',' + dumps(key) + b':['
+    else:
+        yield b'{' + dumps(key) + b':['
+
+    for start in range(0, len(items), chunk_size):
+        chunk = dumps(items[start:start + chunk_size])[1:-1]
+        yield chunk if start == 0 else b',' + chunk
+
+    yield b']}'
+
+
+def stream(payload, key, items, chunk_size=STREAM_CHUNK_SIZE):
+    '''Returns a streamed response of payload with the list items under key.
+
+    The body is encoded a chunk of items at a time while it is sent, so
+    the first bytes leave before the whole list is encoded and the
+    encoded list is never held in memory at once.
+    '''
+    return current_app.response_class(
+        stream_chunks(payload, key, items, chunk_size), mimetype=MIMETYPE)
+
+
+def list_response(payload, key, items, stream_min_items=STREAM_MIN_ITEMS):
+    '''Returns payload with the list items under key, streamed if it is long.
+    '''
+    if len(items) >= stream_min_items:
+        return stream(payload, key, items)
+    return jsonify(dict(payload, **{key: items}))
+
+
+class JSONEncoder(json.JSONEncoder):
+    def default(self, obj):
+        try:
+            return _default(obj)
+        except TypeError:
+            return super().default(obj)
+
+
+class FastJSON:
+    '''Makes Flask's own JSON helpers use dumps() where Flask allows it.
+    '''
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['fastjson'] = self
+        provider_class = _provider_class()
+        if provider_class is not None:
+            app.json = provider_class(app)
+        else:
+            # Flask before 2.2 only lets the stdlib encoder be replaced,
+            # keep its dates consistent with dumps()
+            app.json_encoder = JSONEncoder
+
+
+def _provider_class():
+    try:
+        from flask.json.provider import DefaultJSONProvider
+    except ImportError:
+        return None
+
+    class FastJSONProvider(DefaultJSONProvider):
+        sort_keys = False
+
+        def dumps(self, obj, **kwargs):
+            return dumps(obj).decode('utf-8')
+
+        def loads(self, s, **kwargs):
+            return loads(s)
+
+        def response(self, *args, **kwargs):
+            obj = self._prepare_response_obj(args, kwargs)
+            return self._app.response_class(dumps(obj), mimetype=MIMETYPE)
+
+    return FastJSONProvider
@@ -0,0 +1,227 @@
+'''
+Production launcher for the Flask apps in this repository
+
+Serves an app, or an app factory, with a pre-fork pool of gunicorn
+workers. Run it from the projects folder:
+
+    python -m common.launcher --chdir 01_fyyur/starter_code app:app
+    python -m common.launcher --chdir capstone/starter app:create_app
+
+The app is imported once in the master process and the workers are
+forked from it. Database engines are disposed before forking so that no
+worker inherits a pooled connection, and every worker opens its own.
+
+Without SECRET_KEY in the environment the launcher sets a random one
+before the app is imported, so every worker signs sessions with the same
+key, also with --no-preload, and a USR2 restart keeps it.
+
+Signals handled by the master:
+
+    HUP     start new workers with the current config, then stop the old
+            ones gracefully
+    TERM    graceful shutdown, workers finish their current requests
+    USR2    start a new master from the code on disk (deploys), then
+            send TERM to the old master
+
+Each app also answers GET /healthz, add ?db=1 to check the database.
+'''
+import argparse
+import inspect
+import json
+import multiprocessing
+import os
+import secrets
+import sys
+from importlib import import_module
+from urllib.parse import parse_qs
+
+from gunicorn.app.base import BaseApplication
+
+
+def default_workers():
+    return int(os.getenv(
+        'WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+
+
+def load_app(spec):
+    '''Imports 'module:name' and returns the WSGI app it refers to.
+
+    The name may be an app or a factory. Factories are called without
+    arguments, 'module:create_app()' is accepted as well.
+    '''
+    module_name, _, name = spec.partition(':')
+    name = name or 'app'
+    call = name.endswith('()')
+    if call:
+        name = name[:-2]
+
+    app = getattr(import_module(module_name), name)
+    if call or inspect.isfunction(app):
+        app = app()
+    return app
+
+
+def sqlalchemy_engines(app):
+    '''Returns the engines Flask-SQLAlchemy created for the app so far.
+    '''
+    extensions = getattr(app, 'extensions', {})
+    state = extensions.get('sqlalchemy')
+    if state is None:
+        return []
+
+    # Flask-SQLAlchemy 3 registers the extension itself
+    db = getattr(state, 'db', state)
+    engines = getattr(db, 'engines', None)
+    if engines is not None:
+        with app.app_context():
+            return list(engines.values())
+
+    # Flask-SQLAlchemy 2 keeps one connector per bind
+    return [connector._engine for connector in state.connectors.values()
+            if connector._engine is not None]
+
+
+def database_engines(app):
+    '''Returns the engines of every database of the app, creating the
+    ones Flask-SQLAlchemy has not created yet.
+    '''
+    state = getattr(app, 'extensions', {}).get('sqlalchemy')
+    if state is None:
+        return []
+
+    db = getattr(state, 'db', state)
+    with app.app_context():
+        engines = getattr(db, 'engines', None)
+        if engines is not None:
+            return list(engines.values())
+        binds = [None] + list(app.config.get('SQLALCHEMY_BINDS') or ())
+        return [db.get_engine(app, bind) for bind in binds]
+
+
+def dispose_engines(app):
+    for engine in sqlalchemy_engines(app):
+        engine.dispose()
+
+
+class HealthCheck:
+    '''WSGI middleware that answers health checks before the app does.
+    '''
+
+    def __init__(self, app, path='/healthz'):
+        self.app = app
+        self.path = path
+
+    def check_database(self):
+        '''Runs SELECT 1 on every database, False when there is none.
+        '''
+        from sqlalchemy import text
+
+        engines = database_engines(self.app)
+        for engine in engines:
+            with engine.connect() as conn:
+                conn.execute(text('SELECT 1'))
+        return bool(engines)
+
+    def __call__(self, environ, start_response):
+        if environ.get('PATH_INFO') != self.path:
+            return self.app(environ, start_response)
+
+        status = '200 OK'
+        result = {'status': 'ok', 'pid': os.getpid()}
+
+        query = parse_qs(environ.get('QUERY_STRING', ''))
+        if '1' in query.get('db', ()):
+            try:
+                result['database'] = 'ok' if self.check_database() else 'none'
+            except Exception as e:
+                status = '503 Service Unavailable'
+                result.update({'status': 'error', 'database': str(e)})
+
+        body = json.dumps(result).encode('utf-8')
+        start_response(status, [
+            ('Content-Type', 'application/json'),
+            ('Content-Length', str(len(body))),
+            ('Cache-Control', 'no-store')
+        ])
+        return [body]
+
+
+class Launcher(BaseApplication):
+    def __init__(self, spec, options):
+        self.spec = spec
+        self.options = options
+        self.application = None
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if value is not None:
+                self.cfg.set(key, value)
+
+        self.cfg.set('pre_fork', self.pre_fork)
+
+    def load(self):
+        if self.application is None:
+            self.application = load_app(self.spec)
+        return HealthCheck(self.application)
+
+    def pre_fork(self, server, worker):
+        # Runs in the master before each fork, a preloaded app may have
+        # connected while it was imported
+        if self.application is not None:
+            dispose_engines(self.application)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='python -m common.launcher',
+        description='Serve a Flask app with pre-forked gunicorn workers.')
+    parser.add_argument(
+        'app', help="'module:app' or 'module:factory' to serve")
+    parser.add_argument(
+        '--chdir', help='folder of the app, imported from there')
+    parser.add_argument(
+        '--bind', default='0.0.0.0:{}'.format(os.getenv('PORT', '8000')))
+    parser.add_argument(
+        '--workers', type=int, default=default_workers(),
+        help='worker processes (default: WEB_CONCURRENCY or 2 x cores + 1)')
+    parser.add_argument(
+        '--threads', type=int, default=int(os.getenv('THREADS', '1')),
+        help='threads per worker, more than 1 uses the gthread worker')
+    parser.add_argument('--timeout', type=int, default=30)
+    parser.add_argument(
+        '--graceful-timeout', type=int, default=30,
+        help='seconds workers get to finish requests on reload or stop')
+    parser.add_argument(
+        '--max-requests', type=int, default=0,
+        help='recycle a worker after this many requests (0: never)')
+    parser.add_argument(
+        '--no-preload', action='store_true',
+        help='import the app in every worker instead of in the master')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.chdir:
+        os.chdir(args.chdir)
+    sys.path.insert(0, os.getcwd())
+    os.environ.setdefault('SECRET_KEY', secrets.token_hex(32))
+
+    options = {
+        'bind': args.bind,
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread' if args.threads > 1 else 'sync',
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'max_requests': args.max_requests,
+        'max_requests_jitter': args.max_requests // 10,
+        'preload_app': not args.no_preload
+    }
+    Launcher(args.app, options).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+'''
+In-memory indexes of model rows kept current by the session's writes
+
+A LiveIndex is built from the database on first use. Then each commit
+of the session it is attached to updates it with the rows that commit
+inserted, updated or deleted (soft deletes included), so the process
+that wrote a row sees the change right away. Writes made by other
+processes are picked up by rebuilding the index once it is older than
+max_age seconds.
+
+Subclasses list the models they index and implement:
+
+    load()              yields the records of every row, from the database
+    record(obj)         the record of a row, or None to leave it out
+    put(record)         adds or replaces a record
+    discard(model, id)  removes the record of a row, if there is one
+    clear()             empties the index, before it is built
+
+and may implement built(), called once every record of load() was put,
+to finish a bulk build.
+
+Subclasses may also list parents, models whose soft deletes cascade to
+the indexed rows with bulk UPDATEs, which load no rows into the session.
+When a parent row is deleted, discard(parent, id) is called to remove
+the records of its children. Other changes to parent rows are ignored.
+
+Records are built in after_flush, while the row's attributes are still
+loaded, and applied in after_commit, so rolled back writes never reach
+the index. Readers hold index.lock while they use the index.
+'''
+import threading
+import time
+
+from sqlalchemy import event
+
+DEFAULT_MAX_AGE = 300
+
+
+class LiveIndex:
+    models = ()
+    parents = ()
+
+    def __init__(self, session=None, max_age=DEFAULT_MAX_AGE):
+        self.max_age = max_age
+        self.loaded_at = None
+        self.lock = threading.RLock()
+        self._pending_key = 'live_index_{}'.format(id(self))
+        if session is not None:
+            self.init_session(session)
+
+    def init_session(self, session):
+        event.listen(session, 'after_flush', self._after_flush)
+        event.listen(session, 'after_commit', self._after_commit)
+        event.listen(session, 'after_soft_rollback', self._after_rollback)
+
+    ## Subclasses
+
+    def load(self):
+        raise NotImplementedError
+
+    def record(self, obj):
+        raise NotImplementedError
+
+    def put(self, record):
+        raise NotImplementedError
+
+    def discard(self, model, id):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def built(self):
+        pass
+
+    ## Building
+
+    def ensure_loaded(self):
+        '''Builds the index if it never was or is older than max_age.
+        '''
+        loaded_at = self.loaded_at
+        if loaded_at is not None and (
+                self.max_age is None or
+                time.monotonic() - loaded_at < self.max_age):
+            return
+        with self.lock:
+            if self.loaded_at != loaded_at:
+                # Another thread rebuilt it meanwhile
+                return
+            started = time.monotonic()
+            self.clear()
+            for record in self.load():
+                self.put(record)
+            self.built()
+            self.loaded_at = started
+
+    def invalidate(self):
+        self.loaded_at = None
+
+    ## Session events
+
+    def _after_flush(self, session, flush_context):
+        changes = session.info.setdefault(self._pending_key, [])
+        for obj in session.deleted:
+            if isinstance(obj, self.models + self.parents):
+                changes.append((type(obj), obj.id, None))
+        for obj in list(session.new) + list(session.dirty):
+            deleted = getattr(obj, 'deleted_at', None) is not None
+            if isinstance(obj, self.models):
+                changes.append((
+                    type(obj), obj.id, None if deleted else self.record(obj)))
+            elif isinstance(obj, self.parents) and deleted:
+                changes.append((type(obj), obj.id, None))
+
+    def _after_commit(self, session):
+        changes = session.info.pop(self._pending_key, None)
+        if not changes or self.loaded_at is None:
+            return
+        with self.lock:
+            for model, id, record in changes:
+                self.discard(model, id)
+                if record is not None:
+                    self.put(record)
+
+    def _after_rollback(self, session, previous_transaction):
+        if previous_transaction.parent is None:
+            session.info.pop(self._pending_key, None)
@@ -0,0 +1,127 @@
+'''
+Column projections for the JSON representations of the models
+
+A model declares once which fields it can send and the columns each one
+is built from. Endpoints then select only the columns of the fields a
+client asked for, usually with ?fields=id,name, and build the output
+from the result tuples without loading ORM objects:
+
+    Question.projection = Projection({
+        'id': Question.id,
+        'question': Question.question,
+        'category': Question.category
+    })
+
+    fields = Question.projection.parse(request.args.get('fields'))
+    rows = Question.projection.query(db.session, fields) \
+        .order_by(Question.id).all()
+    questions = Question.projection.format(rows, fields)
+
+Fields built from columns of other tables need the join added to the
+query by the caller.
+'''
+
+MAX_CACHED_FORMATTERS = 64
+
+
+class Field:
+    '''An output field computed from one or more columns.
+
+    Args:
+        columns: the column expressions the field is built from.
+        value: a function of the column values returning the field value,
+          defaults to the value of the single column.
+    '''
+
+    def __init__(self, *columns, value=None):
+        self.columns = columns
+        self.value = value
+
+
+class Projection:
+    '''The fields of one JSON representation of a model.
+
+    Args:
+        fields: dict of field name to a column or a Field, in output order.
+        default: the field names sent when none are requested, defaults
+          to all of them.
+    '''
+
+    def __init__(self, fields, default=None):
+        self.fields = {
+            name: field if isinstance(field, Field) else Field(field)
+            for name, field in fields.items()
+        }
+        self.default = tuple(default or self.fields)
+        self._formatters = {}
+
+    def parse(self, value):
+        '''Returns the field names of a comma separated list.
+
+        Raises:
+            ValueError: a name is not a field of the projection.
+        '''
+        if not value:
+            return self.default
+
+        names = tuple(dict.fromkeys(
+            name.strip() for name in value.split(',') if name.strip()))
+        unknown = [name for name in names if name not in self.fields]
+        if not names or unknown:
+            raise ValueError('Unknown fields: {}'.format(
+                ', '.join(unknown) or value))
+        return names
+
+    def columns(self, names=None):
+        '''Returns the distinct columns the fields are built from.
+        '''
+        columns = []
+        for name in names or self.default:
+            for column in self.fields[name].columns:
+                # Column expressions overload ==, compare identities
+                if not any(column is selected for selected in columns):
+                    columns.append(column)
+        return columns
+
+    def query(self, session, names=None):
+        '''Returns a query selecting only the columns of the fields.
+        '''
+        return session.query(*self.columns(names))
+
+    def formatter(self, names=None):
+        '''Returns a function building the dict of one result row.
+        '''
+        names = tuple(names or self.default)
+        if names in self._formatters:
+            return self._formatters[names]
+
+        columns = self.columns(names)
+        plan = []
+        for name in names:
+            field = self.fields[name]
+            positions = [
+                next(i for i, selected in enumerate(columns)
+                     if selected is column)
+                for column in field.columns]
+            plan.append((name, positions, field.value))
+
+        def format_row(row):
+            result = {}
+            for name, positions, value in plan:
+                if value is None:
+                    result[name] = row[positions[0]]
+                else:
+                    result[name] = value(*[row[i] for i in positions])
+            return result
+
+        # Bounded, clients choose the combinations of fields
+        if len(self._formatters) < MAX_CACHED_FORMATTERS:
+            self._formatters[names] = format_row
+        return format_row
+
+    def format(self, rows, names=None):
+        format_row = self.formatter(names)
+        return [format_row(row) for row in rows]
+
+    def format_one(self, row, names=None):
+        return self.formatter(names)(row)
@@ -0,0 +1,135 @@
+'''
+Soft deletes for the SQLAlchemy models
+
+Models with the SoftDelete mixin get a deleted_at column. Deleting one
+only sets it, along with the deleted_at of its rows in one-to-many
+relationships to other soft deleted models, one UPDATE per relationship
+whatever the number of rows. Nothing is loaded into the session.
+
+Once install_filters() has run, ORM queries leave out the soft deleted
+rows of the models they select from, relationship loads included.
+Queries that need them opt out with include_deleted(query).
+
+The rows are removed later by purge(), which deletes them in bounded
+batches with set-based DELETE statements, each batch in its own short
+transaction, children first.
+'''
+import datetime
+
+from sqlalchemy import Column, DateTime, and_, event
+from sqlalchemy.orm import Query, class_mapper
+from sqlalchemy.orm.interfaces import ONETOMANY
+
+DEFAULT_BATCH_SIZE = 1000
+INCLUDE_DELETED = 'include_deleted'
+
+
+def utcnow():
+    return datetime.datetime.utcnow()
+
+
+class SoftDelete:
+    '''Mixin of soft deleted models.
+    '''
+    deleted_at = Column(DateTime, index=True)
+
+    @property
+    def is_deleted(self):
+        return self.deleted_at is not None
+
+    def soft_delete(self, session, now=None):
+        '''Marks the row and its children deleted, the caller commits.
+        '''
+        now = now or utcnow()
+        self.deleted_at = now
+        mapper = class_mapper(type(self))
+        for relationship in mapper.relationships:
+            child = relationship.mapper.class_
+            if relationship.direction is not ONETOMANY or \
+                    not issubclass(child, SoftDelete):
+                continue
+            criteria = [
+                remote == getattr(self, mapper.get_property_by_column(
+                    local).key)
+                for local, remote in relationship.local_remote_pairs]
+            table = child.__table__
+            session.execute(
+                table.update()
+                .where(and_(table.c.deleted_at.is_(None), *criteria))
+                .values(deleted_at=now))
+
+
+def include_deleted(query):
+    return query.execution_options(**{INCLUDE_DELETED: True})
+
+
+def _exclude_deleted(query):
+    if query._execution_options.get(INCLUDE_DELETED):
+        return query
+
+    entities = []
+    for description in query.column_descriptions:
+        entity = description['entity']
+        if isinstance(entity, type) and issubclass(entity, SoftDelete) and \
+                entity not in entities:
+            entities.append(entity)
+
+    for entity in entities:
+        # Also valid after limit() and offset()
+        query = query.enable_assertions(False).filter(
+            entity.deleted_at.is_(None))
+    return query
+
+
+def install_filters():
+    '''Leaves soft deleted rows out of every ORM query.
+    '''
+    if not event.contains(Query, 'before_compile', _exclude_deleted):
+        event.listen(Query, 'before_compile', _exclude_deleted,
+                     retval=True, bake_ok=True)
+
+
+def purge(session, models, batch_size=DEFAULT_BATCH_SIZE, older_than=None,
+          max_batches=None, where=None, before_delete=None):
+    '''Deletes the rows soft deleted before older_than ago.
+
+    Args:
+        session: the session to run the statements in, committed after
+          each batch.
+        models: the soft deleted models, children before their parents.
+        batch_size: rows deleted per statement.
+        older_than: timedelta, rows deleted more recently are kept.
+        max_batches: stop after this many batches, None for all.
+        where: dict of model to a condition the purged rows must also
+          meet, the others are kept until they do.
+        before_delete: dict of model to a function(session, ids) run in
+          the transaction of each batch before its rows are deleted, to
+          delete the rows of other tables that refer to them.
+
+    Returns a dict of table name to the number of rows deleted.
+    '''
+    cutoff = utcnow() - (older_than or datetime.timedelta(0))
+    deleted = {}
+    batches = 0
+    for model in models:
+        table = model.__table__
+        primary_key = table.primary_key.columns.values()[0]
+        condition = table.c.deleted_at <= cutoff
+        if where and model in where:
+            condition = and_(condition, where[model])
+        deleted[table.name] = 0
+        while max_batches is None or batches < max_batches:
+            ids = [row[0] for row in session.execute(
+                table.select()
+                .with_only_columns([primary_key])
+                .where(condition)
+                .limit(batch_size))]
+            if not ids:
+                break
+            if before_delete and model in before_delete:
+                before_delete[model](session, ids)
+            session.execute(table.delete().where(primary_key.in_(ids)))
+            session.commit()
+            deleted[table.name] += len(ids)
+            batches += 1
+    return deleted
@@ -0,0 +1,97 @@
+'''
+Template compilation for the Flask apps
+
+Jinja compiles a template the first time a process renders it, so every
+fresh worker pays for compiling the pages it serves first. Templates(app)
+removes that cost from the requests:
+
+    - compiled templates are kept in a bytecode cache on disk, shared by
+      the workers and kept across restarts, a template is only compiled
+      again when its source changes
+    - with TEMPLATES_PRELOAD every template is compiled when the app is
+      created; with the launcher's preloading that happens once in the
+      master and the workers are forked with the templates in memory
+    - templates are only checked for changes on disk when
+      TEMPLATES_AUTO_RELOAD is on, which is the default in debug mode only
+
+Config:
+    TEMPLATES_CACHE_DIR     bytecode cache folder, defaults to
+                            <instance folder>/jinja-cache, '' disables it
+    TEMPLATES_PRELOAD       compile every template at startup
+                            (default: not app.debug)
+    TEMPLATES_AUTO_RELOAD   check templates for changes (default: app.debug)
+'''
+import os
+import tempfile
+
+from jinja2 import FileSystemBytecodeCache
+
+CACHE_FOLDER = 'jinja-cache'
+
+
+class SharedBytecodeCache(FileSystemBytecodeCache):
+    '''A bytecode cache folder several processes can write at once.
+
+    Files are written under a temporary name and renamed into place, so
+    a worker never loads a file another one is still writing.
+    '''
+
+    def load_bytecode(self, bucket):
+        try:
+            super().load_bytecode(bucket)
+        except (EOFError, ValueError, TypeError):
+            # Unreadable, compiled again and overwritten
+            bucket.reset()
+
+    def dump_bytecode(self, bucket):
+        filename = self._get_cache_filename(bucket)
+        fd, temporary = tempfile.mkstemp(
+            dir=self.directory, prefix=os.path.basename(filename) + '.')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                bucket.write_bytecode(f)
+            os.replace(temporary, filename)
+        except BaseException:
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
+            raise
+
+
+class Templates:
+    '''Configures the app's Jinja environment, see the module docstring.
+    '''
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['templates'] = self
+        env = app.jinja_env
+
+        auto_reload = app.config.get('TEMPLATES_AUTO_RELOAD')
+        env.auto_reload = app.debug if auto_reload is None else auto_reload
+
+        directory = app.config.get(
+            'TEMPLATES_CACHE_DIR',
+            os.path.join(app.instance_path, CACHE_FOLDER))
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            env.bytecode_cache = SharedBytecodeCache(directory)
+
+        if app.config.get('TEMPLATES_PRELOAD', not app.debug):
+            self.preload(app)
+
+    def preload(self, app):
+        '''Compiles every template of the app and its blueprints.
+
+        Returns the number of templates loaded.
+        '''
+        env = app.jinja_env
+        names = env.list_templates(
+            filter_func=lambda name: not os.path.basename(name).startswith('.'))
+        for name in names:
+            env.get_template(name)
+        return len(names)